@@ -3,194 +3,373 @@ AI分析機能
 日記の内容を分析して感情分析、要約、アドバイスなどを提供
 """
 
-import openai
+import json
+import threading
 from typing import Dict, Any, List, Optional
 import logging
 from datetime import datetime
+import time
+from prompt_templates import render_messages
+from model_router import ModelRouter
+from circuit_breaker import CircuitBreaker
+from deadline import Deadline
+from mood_classifier import CONFIDENCE_THRESHOLD
+
+# 生成タイトルの許容文字数（プロンプトでは10-20文字程度を指示）
+TITLE_MAX_CHARS = 30
 
 class DiaryAIAnalyzer:
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: Optional[str] = None, model: Optional[str] = None):
         """
         日記AI分析クライアントを初期化
-        
+
         Args:
             api_key: OpenAI API キー
+            base_url: APIのベースURL（ローカルの代替サーバーでテストする場合など）
+            model: アドバイス生成に使うモデル（省略時はルーターの既定値）
         """
-        self.client = openai.OpenAI(api_key=api_key)
+        self.api_key = api_key
+        self.base_url = base_url
         self.logger = logging.getLogger(__name__)
-    
-    def analyze_emotion(self, diary_content: str) -> Dict[str, Any]:
+        # 一括処理時などに外部から設定するレートリミッター
+        self.rate_limiter = None
+        # 気分判定のローカル分類器（確信度が閾値以上ならLLMを呼ばない）
+        self.mood_classifier = None
+        # 分類器を初回利用時に作るための関数（起動時に履歴を読まないように）
+        self.mood_classifier_loader = None
+        self.local_mood_threshold = CONFIDENCE_THRESHOLD
+
+        # タスクごとのモデル・パラメータの振り分け
+        self.router = ModelRouter(advice_model=model)
+
+        # 障害が続いたらタイムアウトを待たずにすぐ失敗させる
+        self.circuit_breaker = CircuitBreaker("OpenAI")
+
+        # タスク別のトークン使用量
+        self.usage_stats: Dict[str, Dict[str, int]] = {}
+        self._usage_lock = threading.Lock()
+
+        # OpenAI SDKは重いので、最初のAPI呼び出しまでインポート・初期化しない
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        """OpenAIクライアント（初回アクセス時に作成）"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    import openai
+                    # 障害時の待ち時間はルートのタイムアウトとサーキットブレーカーで抑えるので、SDKの再試行は1回まで
+                    self._client = openai.OpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=1)
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    def _get_mood_classifier(self):
+        """ローカル気分分類器を取得（未作成ならローダーで作成。作成中の他スレッドは完了を待つ）"""
+        if self.mood_classifier is None and self.mood_classifier_loader is not None:
+            with self._client_lock:
+                if self.mood_classifier is None and self.mood_classifier_loader is not None:
+                    # 作成に失敗した場合はローダーを残し、次の呼び出しで作成をやり直す
+                    self.mood_classifier = self.mood_classifier_loader()
+                    self.mood_classifier_loader = None
+        return self.mood_classifier
+
+    def _wait_for_rate_limit(self):
+        """レートリミッターが設定されていれば呼び出し枠を待つ"""
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire()
+
+    def build_request(self, task: str, diary_content: str, context: str = "",
+                      profile_prefix: str = "") -> Dict[str, Any]:
+        """
+        分析タスクごとのChat Completionsリクエスト本体を組み立てる
+        （同期呼び出しとBatch APIの両方で同じプロンプトを使うため）
+
+        Args:
+            task: "emotion" / "summary" / "advice" / "title" / "digest"
+            diary_content: 日記の内容
+            context: 過去の日記履歴からの文脈情報（adviceのみ使用）
+            profile_prefix: ユーザープロフィール（adviceのみ使用）
+
+        Returns:
+            chat.completions.create に渡す引数
+        """
+        route = self.router.get_route(task)
+        request = {
+            "model": route["model"],
+            "messages": render_messages(task, diary_content, context, profile_prefix),
+            "temperature": route["temperature"]
+        }
+        # 出力の上限はルート設定で一元的に決める
+        if route.get("max_tokens"):
+            request["max_tokens"] = route["max_tokens"]
+        if route.get("stop"):
+            request["stop"] = route["stop"]
+        return request
+
+    def _chat(self, task: str, request: Dict[str, Any], deadline: Optional[Deadline] = None):
+        """
+        Chat Completionsを呼び出し、トークン使用量を記録する
+        タイムアウトした場合はルートの代替モデルで順に再試行する
+        （deadline があれば、各呼び出しのタイムアウトはルートの設定値と残り時間の小さい方）
+
+        Raises:
+            CircuitOpenError: 障害が続いていて呼び出しを停止している場合
+            DeadlineExceeded: 期限までに呼び出す時間が残っていない場合
+        """
+        route = self.router.get_route(task)
+        models = self.router.candidates(task)
+        if request["model"] not in models:
+            models.insert(0, request["model"])
+
+        for index, model in enumerate(models):
+            timeout = route.get("timeout")
+            if deadline is not None:
+                timeout = deadline.timeout(timeout)
+            # 期限に合わせて短くしたタイムアウトでの打ち切りは、障害とはみなさない
+            limited = timeout != route.get("timeout")
+
+            self.circuit_breaker.before_call()
+            self._wait_for_rate_limit()
+            started = time.monotonic()
+            try:
+                response = self.client.chat.completions.create(
+                    **dict(request, model=model), timeout=timeout
+                )
+            except Exception as e:
+                if self._is_outage(e) and not (limited and self._is_timeout(e)):
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_release()
+                is_last = index == len(models) - 1
+                if not self._is_timeout(e) or is_last:
+                    raise
+                self.router.record(task, model, time.monotonic() - started, error=True, fallback=index > 0)
+                self.logger.warning(f"{task}: {model} がタイムアウトしたため {models[index + 1]} に切り替えます")
+                continue
+
+            self.circuit_breaker.record_success()
+            usage = getattr(response, "usage", None)
+            truncated = getattr(response.choices[0], "finish_reason", None) == "length"
+            if truncated:
+                self.logger.info(f"{task}: 出力が上限（max_tokens）で打ち切られました")
+            self.router.record(task, model, time.monotonic() - started, usage,
+                               fallback=index > 0, truncated=truncated)
+            self._record_usage(task, usage)
+            return response
+
+    def _is_timeout(self, error: Exception) -> bool:
+        """代替モデルに切り替えるべきタイムアウト・接続エラーかどうか"""
+        if isinstance(error, TimeoutError):
+            return True
+        import openai
+        return isinstance(error, (openai.APITimeoutError, openai.APIConnectionError))
+
+    def _is_outage(self, error: Exception) -> bool:
+        """サーキットブレーカーの失敗として数える障害（タイムアウト・接続エラー・5xx・429）かどうか"""
+        if self._is_timeout(error):
+            return True
+        import openai
+        return isinstance(error, (openai.InternalServerError, openai.RateLimitError))
+
+    def _record_usage(self, task: str, usage):
+        """APIの usage からタスク別のトークン数（キャッシュ済みトークン含む）を集計"""
+        if usage is None:
+            return
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+
+        with self._usage_lock:
+            stats = self.usage_stats.setdefault(task, {
+                "calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0
+            })
+            stats["calls"] += 1
+            stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            stats["cached_tokens"] += cached_tokens
+            stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """
+        タスク別のトークン使用量とプロンプトキャッシュのヒット率を取得
+
+        Returns:
+            タスク名 -> 集計値（cache_hit_ratio はプロンプトトークンのうちキャッシュされた割合）
+        """
+        with self._usage_lock:
+            result = {}
+            for task, stats in self.usage_stats.items():
+                result[task] = dict(stats)
+                result[task]["cache_hit_ratio"] = (
+                    stats["cached_tokens"] / stats["prompt_tokens"] if stats["prompt_tokens"] else 0.0
+                )
+                result[task]["avg_output_tokens"] = (
+                    stats["completion_tokens"] / stats["calls"] if stats["calls"] else 0.0
+                )
+            return result
+
+    def parse_emotion_response(self, result: str) -> Dict[str, Any]:
+        """感情分析の応答テキストをJSONとして解釈"""
+        try:
+            return json.loads(result)
+        except:
+            return {"error": "JSON解析エラー", "raw_response": result}
+
+    def clean_title(self, title: str) -> str:
+        """生成されたタイトルを整形"""
+        # 1行目だけを使い、クォートや鉤括弧を除去
+        title = (title or "").strip().split("\n")[0]
+        return title.strip().strip('"').strip("'").strip("「」『』").strip()
+
+    def is_valid_title(self, title: str) -> bool:
+        """タイトルとして使える長さかどうか"""
+        return 0 < len(title) <= TITLE_MAX_CHARS
+
+    def analyze_emotion(self, diary_content: str, strict: bool = False,
+                        deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
-        日記の感情分析を行う
-        
+        日記の感情分析を行う（LLMが使えない場合はローカル分類器の結果を返す）
+
         Args:
             diary_content: 日記の内容
-            
+            strict: Trueの場合、分類器もなく分析できなかったときはエラー結果を返さずに例外を送出する
+            deadline: 処理全体の期限
+
         Returns:
             感情分析結果
         """
+        local_result = None
+        mood_classifier = None
         try:
-            prompt = f"""
-以下の日記の内容から感情を分析してください。
-結果はJSON形式で、以下の項目を含めてください：
-- overall_mood: 全体的な気分（positive/neutral/negative）
-- emotions: 検出された感情のリスト（喜び、悲しみ、怒り、不安、期待など）
-- confidence: 分析の信頼度（0-1の数値）
-- summary: 感情についての簡潔な説明
-
-日記内容:
-{diary_content}
-"""
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "あなたは日記の感情分析を行う専門家です。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3
-            )
-            
-            result = response.choices[0].message.content
-            try:
-                import json
-                return json.loads(result)
-            except:
-                return {"error": "JSON解析エラー", "raw_response": result}
-                
+            mood_classifier = self._get_mood_classifier()
+            if mood_classifier is not None:
+                local_result = mood_classifier.classify(diary_content)
+        except Exception as e:
+            # 分類器が使えなくてもLLMで分析する
+            self.logger.error(f"ローカル気分分類エラー: {e}")
+        if local_result is not None and local_result["confidence"] >= self.local_mood_threshold:
+            return local_result
+
+        try:
+            response = self._chat("emotion", self.build_request("emotion", diary_content), deadline)
+
+            result = self.parse_emotion_response(response.choices[0].message.content)
+            # LLMの判定結果でローカル分類器を追加学習
+            if mood_classifier is not None and isinstance(result.get("overall_mood"), str):
+                mood_classifier.learn(diary_content, result["overall_mood"])
+            return result
+
         except Exception as e:
             self.logger.error(f"感情分析エラー: {e}")
+            if local_result is not None:
+                # 確信度が低くてもローカル分類器の結果で代用する
+                return dict(local_result, fallback=True)
+            if strict:
+                raise
             return {"error": str(e)}
-    
-    def generate_summary(self, diary_content: str) -> str:
+
+    def generate_summary(self, diary_content: str, strict: bool = False,
+                         deadline: Optional[Deadline] = None) -> str:
         """
         日記の要約を生成
-        
+
         Args:
             diary_content: 日記の内容
-            
+            strict: Trueの場合、失敗時にエラーメッセージを返さずに例外を送出する
+            deadline: 処理全体の期限
+
         Returns:
             要約文
         """
         try:
-            prompt = f"""
-以下の日記を簡潔に要約してください。
-重要なポイントや出来事を3-4文でまとめてください。
+            response = self._chat("summary", self.build_request("summary", diary_content), deadline)
 
-日記内容:
-{diary_content}
-"""
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "あなたは日記の要約を作成する専門家です。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.5
-            )
-            
             return response.choices[0].message.content
-            
+
         except Exception as e:
             self.logger.error(f"要約生成エラー: {e}")
+            if strict:
+                raise
             return f"要約生成中にエラーが発生しました: {e}"
-    
-    def generate_advice(self, diary_content: str, context: str = "") -> str:
+
+    def generate_advice(self, diary_content: str, context: str = "", profile_prefix: str = "",
+                        strict: bool = False, deadline: Optional[Deadline] = None) -> str:
         """
         日記に基づいてアドバイスを生成（履歴を考慮）
-        
+
         Args:
             diary_content: 日記の内容
             context: 過去の日記履歴からの文脈情報
-            
+            profile_prefix: ユーザープロフィール（プロンプト先頭側に固定で置かれる）
+            strict: Trueの場合、失敗時にエラーメッセージを返さずに例外を送出する
+            deadline: 処理全体の期限
+
         Returns:
             アドバイス文
         """
         try:
-            # 文脈情報を含むプロンプトを作成
-            if context.strip():
-                prompt = f"""
-あなたは長期間にわたってこのユーザーの日記を見守っている優しいカウンセラーです。
-以下の情報を参考に、継続的で個人的なアドバイスを提供してください。
-
-【ユーザーの履歴・傾向】
-{context}
-
-【今日の日記】
-{diary_content}
-
-以下の点を考慮してアドバイスしてください：
-- 過去の経験や成長の軌跡を踏まえる
-- 繰り返しのパターンがあれば指摘し、改善のヒントを提供
-- 前向きな変化があれば認めて励ます
-- 継続的なサポートの姿勢を示す
-- 個人の成長と幸福に焦点を当てる
-"""
-            else:
-                prompt = f"""
-以下の日記を読んで、建設的で励ましになるアドバイスを提供してください。
-個人の成長や幸福に焦点を当てて、優しく支援的な言葉で回答してください。
+            response = self._chat("advice", self.build_request("advice", diary_content, context, profile_prefix),
+                                  deadline)
 
-日記内容:
-{diary_content}
-"""
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "あなたは親身になって相談に乗る優しいカウンセラーです。長期的な関係性を大切にし、継続的なサポートを提供します。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.7
-            )
-            
             return response.choices[0].message.content
-            
+
         except Exception as e:
             self.logger.error(f"アドバイス生成エラー: {e}")
+            if strict:
+                raise
             return f"アドバイス生成中にエラーが発生しました: {e}"
-    
-    def generate_title(self, diary_content: str) -> str:
+
+    def generate_digest(self, period_text: str) -> str:
         """
-        日記の内容からタイトルを生成
-        
+        期間（週・月・全期間）の日記の要約から振り返りを生成
+
+        Args:
+            period_text: 期間内の日記の要約（または月ごとの振り返り）を1行ずつ並べたテキスト
+
+        Returns:
+            振り返りの文
+
+        Raises:
+            Exception: 生成に失敗した場合（エラーメッセージを振り返りとして保存しないよう例外のまま返す）
+        """
+        response = self._chat("digest", self.build_request("digest", period_text))
+        return (response.choices[0].message.content or "").strip()
+
+    def generate_title(self, diary_content: str, deadline: Optional[Deadline] = None) -> str:
+        """
+        日記の内容からタイトルを生成（失敗・期限切れの場合は日付のタイトル）
+
         Args:
             diary_content: 日記の内容
-            
+            deadline: 処理全体の期限
+
         Returns:
             生成されたタイトル
         """
         try:
-            prompt = f"""
-以下の日記の内容から、適切なタイトルを生成してください。
-タイトルは：
-- 10-20文字程度
-- 日記の主要なテーマや感情を表現
-- 読みやすく親しみやすい表現
-- 日本語で自然な表現
-
-日記内容:
-{diary_content}
-
-タイトルのみを返答してください。
-"""
-            
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "あなたは日記のタイトルを作成する専門家です。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.6
-            )
-            
-            title = response.choices[0].message.content.strip()
-            # クォートを除去
-            title = title.strip('"').strip("'").strip()
-            
-            return title
-            
+            request = self.build_request("title", diary_content)
+            response = self._chat("title", request, deadline)
+            title = self.clean_title(response.choices[0].message.content)
+
+            # 不正な場合のみ、短く答えるよう念押しして1回だけ再生成する
+            if not self.is_valid_title(title):
+                retry_request = dict(request, messages=request["messages"] + [
+                    {"role": "assistant", "content": response.choices[0].message.content or ""},
+                    {"role": "user", "content": f"{TITLE_MAX_CHARS}文字以内のタイトルを1行だけ返してください。"}
+                ])
+                retry_title = self.clean_title(self._chat("title", retry_request, deadline).choices[0].message.content)
+                if retry_title:
+                    title = retry_title
+
+            if not title:
+                raise ValueError("タイトルが空でした")
+            # それでも長すぎる場合は切り詰める
+            return title[:TITLE_MAX_CHARS]
+
         except Exception as e:
             self.logger.error(f"タイトル生成エラー: {e}")
-            return f"日記 - {datetime.now().strftime('%Y/%m/%d')}" 
\ No newline at end of file
+            return f"日記 - {datetime.now().strftime('%Y/%m/%d')}"
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+日記AI - JSON API（ASGI）
+モバイルアプリや負荷試験ツールから使うための非同期HTTP API。Gradio UI と同じサーバーに載せられる
+（app.py から起動すると /v1 がこのAPI、/ がGradio UI になる）
+
+読み取り系のレスポンスには ETag を付け、If-None-Match が一致すれば 304 を返す。
+レスポンスは gzip で圧縮する（クライアントが Accept-Encoding: gzip を送った場合）
+
+単体でも起動できる:
+    python src/api.py --port 8000
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+sys.path.append(os.path.dirname(__file__))
+
+# 一括作成で1回に受け付ける最大件数と、キューを使わない場合に同時に処理する件数
+MAX_BATCH_SIZE = 50
+BATCH_CONCURRENCY = 4
+
+
+class DiaryInput(BaseModel):
+    content: str = Field(..., min_length=1, description="日記の内容")
+    title: Optional[str] = Field(None, description="タイトル（省略時はAIが生成）")
+    date: Optional[str] = Field(None, description="日付（YYYY-MM-DD）")
+
+
+class BatchInput(BaseModel):
+    diaries: List[DiaryInput] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ProfileInput(BaseModel):
+    name: str = ""
+    age: str = ""
+    occupation: str = ""
+    interests: List[str] = []
+    goals: List[str] = []
+
+
+def _matches(request: Request, etag: str) -> bool:
+    """If-None-Match が ETag と一致するか（弱い比較）"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.replace("W/", "", 1) == etag.replace("W/", "", 1) for tag in tags)
+
+
+def _not_modified(etag: str) -> Response:
+    """304 Not Modified レスポンス"""
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def json_response(request: Request, data: Any, status_code: int = 200, etag: Optional[str] = None,
+                  headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    JSONレスポンスを作成（読み取り系は ETag を付け、一致すれば 304 を返す）
+
+    Args:
+        request: リクエスト
+        data: 返すデータ
+        status_code: ステータスコード
+        etag: ETag（省略時は本文のハッシュ。GETのみ付ける）
+        headers: 追加のヘッダー
+    """
+    body = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+    headers = dict(headers or {})
+    if request.method == "GET" and status_code == 200:
+        # gzip で本文のバイト列が変わるので弱いETagにする
+        etag = etag or f'W/"{hashlib.sha256(body).hexdigest()[:32]}"'
+        if _matches(request, etag):
+            return _not_modified(etag)
+        headers.update({"ETag": etag, "Cache-Control": "no-cache"})
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def _status_code(result: Dict[str, Any]) -> int:
+    """DiaryManagerの結果のステータスに対応するHTTPステータスコード"""
+    return 200 if result.get("status") != "error" else 500
+
+
+def create_api(get_diary_manager: Callable[[], Any], get_job_queue: Callable[[], Any] = lambda: None) -> FastAPI:
+    """
+    APIアプリケーションを作成
+
+    Args:
+        get_diary_manager: DiaryManagerを返す関数（初回呼び出し時に初期化してよい）
+        get_job_queue: JobQueueを返す関数（ワーカーを起動していなければNone。Noneなら日記作成はこのプロセスで実行）
+
+    Returns:
+        FastAPIアプリケーション
+    """
+    api = FastAPI(title="日記AI API", version="1.0")
+    api.add_middleware(GZipMiddleware, minimum_size=1000)
+
+    def history_etag(*parts) -> str:
+        """履歴のバージョン（マニフェストの更新時刻）とクエリから作るETag（日数指定は日付が変わると結果も変わる）"""
+        version = get_diary_manager().history.get_version()
+        key = "-".join(str(part) for part in (version, datetime.now().strftime("%Y%m%d"), *parts))
+        return f'W/"{hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]}"'
+
+    def submit(diary: DiaryInput) -> str:
+        """日記作成をジョブとして登録"""
+        # 時間帯の境目をまたいだ再送も同じジョブ・同じ日記として扱えるよう、直前の時間帯のキーも渡す
+        keys = get_diary_manager().make_idempotency_keys(diary.content)
+        payload = dict(diary.model_dump(), idempotency_keys=keys)
+        return get_job_queue().submit("create_diary", payload, dedupe_key=keys[0], alternate_keys=keys[1:])
+
+    def create(diary: DiaryInput) -> Dict[str, Any]:
+        """日記を作成（このプロセスで実行）"""
+        return get_diary_manager().create_diary_with_analysis(diary.content, diary.title, diary.date)
+
+    @api.post("/v1/diaries")
+    async def create_diary(request: Request, diary: DiaryInput):
+        """日記を作成（ワーカーがあれば 202 とジョブIDを返し、/v1/jobs/{job_id} で結果を確認する）"""
+        if get_job_queue() is not None:
+            job_id = await run_in_threadpool(submit, diary)
+            return json_response(request, {"job_id": job_id, "status": "queued"}, status_code=202,
+                                 headers={"Location": f"/v1/jobs/{job_id}"})
+
+        result = await run_in_threadpool(create, diary)
+        return json_response(request, result, status_code=201 if result["status"] == "success" else 500)
+
+    @api.post("/v1/diaries/batch")
+    async def create_diaries(request: Request, batch: BatchInput):
+        """日記をまとめて作成（ワーカーがあればすべてジョブとして登録する）"""
+        if get_job_queue() is not None:
+            job_ids = [await run_in_threadpool(submit, diary) for diary in batch.diaries]
+            return json_response(request, {"job_ids": job_ids, "status": "queued"}, status_code=202)
+
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+        async def create_one(diary: DiaryInput) -> Dict[str, Any]:
+            async with semaphore:
+                return await run_in_threadpool(create, diary)
+
+        results = await asyncio.gather(*(create_one(diary) for diary in batch.diaries))
+        ok = all(result["status"] == "success" for result in results)
+        return json_response(request, {"count": len(results), "results": results}, status_code=201 if ok else 207)
+
+    @api.get("/v1/jobs/{job_id}")
+    async def get_job(request: Request, job_id: str):
+        """日記作成ジョブの状態と結果"""
+        queue = get_job_queue()
+        job = await run_in_threadpool(queue.get, job_id) if queue is not None else None
+        if job is None:
+            return json_response(request, {"status": "error", "message": "ジョブが見つかりません"}, status_code=404)
+        job.pop("payload", None)
+        return json_response(request, job)
+
+    @api.get("/v1/diaries")
+    async def list_diaries(request: Request, offset: int = 0, limit: int = 20, days: Optional[int] = None):
+        """ローカル履歴の日記を新しい順に1ページ分取得"""
+        limit = min(max(1, limit), 100)
+        etag = await run_in_threadpool(history_etag, "list", offset, limit, days)
+        if _matches(request, etag):
+            return _not_modified(etag)
+        page = await run_in_threadpool(lambda: get_diary_manager().history.get_entries_page(offset, limit, days))
+        return json_response(request, page, etag=etag)
+
+    @api.get("/v1/search")
+    async def search_diaries(request: Request, q: str, days: Optional[int] = None, limit: int = 50):
+        """タイトル・本文・要約をキーワードで検索"""
+        limit = min(max(1, limit), 200)
+        etag = await run_in_threadpool(history_etag, "search", q, days, limit)
+        if _matches(request, etag):
+            return _not_modified(etag)
+        result = await run_in_threadpool(lambda: get_diary_manager().search_diaries(q, days, limit))
+        return json_response(request, result, status_code=_status_code(result), etag=etag)
+
+    @api.get("/v1/history/summary")
+    async def get_history_summary(request: Request, days: int = 30):
+        """日別集計から作る履歴の要約"""
+        etag = await run_in_threadpool(history_etag, "summary", days)
+        if _matches(request, etag):
+            return _not_modified(etag)
+        result = await run_in_threadpool(lambda: get_diary_manager().get_diary_history_summary(days))
+        return json_response(request, result, status_code=_status_code(result), etag=etag)
+
+    @api.get("/v1/analytics")
+    async def get_analytics(request: Request):
+        """分析レポート（AIの使用量など履歴以外の値も含むので、ETagは本文から作る）"""
+        result = await run_in_threadpool(lambda: get_diary_manager().get_user_analytics())
+        return json_response(request, result, status_code=_status_code(result))
+
+    @api.get("/v1/profile")
+    async def get_profile(request: Request):
+        """ユーザープロフィール"""
+        profile = await run_in_threadpool(lambda: get_diary_manager().history.get_user_profile())
+        return json_response(request, profile)
+
+    @api.put("/v1/profile")
+    async def update_profile(request: Request, profile: ProfileInput):
+        """ユーザープロフィールを更新"""
+        result = await run_in_threadpool(lambda: get_diary_manager().update_user_profile(profile.model_dump()))
+        return json_response(request, result, status_code=_status_code(result))
+
+    return api
+
+
+def main():
+    """APIだけを起動（Gradio UI なし）"""
+    parser = argparse.ArgumentParser(description="日記AIのJSON APIを起動します")
+    parser.add_argument("--host", default="0.0.0.0", help="待ち受けるアドレス（デフォルト: 0.0.0.0）")
+    parser.add_argument("--port", type=int, default=8000, help="ポート番号（デフォルト: 8000）")
+    args = parser.parse_args()
+
+    import uvicorn
+    from app import get_diary_manager
+
+    uvicorn.run(create_api(get_diary_manager), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
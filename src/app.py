@@ -6,43 +6,76 @@
 
 import sys
 import os
+import threading
 from datetime import datetime
-import gradio as gr
-import pandas as pd
 
 # 現在のディレクトリをパスに追加
 sys.path.append(os.path.dirname(__file__))
 
 from diary_manager import DiaryManager
 
-# 設定ファイルの読み込み
-try:
-    import config
-    NOTION_API_KEY = config.NOTION_API_KEY
-    NOTION_DATABASE_ID = config.NOTION_DATABASE_ID
-    OPENAI_API_KEY = config.OPENAI_API_KEY
-except ImportError:
-    raise Exception("src/config.pyファイルが見つかりません。適切な設定をしてください。")
-
-# 日記管理システムを初期化
-diary_manager = DiaryManager(
-    notion_api_key=NOTION_API_KEY,
-    notion_database_id=NOTION_DATABASE_ID,
-    openai_api_key=OPENAI_API_KEY
-)
-
-def create_diary(content: str):
-    """新しい日記を作成する関数（タイトル自動生成）"""
+# 日記管理システム（初回利用時に初期化）
+_diary_manager = None
+_diary_manager_lock = threading.Lock()
+
+# 履歴タブの日記一覧の1ページの件数
+HISTORY_PAGE_SIZE = 20
+
+# 日記作成ジョブのキュー（ワーカープロセスを起動した場合のみ。Noneなら画面のプロセスで直接作成する）
+_job_queue = None
+
+def get_diary_manager() -> DiaryManager:
+    """日記管理システムを取得（設定ファイルの読み込みと初期化は初回のみ）"""
+    global _diary_manager
+    if _diary_manager is None:
+        with _diary_manager_lock:
+            if _diary_manager is None:
+                try:
+                    import config
+                except ImportError:
+                    raise Exception("src/config.pyファイルが見つかりません。適切な設定をしてください。")
+                
+                _diary_manager = DiaryManager.from_config(config)
+    return _diary_manager
+
+def start_workers(workers: int, data_dir: str = "data"):
+    """
+    日記作成用のワーカープロセスを起動し、以降の日記作成をジョブキュー経由にする
+    
+    Returns:
+        WorkerPoolインスタンス（終了時に stop() を呼ぶ）
+    """
+    global _job_queue
+    from job_queue import JobQueue
+    from worker_pool import WorkerPool
+    
+    pool = WorkerPool(workers, data_dir)
+    pool.start()
+    _job_queue = JobQueue(data_dir)
+    return pool
+
+def create_diary(content: str, session: str = None):
+    """新しい日記を作成する関数（タイトル自動生成。session は先行分析を予約した画面のセッションID）"""
     if not content.strip():
         return "❌ 内容を入力してください"
     
     try:
-        result = diary_manager.create_diary_with_analysis(content.strip())
-        
+        return format_create_result(get_diary_manager().create_diary_with_analysis(content.strip(), session=session))
+    except Exception as e:
+        return f"❌ エラー: {str(e)}"
+
+def format_create_result(result) -> str:
+    """日記作成結果の表示文"""
+    try:
         if result["status"] == "success":
             generated_title = result.get("generated_title", "タイトル生成エラー")
             context_used = result.get("context_used", False)
             context_msg = "\n📊 過去の日記履歴を考慮したアドバイスを生成しました" if context_used else "\n💡 初回または履歴が少ないため、一般的なアドバイスを生成しました"
+            pending = result.get("pending", [])
+            if pending:
+                # OpenAI・Notionの障害時や時間切れの場合は保存だけ済ませ、残りは後から自動で追加される
+                pending_msg = "AI分析の一部" if pending == ["analysis"] else "Notionへの保存" if pending == ["notion"] else "AI分析の一部とNotionへの保存"
+                return f"✅ 日記を保存しました\n📝 タイトル: {generated_title}\n⏳ {pending_msg}は、後から自動で行われます"
             return f"✅ 日記が作成されました！\n📝 タイトル: {generated_title}\n🤖 AI分析も完了し、Notionに保存されました{context_msg}"
         else:
             return f"❌ エラー: {result.get('message', '不明なエラー')}"
@@ -50,16 +83,100 @@ def create_diary(content: str):
     except Exception as e:
         return f"❌ エラー: {str(e)}"
 
-def get_recent_diaries(limit: int = 5):
-    """最近の日記を取得する関数"""
+def submit_diary(content: str, session: str = None):
+    """
+    日記作成をジョブとして登録する関数（ワーカーを起動していなければその場で作成）
+    
+    Args:
+        content: 日記の内容
+        session: 画面のセッションID（このセッションの先行分析の結果を使う）
+    
+    Returns:
+        結果表示、ジョブID、進捗確認タイマーの更新
+    """
+    import gradio as gr
+    
+    if _job_queue is None or not content.strip():
+        return create_diary(content, session), None, gr.Timer(active=False)
+    
+    try:
+        diary_manager = get_diary_manager()
+        content = content.strip()
+        # 時間帯の境目をまたいだ再送も同じジョブ・同じ日記として扱えるよう、直前の時間帯のキーも渡す
+        keys = diary_manager.make_idempotency_keys(content)
+        payload = {"content": content, "idempotency_keys": keys}
+        # 入力中に先行分析が終わっていれば、その結果をワーカーに渡す（実行中なら待たない）
+        precomputed = diary_manager.speculative.take(content, timeout=0, session=session)
+        if precomputed:
+            payload["precomputed"] = precomputed
+        
+        job_id = _job_queue.submit("create_diary", payload, dedupe_key=keys[0], alternate_keys=keys[1:])
+        return "⏳ 日記を受け付けました。AI分析が終わるまでお待ちください...", job_id, gr.Timer(active=True)
+    except Exception as e:
+        return f"❌ エラー: {str(e)}", None, gr.Timer(active=False)
+
+def poll_diary_job(job_id):
+    """
+    日記作成ジョブの進捗を確認する関数（タイマーから定期的に呼ばれる）
+    
+    Returns:
+        結果表示、ジョブID（完了したらNone）、進捗確認タイマーの更新
+    """
+    import gradio as gr
+    
+    if not job_id or _job_queue is None:
+        return gr.update(), None, gr.Timer(active=False)
+    
+    try:
+        job = _job_queue.get(job_id)
+        if job is None:
+            return "❌ エラー: ジョブが見つかりません", None, gr.Timer(active=False)
+        if job["status"] == "queued":
+            return f"⏳ 順番待ちです（前に{job.get('queued_ahead', 0)}件）", job_id, gr.update()
+        if job["status"] == "running":
+            return "🤖 AIが日記を分析しています...", job_id, gr.update()
+        if job["status"] == "error":
+            return f"❌ エラー: {job['error']}", None, gr.Timer(active=False)
+        
+        # ワーカーのプロセスで書き込まれたので、このプロセスの一覧キャッシュを破棄
+        diary_manager = get_diary_manager()
+        diary_manager.notion_client.listing_cache.invalidate()
+        diary_manager.clear_page_cache()
+        return format_create_result(job["result"]), None, gr.Timer(active=False)
+    except Exception as e:
+        return f"❌ エラー: {str(e)}", None, gr.Timer(active=False)
+
+def prefetch_diary_analysis(content: str, session: str = None):
+    """入力中の日記のタイトル・気分を先に分析しておく（入力が落ち着いたら開始。session は画面のセッションID）"""
+    try:
+        get_diary_manager().prefetch_analysis(content or "", session)
+    except Exception:
+        # 先行分析は保存時の高速化のためだけなので、失敗しても入力は妨げない
+        pass
+
+def get_recent_diaries(limit: int = 5, cursors=None):
+    """
+    最近の日記を1ページ分取得する関数
+    
+    Args:
+        limit: 1ページの件数
+        cursors: 表示中までの各ページの開始カーソル（末尾が表示するページ、省略時は先頭ページ）
+        
+    Returns:
+        ステータス、表示用DataFrame、ページ送りの状態
+    """
+    cursors = cursors or [None]
+    state = {"cursors": cursors, "next_cursor": None}
     try:
-        result = diary_manager.get_recent_diaries(limit)
+        result = get_diary_manager().get_recent_diaries_page(int(limit), cursors[-1])
         
         if result["status"] == "success":
             diary_entries = result.get("diary_entries", [])
             
             if not diary_entries:
-                return "日記が見つかりませんでした。", None
+                return "日記が見つかりませんでした。", None, state
+            
+            state["next_cursor"] = result.get("next_cursor") if result.get("has_more") else None
             
             # DataFrameに変換して表示
             df_data = []
@@ -70,13 +187,54 @@ def get_recent_diaries(limit: int = 5):
                     "ID": entry['id'][:8] + "..."  # IDは短縮表示
                 })
             
+            import pandas as pd
             df = pd.DataFrame(df_data)
-            return f"📝 最近の日記 ({len(diary_entries)}件)", df
+            more = "（次のページあり）" if state["next_cursor"] else ""
+            return f"📝 最近の日記 {len(cursors)}ページ目 ({len(diary_entries)}件){more}", df, state
         else:
-            return f"❌ エラー: {result.get('message', '不明なエラー')}", None
+            return f"❌ エラー: {result.get('message', '不明なエラー')}", None, state
             
     except Exception as e:
-        return f"❌ エラー: {str(e)}", None
+        return f"❌ エラー: {str(e)}", None, state
+
+def get_next_diaries(limit: int, state):
+    """最近の日記の次のページを取得する関数"""
+    if not state or not state.get("next_cursor"):
+        return get_recent_diaries(limit, (state or {}).get("cursors"))
+    return get_recent_diaries(limit, state["cursors"] + [state["next_cursor"]])
+
+def get_previous_diaries(limit: int, state):
+    """最近の日記の前のページを取得する関数"""
+    cursors = (state or {}).get("cursors") or [None]
+    return get_recent_diaries(limit, cursors[:-1] or [None])
+
+def view_full_diaries(limit: int = 5):
+    """最近の日記を本文・AI分析結果付きで表示する関数"""
+    try:
+        result = get_diary_manager().get_full_diaries(int(limit))
+        
+        if result["status"] != "success":
+            return f"❌ エラー: {result.get('message', '不明なエラー')}"
+        
+        sections = []
+        for diary in result["diaries"]:
+            date = diary["created_time"][:10] if diary["created_time"] else "N/A"
+            section = f"### {diary['title']}（{date}）\n\n{diary['content'] or '（本文なし）'}\n"
+            analysis = diary.get("ai_analysis", {})
+            if analysis.get("summary"):
+                section += f"\n📊 **要約**: {analysis['summary']}\n"
+            if analysis.get("overall_mood"):
+                section += f"\n😊 **気分**: {analysis['overall_mood']}\n"
+            if analysis.get("advice"):
+                section += f"\n💡 **アドバイス**: {analysis['advice']}\n"
+            for comment in diary.get("comments", []):
+                section += f"\n💭 {comment}\n"
+            sections.append(section)
+        
+        return "\n---\n\n".join(sections)
+        
+    except Exception as e:
+        return f"❌ エラー: {str(e)}"
 
 def get_ai_analysis_demo():
     """AI分析のデモを表示"""
@@ -115,7 +273,7 @@ def get_ai_analysis_demo():
 def get_user_analytics():
     """ユーザーの分析情報を取得する関数"""
     try:
-        result = diary_manager.get_user_analytics()
+        result = get_diary_manager().get_user_analytics()
         
         if result["status"] == "success":
             profile = result.get("user_profile", {})
@@ -151,6 +309,21 @@ def get_user_analytics():
                     else:
                         analytics_text += f"📝 文章量は安定しています\n"
             
+            # 一覧取得キャッシュの効果
+            cache = result.get("notion_cache", {})
+            if cache.get("hits", 0) + cache.get("misses", 0):
+                analytics_text += f"🗂️ 日記一覧のキャッシュ: ヒット率{cache['hit_ratio'] * 100:.0f}%（API呼び出し{cache['misses']}回）\n"
+            
+            # 外部サービスの状態と、障害で後回しになっている日記
+            for breaker in result.get("circuit_breakers", []):
+                if breaker["state"] != "closed":
+                    analytics_text += f"⚠️ {breaker['name']} は障害のため一時停止中です（{breaker['state']}）\n"
+            if result.get("pending_entries"):
+                analytics_text += f"⏳ 復旧待ちの日記: {result['pending_entries']}件\n"
+            if _job_queue is not None:
+                jobs = _job_queue.get_stats()
+                analytics_text += f"👷 日記作成ジョブ: 待機{jobs.get('queued', 0)}件 / 実行中{jobs.get('running', 0)}件\n"
+            
             return analytics_text
         else:
             return f"❌ エラー: {result.get('message', '不明なエラー')}"
@@ -161,34 +334,81 @@ def get_user_analytics():
 def get_history_summary(days: int = 30):
     """履歴の要約を取得する関数"""
     try:
-        result = diary_manager.get_diary_history_summary(days)
+        result = get_diary_manager().get_diary_history_summary(days)
         
         if result["status"] == "success":
             if "message" in result:
-                return result["message"], None
+                return result["message"], None, None
             
             summary = result["summary"]
             summary_text = f"📅 過去{days}日間の日記履歴\n"
-            summary_text += f"📝 総数: {summary['total_entries']}件\n"
+            summary_text += f"📝 総数: {summary['total_entries']}件（{summary['writing_days']}日）\n"
             summary_text += f"📆 期間: {summary['date_range']['start']} ～ {summary['date_range']['end']}\n"
+            moods = "、".join(f"{mood} {count}件" for mood, count in summary["mood_counts"].items())
+            summary_text += f"🎭 気分: {moods}"
             
-            # DataFrameに変換
+            # 日別集計をDataFrameに変換
             df_data = []
-            for entry in summary["entries"]:
+            trend_data = []
+            for day in summary["days"]:
                 df_data.append({
-                    "日付": entry["date"],
-                    "タイトル": entry["title"],
-                    "気分": entry["mood"],
-                    "要約": entry["summary"][:50] + "..." if len(entry["summary"]) > 50 else entry["summary"]
+                    "日付": day["date"],
+                    "件数": day["count"],
+                    "気分": "、".join(f"{mood}×{count}" for mood, count in day["moods"].items()),
+                    "文字数": day["chars"],
+                    "タイトル": " / ".join(day["titles"])
                 })
+                for mood, count in day["moods"].items():
+                    trend_data.append({"日付": day["date"], "気分": mood, "件数": count})
             
+            import pandas as pd
             df = pd.DataFrame(df_data)
-            return summary_text, df
+            trend_df = pd.DataFrame(trend_data).sort_values("日付")
+            return summary_text, df, trend_df
         else:
-            return f"❌ エラー: {result.get('message', '不明なエラー')}", None
+            return f"❌ エラー: {result.get('message', '不明なエラー')}", None, None
             
     except Exception as e:
-        return f"❌ エラー: {str(e)}", None
+        return f"❌ エラー: {str(e)}", None, None
+
+def get_history_entries(days: int = 30, offset: int = 0, page_size: int = HISTORY_PAGE_SIZE):
+    """
+    期間内の日記を1ページ分取得する関数（ページ分の行だけを返す）
+    
+    Returns:
+        ステータス、表示用DataFrame、表示中のページの先頭位置
+    """
+    try:
+        offset = max(0, int(offset))
+        result = get_diary_manager().get_history_page(offset, page_size, int(days))
+        
+        if result["status"] != "success":
+            return f"❌ エラー: {result.get('message', '不明なエラー')}", None, offset
+        if not result["entries"]:
+            return "指定期間内の日記がありません", None, offset
+        
+        df_data = [
+            {"日付": row["date"], "タイトル": row["title"], "気分": row["mood"], "要約": row["summary"]}
+            for row in result["entries"]
+        ]
+        
+        import pandas as pd
+        end = offset + len(df_data)
+        return f"📝 {offset + 1}～{end}件目 / 全{result['total']}件", pd.DataFrame(df_data), offset
+        
+    except Exception as e:
+        return f"❌ エラー: {str(e)}", None, offset
+
+def get_next_history_entries(days: int, offset: int):
+    """期間内の日記の次のページを取得する関数"""
+    result = get_diary_manager().get_history_page(int(offset), HISTORY_PAGE_SIZE, int(days))
+    if result.get("has_more"):
+        offset = int(offset) + HISTORY_PAGE_SIZE
+    return get_history_entries(days, offset)
+
+def get_previous_history_entries(days: int, offset: int):
+    """期間内の日記の前のページを取得する関数"""
+    return get_history_entries(days, max(0, int(offset) - HISTORY_PAGE_SIZE))
 
 def update_profile(name: str, age: str, occupation: str, interests: str, goals: str):
     """プロフィールを更新する関数"""
@@ -205,7 +425,7 @@ def update_profile(name: str, age: str, occupation: str, interests: str, goals:
             "goals": goals_list
         }
         
-        result = diary_manager.update_user_profile(profile_data)
+        result = get_diary_manager().update_user_profile(profile_data)
         
         if result["status"] == "success":
             return f"✅ {result['message']}\n\n📝 更新されたプロフィール:\n名前: {name}\n年齢: {age}\n職業: {occupation}\n興味: {', '.join(interests_list)}\n目標: {', '.join(goals_list)}"
@@ -218,7 +438,7 @@ def update_profile(name: str, age: str, occupation: str, interests: str, goals:
 def get_current_profile():
     """現在のプロフィールを取得する関数"""
     try:
-        profile = diary_manager.history.get_user_profile()
+        profile = get_diary_manager().history.get_user_profile()
         
         if not profile:
             return "プロフィールが設定されていません。", "", "", "", "", ""
@@ -248,7 +468,7 @@ def add_comment_to_selected_diary(selected_row, comment: str):
     
     try:
         # 最近の日記を取得してIDを探す
-        result = diary_manager.get_recent_diaries(10)
+        result = get_diary_manager().get_recent_diaries(10)
         if result["status"] != "success":
             return f"❌ エラー: {result.get('message', '不明なエラー')}"
         
@@ -257,7 +477,7 @@ def add_comment_to_selected_diary(selected_row, comment: str):
             return "❌ 選択された日記が見つかりません。"
         
         selected_entry = diary_entries[selected_row]
-        success = diary_manager.notion_client.add_comment_to_diary(
+        success = get_diary_manager().notion_client.add_comment_to_diary(
             selected_entry['id'], 
             comment.strip()
         )
@@ -272,6 +492,15 @@ def add_comment_to_selected_diary(selected_row, comment: str):
 
 def create_app():
     """Gradioアプリケーションを作成"""
+    import gradio as gr
+    
+    # 先行分析はタブ（セッション）ごとに分ける。gr.Request はgradioの読み込み後にしか型として書けないのでここで包む
+    def prefetch_for_session(content: str, request: gr.Request):
+        prefetch_diary_analysis(content, request.session_hash)
+    
+    def submit_for_session(content: str, request: gr.Request):
+        return submit_diary(content, request.session_hash)
+    
     with gr.Blocks(
         theme=gr.themes.Soft(),
         title="📝 日記AI",
@@ -350,11 +579,29 @@ AIがタイトルを生成し、感情や体験を分析してNotionに保存し
                         lines=5
                     )
                     
+                    # 入力中にタイトル・気分を先行分析（保存時に結果を再利用）
+                    content_input.change(
+                        fn=prefetch_for_session,
+                        inputs=[content_input],
+                        outputs=None,
+                        show_progress="hidden"
+                    )
+                    
+                    # 日記作成はジョブとして登録し、完了するまでタイマーで進捗を確認する
+                    job_state = gr.State(None)
+                    job_timer = gr.Timer(1.0, active=False)
+                    
                     # ボタンクリック時の処理
                     create_btn.click(
-                        fn=create_diary,
+                        fn=submit_for_session,
                         inputs=[content_input],
-                        outputs=[result_output]
+                        outputs=[result_output, job_state, job_timer]
+                    )
+                    job_timer.tick(
+                        fn=poll_diary_job,
+                        inputs=[job_state],
+                        outputs=[result_output, job_state, job_timer],
+                        show_progress="hidden"
                     )
             
             # タブ2: 最近の日記
@@ -372,10 +619,16 @@ AIがタイトルを生成し、感情や体験を分析してNotionに保存し
                         maximum=20,
                         value=5,
                         step=1,
-                        label="表示件数"
+                        label="1ページの表示件数"
                     )
                     
-                    load_btn = gr.Button("📚 日記を読み込み", variant="secondary")
+                    with gr.Row():
+                        prev_btn = gr.Button("◀ 前へ")
+                        load_btn = gr.Button("📚 日記を読み込み", variant="secondary")
+                        next_btn = gr.Button("次へ ▶")
+                    
+                    # 表示中のページまでのカーソル（Notionのページ送りは前方向のみなので履歴を持つ）
+                    diaries_page_state = gr.State({"cursors": [None], "next_cursor": None})
                     
                     diaries_status = gr.Textbox(
                         label="ステータス",
@@ -388,11 +641,30 @@ AIがタイトルを生成し、感情や体験を分析してNotionに保存し
                         label="日記一覧"
                     )
                     
+                    # 本文・AI分析結果まで表示（各ページの内容は並行して取得）
+                    view_btn = gr.Button("📖 最近の日記を全文で読む", variant="secondary")
+                    full_diaries_output = gr.Markdown()
+                    
                     # 日記読み込み処理
                     load_btn.click(
                         fn=get_recent_diaries,
                         inputs=[limit_input],
-                        outputs=[diaries_status, diaries_table]
+                        outputs=[diaries_status, diaries_table, diaries_page_state]
+                    )
+                    next_btn.click(
+                        fn=get_next_diaries,
+                        inputs=[limit_input, diaries_page_state],
+                        outputs=[diaries_status, diaries_table, diaries_page_state]
+                    )
+                    prev_btn.click(
+                        fn=get_previous_diaries,
+                        inputs=[limit_input, diaries_page_state],
+                        outputs=[diaries_status, diaries_table, diaries_page_state]
+                    )
+                    view_btn.click(
+                        fn=view_full_diaries,
+                        inputs=[limit_input],
+                        outputs=[full_diaries_output]
                     )
             
             # タブ3: プロフィール設定
@@ -487,12 +759,37 @@ AIがタイトルを生成し、感情や体験を分析してNotionに保存し
                     history_status = gr.Textbox(
                         label="履歴ステータス",
                         interactive=False,
-                        lines=3
+                        lines=4
+                    )
+                    
+                    history_trend = gr.BarPlot(
+                        x="日付",
+                        y="件数",
+                        color="気分",
+                        title="日別の気分の推移",
+                        label="気分の推移"
                     )
                     
                     history_table = gr.DataFrame(
+                        headers=["日付", "件数", "気分", "文字数", "タイトル"],
+                        label="日別の記録"
+                    )
+                    
+                    # 期間内の日記（20件ずつ表示）
+                    with gr.Row():
+                        entries_prev_btn = gr.Button("◀ 前へ")
+                        entries_btn = gr.Button("📖 日記一覧を表示", variant="secondary")
+                        entries_next_btn = gr.Button("次へ ▶")
+                    
+                    entries_offset = gr.State(0)
+                    entries_status = gr.Textbox(
+                        label="一覧ステータス",
+                        interactive=False,
+                        lines=1
+                    )
+                    entries_table = gr.DataFrame(
                         headers=["日付", "タイトル", "気分", "要約"],
-                        label="日記履歴"
+                        label="日記一覧"
                     )
                     
                     # イベント処理
@@ -504,7 +801,23 @@ AIがタイトルを生成し、感情や体験を分析してNotionに保存し
                     history_btn.click(
                         fn=get_history_summary,
                         inputs=[history_days],
-                        outputs=[history_status, history_table]
+                        outputs=[history_status, history_table, history_trend]
+                    )
+                    
+                    entries_btn.click(
+                        fn=get_history_entries,
+                        inputs=[history_days],
+                        outputs=[entries_status, entries_table, entries_offset]
+                    )
+                    entries_next_btn.click(
+                        fn=get_next_history_entries,
+                        inputs=[history_days, entries_offset],
+                        outputs=[entries_status, entries_table, entries_offset]
+                    )
+                    entries_prev_btn.click(
+                        fn=get_previous_history_entries,
+                        inputs=[history_days, entries_offset],
+                        outputs=[entries_status, entries_table, entries_offset]
                     )
             
             # タブ5: AI分析について
@@ -525,5 +838,22 @@ AIがタイトルを生成し、感情や体験を分析してNotionに保存し
     return app
 
 if __name__ == "__main__":
-    app = create_app()
-    app.launch(server_name="0.0.0.0", server_port=7862) 
\ No newline at end of file
+    # 日記作成（AI分析・Notion保存）はワーカープロセスで実行し、Webサーバーのスレッドを占有しない
+    try:
+        import config
+        workers = getattr(config, "WORKER_PROCESSES", 2)
+    except ImportError:
+        workers = 0
+    pool = start_workers(workers) if workers > 0 else None
+    
+    # JSON API（/v1）と Gradio UI（/）を同じサーバーで提供する
+    import gradio as gr
+    import uvicorn
+    from api import create_api
+    
+    server = gr.mount_gradio_app(create_api(get_diary_manager, lambda: _job_queue), create_app(), path="/")
+    try:
+        uvicorn.run(server, host="0.0.0.0", port=7862)
+    finally:
+        if pool is not None:
+            pool.stop() 
\ No newline at end of file
@@ -0,0 +1,212 @@
+"""
+Notion API非同期クライアント
+日記ページの本文・AI分析結果（ブロック）を複数ページ分まとめて並行取得する
+"""
+
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional
+
+from circuit_breaker import CircuitBreaker
+from notion_diary_client import is_outage_error
+
+# 分析結果の吹き出し（NotionDiaryClient.build_analysis_blocks）の接頭辞 -> 取り出す項目
+ANALYSIS_PREFIXES = {
+    "📊 要約: ": "summary",
+    "💡 アドバイス: ": "advice",
+    "😊 全体的な気分: ": "overall_mood"
+}
+COMMENT_PREFIX = "💭 コメント: "
+
+
+def block_text(block: Dict[str, Any]) -> str:
+    """ブロックの rich_text をつなげたテキスト"""
+    body = block.get(block.get("type", ""), {})
+    return "".join(element.get("plain_text") or element.get("text", {}).get("content", "")
+                   for element in body.get("rich_text", []))
+
+
+def parse_diary_blocks(blocks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    日記ページのブロックから本文・AI分析結果・コメントを取り出す
+
+    Args:
+        blocks: ページ直下のブロック（上から順）
+
+    Returns:
+        content, ai_analysis, comments を持つ辞書
+    """
+    content_parts = []
+    ai_analysis: Dict[str, Any] = {}
+    comments = []
+    in_analysis = False
+
+    for block in blocks:
+        block_type = block.get("type")
+        if block_type == "divider":
+            # 区切り線より後はAI分析結果
+            in_analysis = True
+            continue
+
+        text = block_text(block)
+        if block_type == "callout" and text.startswith(COMMENT_PREFIX):
+            comments.append(text[len(COMMENT_PREFIX):])
+        elif in_analysis and block_type == "callout":
+            for prefix, key in ANALYSIS_PREFIXES.items():
+                if text.startswith(prefix):
+                    ai_analysis[key] = text[len(prefix):]
+        elif not in_analysis and block_type == "paragraph":
+            content_parts.append(text)
+
+    # 長い本文は NotionDiaryClient が文の途中で複数ブロックに分けて書くので、区切りなしでつなげる
+    return {"content": "".join(content_parts), "ai_analysis": ai_analysis, "comments": comments}
+
+
+def page_title(page: Dict[str, Any]) -> str:
+    """ページの「タイトル」プロパティ（取得できなければ「タイトル取得エラー」）"""
+    try:
+        return page["properties"]["タイトル"]["title"][0]["text"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return "タイトル取得エラー"
+
+
+class AsyncNotionDiaryClient:
+    def __init__(self, api_key: str, database_id: str, max_concurrency: int = 8, max_retries: int = 3,
+                 circuit_breaker: Optional[CircuitBreaker] = None):
+        """
+        Notion非同期クライアントを初期化
+
+        Args:
+            api_key: Notion API キー
+            database_id: 日記データベースのID
+            max_concurrency: 同時に実行するAPI呼び出しの最大数
+            max_retries: レート制限（429）時に再試行する回数
+            circuit_breaker: 呼び出しの成否を記録するサーキットブレーカー（同期クライアントと共有する）
+        """
+        self.api_key = api_key
+        self.database_id = database_id
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.circuit_breaker = circuit_breaker or CircuitBreaker("Notion")
+        self.logger = logging.getLogger(__name__)
+
+        # AsyncClientはイベントループに結び付くので、使うループの中で初めて作成する
+        self._client = None
+
+    @property
+    def client(self):
+        """Notion非同期クライアント（初回アクセス時に作成）"""
+        if self._client is None:
+            from notion_client import AsyncClient
+            self._client = AsyncClient(auth=self.api_key)
+        return self._client
+
+    @client.setter
+    def client(self, value):
+        self._client = value
+
+    async def aclose(self):
+        """HTTP接続を閉じる"""
+        if self._client is not None and hasattr(self._client, "aclose"):
+            await self._client.aclose()
+        self._client = None
+
+    async def _call(self, function, **kwargs) -> Dict[str, Any]:
+        """
+        API呼び出し（結果をサーキットブレーカーに記録し、レート制限時は少し待って再試行）
+
+        Raises:
+            CircuitOpenError: ブレーカーが開いている場合（呼び出さない）
+        """
+        for attempt in range(self.max_retries + 1):
+            self.circuit_breaker.before_call()
+            try:
+                response = await function(**kwargs)
+            except Exception as e:
+                if is_outage_error(e):
+                    self.circuit_breaker.record_failure()
+                else:
+                    self.circuit_breaker.record_release()
+                if getattr(e, "code", None) != "rate_limited" or attempt == self.max_retries:
+                    raise
+                await asyncio.sleep(1.0 * (attempt + 1))
+                continue
+            self.circuit_breaker.record_success()
+            return response
+
+    async def get_diary_entries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        日記ページ（メタデータのみ）を新しい順に取得
+
+        Args:
+            limit: 取得する件数（最大100）
+
+        Returns:
+            ページのリスト
+        """
+        response = await self._call(
+            self.client.databases.query,
+            database_id=self.database_id,
+            sorts=[{"property": "作成日時", "direction": "descending"}],
+            page_size=min(max(1, limit), 100)
+        )
+        return response.get("results", [])
+
+    async def get_page_blocks(self, page_id: str) -> List[Dict[str, Any]]:
+        """
+        ページ直下のブロックをすべて取得（100件ごとのページ送りも行う）
+
+        Args:
+            page_id: ページID
+
+        Returns:
+            ブロックのリスト
+        """
+        blocks = []
+        cursor: Optional[str] = None
+        while True:
+            kwargs = {"block_id": page_id, "page_size": 100}
+            if cursor:
+                kwargs["start_cursor"] = cursor
+            response = await self._call(self.client.blocks.children.list, **kwargs)
+            blocks.extend(response.get("results", []))
+            if not response.get("has_more"):
+                return blocks
+            cursor = response.get("next_cursor")
+
+    async def hydrate_pages(self, pages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        複数ページの本文・AI分析結果を並行して取得
+
+        Args:
+            pages: get_diary_entries で取得したページのリスト
+
+        Returns:
+            id, title, created_time, content, ai_analysis, comments を持つ辞書のリスト（ページと同じ順）
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def hydrate(page: Dict[str, Any]) -> Dict[str, Any]:
+            entry = {"id": page["id"], "title": page_title(page), "created_time": page.get("created_time", "")}
+            try:
+                async with semaphore:
+                    blocks = await self.get_page_blocks(page["id"])
+                entry.update(parse_diary_blocks(blocks))
+            except Exception as e:
+                self.logger.error(f"日記本文取得エラー ({page['id']}): {e}")
+                entry.update({"content": "", "ai_analysis": {}, "comments": [], "error": str(e)})
+            return entry
+
+        return await asyncio.gather(*(hydrate(page) for page in pages))
+
+    async def get_full_diaries(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        最近の日記を本文・AI分析結果付きで取得（一覧1回＋各ページの取得を並行）
+
+        Args:
+            limit: 取得する件数
+
+        Returns:
+            日記のリスト（新しい順）
+        """
+        return await self.hydrate_pages(await self.get_diary_entries(limit))
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+保存済み日記のオフライン再分析（OpenAI Batch API）
+DiaryHistoryの全日記からBatch API用のJSONLリクエストファイルを作り、
+送信・完了待ちを行って、結果をエントリIDごとに履歴へ反映する
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional, Set
+
+# 現在のディレクトリをパスに追加
+sys.path.append(os.path.dirname(__file__))
+
+from prompt_templates import PROMPT_VERSION
+
+DEFAULT_TASKS = ("emotion", "summary", "advice")
+# 分析タスク名 -> 履歴のai_analysis上のキー
+TASK_FIELDS = {"emotion": "emotions", "summary": "summary", "advice": "advice"}
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchReanalyzer:
+    def __init__(self, diary_manager, work_dir: str = None):
+        """
+        再分析ジョブを初期化
+
+        Args:
+            diary_manager: DiaryManagerインスタンス
+            work_dir: リクエスト/結果ファイルとジョブ状態の保存先（省略時は data/reanalysis）
+        """
+        self.diary_manager = diary_manager
+        self.ai_analyzer = diary_manager.ai_analyzer
+        self.history = diary_manager.history
+        self.work_dir = work_dir or os.path.join(self.history.data_dir, "reanalysis")
+        self.state_file = os.path.join(self.work_dir, "batch_state.json")
+        self.logger = logging.getLogger(__name__)
+
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def build_request_file(self, path: str, tasks=DEFAULT_TASKS, only: Optional[Set[str]] = None) -> int:
+        """
+        全日記分のBatch APIリクエストファイル（JSONL）を作成
+        （アドバイスには、同期処理と同じく各日記を書いた日の前日までの履歴から作った文脈を付ける）
+
+        Args:
+            path: 出力先のJSONLファイル
+            tasks: 再実行する分析タスク
+            only: 指定した場合はこの custom_id（"エントリID:タスク"）のリクエストのみ書き出す
+
+        Returns:
+            書き出したリクエスト数
+        """
+        profile_prefix = self.diary_manager.profile_manager.get_profile_prefix()
+
+        count = 0
+        # 文脈の作成は履歴ファイルを読み直すので、同じ日の日記では1回だけ作る
+        contexts: Dict[str, str] = {}
+        with open(path, 'w', encoding='utf-8') as f:
+            for entry in self.history.get_all_entries():
+                entry_tasks = [t for t in tasks if only is None or f"{entry['id']}:{t}" in only]
+                context = ""
+                if "advice" in entry_tasks:
+                    date = entry["created_at"][:10]
+                    if date not in contexts:
+                        contexts[date] = self.history.get_context_for_analysis(as_of=datetime.fromisoformat(date))
+                    context = contexts[date]
+                for task in entry_tasks:
+                    request = {
+                        "custom_id": f"{entry['id']}:{task}",
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": self.ai_analyzer.build_request(task, entry["content"], context, profile_prefix)
+                    }
+                    f.write(json.dumps(request, ensure_ascii=False) + "\n")
+                    count += 1
+        return count
+
+    def submit(self, request_file: str) -> str:
+        """
+        リクエストファイルをアップロードしてバッチを作成
+
+        Returns:
+            バッチID
+        """
+        client = self.ai_analyzer.client
+        with open(request_file, 'rb') as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+            metadata={"description": "diary reanalysis"}
+        )
+        self._save_state({"batch_id": batch.id, "submitted_at": datetime.now().isoformat()})
+        self.logger.info(f"バッチ送信完了: {batch.id}")
+        return batch.id
+
+    def wait(self, batch_id: str, poll_interval: float = 30.0, timeout: Optional[float] = None):
+        """
+        バッチが終了状態になるまでポーリング
+
+        Returns:
+            終了時のバッチオブジェクト
+        """
+        started = time.monotonic()
+        while True:
+            batch = self.ai_analyzer.client.batches.retrieve(batch_id)
+            counts = getattr(batch, "request_counts", None)
+            if counts is not None:
+                self.logger.info(f"バッチ状態: {batch.status} ({counts.completed}/{counts.total}件完了)")
+
+            if batch.status in FINAL_STATUSES:
+                return batch
+            if timeout is not None and time.monotonic() - started > timeout:
+                raise TimeoutError(f"バッチ {batch_id} が時間内に完了しませんでした（状態: {batch.status}）")
+            time.sleep(poll_interval)
+
+    def merge_results(self, output_text: str, error_text: str = "") -> Dict[str, Any]:
+        """
+        バッチ出力（JSONL）を解析してエントリIDごとに履歴へ反映
+
+        Args:
+            output_text: 出力ファイルの内容
+            error_text: エラーファイルの内容（失敗したリクエスト）
+
+        Returns:
+            updated（更新したエントリ数）, failed（失敗したリクエストの custom_id のリスト）
+        """
+        updates: Dict[int, Dict[str, Any]] = {}
+        failed = []
+
+        for line in (output_text + "\n" + error_text).splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            entry_id, _, task = record["custom_id"].partition(":")
+
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                failed.append(record["custom_id"])
+                error = record.get("error") or (response.get("body") or {}).get("error")
+                self.logger.warning(f"再分析失敗 ({record['custom_id']}): {error}")
+                continue
+
+            content = response["body"]["choices"][0]["message"]["content"]
+            if task == "emotion":
+                value = self.ai_analyzer.parse_emotion_response(content)
+            else:
+                value = content
+            updates.setdefault(int(entry_id), {})[TASK_FIELDS[task]] = value
+
+        for fields in updates.values():
+            fields["reanalyzed_at"] = datetime.now().isoformat()
+            fields["prompt_version"] = PROMPT_VERSION
+
+        if failed:
+            self.logger.warning(f"{len(failed)}件のリクエストが失敗しました")
+        return {"updated": self.history.update_ai_analysis(updates), "failed": failed}
+
+    def run(self, tasks=DEFAULT_TASKS, poll_interval: float = 30.0, resume: bool = True,
+            retry_failed: bool = False) -> Dict[str, Any]:
+        """
+        リクエスト作成・送信・完了待ち・反映までを通しで実行
+        （resume=Trueなら送信済みで未反映のバッチの完了待ちから再開）
+
+        Args:
+            tasks: 再実行する分析タスク
+            poll_interval: 完了確認の間隔（秒）
+            resume: 送信済みで未反映のバッチがあれば再開する
+            retry_failed: 前回反映したバッチで失敗したリクエストだけを送り直す
+
+        Returns:
+            実行結果（failed は失敗したリクエスト数）
+        """
+        state = self._load_state() if resume or retry_failed else {}
+        batch_id = state.get("batch_id") if not state.get("merged_at") else None
+
+        if not batch_id:
+            only = None
+            if retry_failed:
+                only = set(state.get("failed", [])) if state.get("merged_at") else set()
+                if not only:
+                    return {"status": "success", "message": "送り直す失敗したリクエストがありません", "updated": 0}
+            request_file = os.path.join(self.work_dir, f"requests_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl")
+            request_count = self.build_request_file(request_file, tasks, only=only)
+            if request_count == 0:
+                return {"status": "success", "message": "再分析する日記がありません", "updated": 0}
+            batch_id = self.submit(request_file)
+
+        batch = self.wait(batch_id, poll_interval)
+        if batch.status != "completed":
+            return {"status": "error", "message": f"バッチが完了しませんでした（状態: {batch.status}）", "batch_id": batch_id}
+
+        # すべてのリクエストが失敗した場合は出力ファイルがなく、エラーファイルだけがある
+        texts = {}
+        for kind, file_id in (("output", batch.output_file_id), ("errors", getattr(batch, "error_file_id", None))):
+            texts[kind] = self.ai_analyzer.client.files.content(file_id).text if file_id else ""
+            if file_id:
+                with open(os.path.join(self.work_dir, f"{kind}_{batch_id}.jsonl"), 'w', encoding='utf-8') as f:
+                    f.write(texts[kind])
+
+        merged = self.merge_results(texts["output"], texts["errors"])
+        self._save_state({"batch_id": batch_id, "merged_at": datetime.now().isoformat(), "failed": merged["failed"]})
+        return {"status": "success", "batch_id": batch_id, "updated": merged["updated"], "failed": len(merged["failed"])}
+
+    def _load_state(self) -> Dict[str, Any]:
+        """ジョブ状態を読み込む"""
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            self.logger.error(f"バッチ状態読み込みエラー: {e}")
+        return {}
+
+    def _save_state(self, state: Dict[str, Any]):
+        """ジョブ状態を保存"""
+        try:
+            with open(self.state_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            self.logger.error(f"バッチ状態保存エラー: {e}")
+
+
+def main():
+    """コマンドラインから再分析を実行"""
+    parser = argparse.ArgumentParser(description="保存済みの全日記をBatch APIで再分析します")
+    parser.add_argument("--tasks", default=",".join(DEFAULT_TASKS),
+                        help="再分析するタスク（カンマ区切り: emotion,summary,advice）")
+    parser.add_argument("--poll-interval", type=float, default=30.0, help="完了確認の間隔（秒）")
+    parser.add_argument("--base-url", default=None, help="OpenAI互換APIのURL（ローカルの代替サーバーでのテスト用）")
+    parser.add_argument("--new", action="store_true", help="送信済みのバッチを再開せず新しく作成する")
+    parser.add_argument("--retry-failed", action="store_true", help="前回のバッチで失敗したリクエストだけを送り直す")
+    args = parser.parse_args()
+
+    tasks = [t.strip() for t in args.tasks.split(",") if t.strip()]
+    unknown = [t for t in tasks if t not in TASK_FIELDS]
+    if unknown:
+        parser.error(f"未知のタスク: {', '.join(unknown)}")
+
+    try:
+        import config
+    except ImportError:
+        print("エラー: src/config.pyファイルが見つかりません。")
+        sys.exit(1)
+
+    from diary_manager import DiaryManager
+
+    diary_manager = DiaryManager.from_config(config, openai_base_url=args.base_url)
+
+    reanalyzer = BatchReanalyzer(diary_manager)
+    print("🔄 再分析バッチを実行中...")
+    result = reanalyzer.run(tasks, poll_interval=args.poll_interval, resume=not args.new,
+                            retry_failed=args.retry_failed)
+
+    if result["status"] == "success":
+        print(f"✅ 再分析完了: {result.get('updated', 0)}件の日記を更新しました")
+        if result.get("failed"):
+            print(f"⚠️ {result['failed']}件のリクエストが失敗しました（--retry-failed で送り直せます）")
+    else:
+        print(f"❌ エラー: {result['message']}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
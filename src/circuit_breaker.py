@@ -0,0 +1,117 @@
+"""
+サーキットブレーカー
+外部サービス（OpenAI, Notion）の障害が続いたときに呼び出しを一定時間止め、
+タイムアウトを待たずにすぐ失敗させる
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+CLOSED = "closed"        # 通常どおり呼び出す
+OPEN = "open"            # 呼び出さずにすぐ失敗させる
+HALF_OPEN = "half_open"  # 待機時間が過ぎたので1回だけ試す
+
+
+class CircuitOpenError(Exception):
+    """ブレーカーが開いているため呼び出さなかったことを示す例外"""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 3, cooldown_seconds: float = 30.0):
+        """
+        サーキットブレーカーを初期化
+
+        Args:
+            name: 対象サービスの名前（ログ・エラーメッセージ用）
+            failure_threshold: 連続で何回失敗したら開くか
+            cooldown_seconds: 開いてから試しに呼び出すまでの秒数
+        """
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self.logger = logging.getLogger(__name__)
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "failures": 0, "rejected": 0, "opened": 0}
+        # 閉じた（復旧した）ときに呼ぶ関数
+        self._on_close: List[Callable[[], Any]] = []
+
+    @property
+    def state(self) -> str:
+        """現在の状態（待機時間が過ぎていれば half_open）"""
+        with self._lock:
+            if self._state == OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                return HALF_OPEN
+            return self._state
+
+    def is_available(self) -> bool:
+        """今呼び出してよいか（開いていてまだ待機中ならFalse）"""
+        return self.state != OPEN
+
+    def on_close(self, callback: Callable[[], Any]):
+        """復旧したときに呼ぶ関数を登録"""
+        self._on_close.append(callback)
+
+    def before_call(self):
+        """
+        呼び出し前に確認する
+
+        Raises:
+            CircuitOpenError: 開いていて待機中の場合、または試しの呼び出しが実行中の場合
+        """
+        with self._lock:
+            if self._state == OPEN:
+                if time.monotonic() - self._opened_at < self.cooldown_seconds:
+                    self._stats["rejected"] += 1
+                    raise CircuitOpenError(f"{self.name} は障害のため一時的に利用を停止しています")
+                # 待機時間が過ぎたので1回だけ試す
+                self._state = HALF_OPEN
+            elif self._state == HALF_OPEN:
+                self._stats["rejected"] += 1
+                raise CircuitOpenError(f"{self.name} の復旧を確認中です")
+            self._stats["calls"] += 1
+
+    def record_success(self):
+        """呼び出しの成功を記録（試しの呼び出しが成功したら閉じる）"""
+        with self._lock:
+            recovered = self._state != CLOSED
+            self._state = CLOSED
+            self._failures = 0
+        if recovered:
+            self.logger.info(f"{self.name} が復旧しました")
+            for callback in self._on_close:
+                try:
+                    callback()
+                except Exception as e:
+                    self.logger.error(f"復旧時処理エラー ({self.name}): {e}")
+
+    def record_failure(self):
+        """障害による失敗を記録（連続失敗が閾値に達したか、試しの呼び出しが失敗したら開く）"""
+        with self._lock:
+            self._failures += 1
+            self._stats["failures"] += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self._stats["opened"] += 1
+                    self.logger.warning(f"{self.name} の連続失敗が続いたため {self.cooldown_seconds:.0f}秒間呼び出しを停止します")
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+
+    def record_release(self):
+        """障害と無関係な失敗（入力エラーなど）で試しの呼び出しが終わったときに呼ぶ"""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = OPEN
+                # 次の呼び出しですぐ試せるようにする
+                self._opened_at = time.monotonic() - self.cooldown_seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        """状態と呼び出し回数の集計"""
+        state = self.state
+        with self._lock:
+            return dict(self._stats, name=self.name, state=state, consecutive_failures=self._failures)
@@ -6,31 +6,94 @@
 
 import sys
 import os
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from typing import Dict, Any, List
 
 # 現在のディレクトリをパスに追加
 sys.path.append(os.path.dirname(__file__))
 
 from diary_manager import DiaryManager
 
-# 設定ファイルの読み込み
-try:
-    import config
-    NOTION_API_KEY = config.NOTION_API_KEY
-    NOTION_DATABASE_ID = config.NOTION_DATABASE_ID
-    OPENAI_API_KEY = config.OPENAI_API_KEY
-except ImportError:
-    print("エラー: src/config.pyファイルが見つかりません。")
-    print("src/config.pyを確認して、適切な値を設定してください。")
-    sys.exit(1)
+def load_config():
+    """設定ファイルを読み込む（--helpなどでは読み込まない）"""
+    try:
+        import config
+        return config
+    except ImportError:
+        print("エラー: src/config.pyファイルが見つかりません。")
+        print("src/config.pyを確認して、適切な値を設定してください。")
+        sys.exit(1)
+
+def build_parser() -> argparse.ArgumentParser:
+    """コマンドライン引数のパーサーを作成"""
+    parser = argparse.ArgumentParser(
+        description="日記AI - CLI版（サブコマンドなしで対話メニューを起動します）"
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    
+    create_parser = subparsers.add_parser("create", help="日記を作成してAI分析（複数可）")
+    create_parser.add_argument("files", nargs="*", help="日記ファイル（1ファイル1日記。省略時は標準入力）")
+    create_parser.add_argument("--jsonl", action="store_true",
+                               help='入力をJSONL（1行1日記: {"content": ..., "title": ..., "date": ...}）として読む')
+    create_parser.add_argument("--title", help="タイトル（省略時はAIが生成）")
+    create_parser.add_argument("--date", help="日付（YYYY-MM-DD）")
+    create_parser.add_argument("--workers", type=int, default=1, help="同時に処理する日記数（デフォルト: 1）")
+    
+    list_parser = subparsers.add_parser("list", help="最近の日記を表示")
+    list_parser.add_argument("--limit", type=int, default=5, help="取得件数（デフォルト: 5）")
+    
+    view_parser = subparsers.add_parser("view", help="最近の日記を本文・AI分析結果付きで表示")
+    view_parser.add_argument("--limit", type=int, default=20, help="取得件数（デフォルト: 20）")
+    
+    comment_parser = subparsers.add_parser("comment", help="日記にコメントを追加")
+    comment_parser.add_argument("page_id", help="日記ページのID")
+    comment_parser.add_argument("text", nargs="?", help="コメント（省略時は標準入力）")
+    
+    subparsers.add_parser("analytics", help="分析レポートを表示")
+    
+    history_parser = subparsers.add_parser("history", help="日記履歴の要約を表示")
+    history_parser.add_argument("--days", type=int, default=30, help="過去何日分か（デフォルト: 30）")
+    
+    export_parser = subparsers.add_parser("export", help="日記履歴をエクスポート（JSONL/CSV/Parquet）")
+    export_parser.add_argument("--start", help="開始日（YYYY-MM-DD）")
+    export_parser.add_argument("--end", help="終了日（YYYY-MM-DD）")
+    export_parser.add_argument("--output", "-o", help="出力ファイル（省略時は標準出力）")
+    export_parser.add_argument("--format", "-f", choices=["jsonl", "csv", "parquet"],
+                               help="出力形式（省略時は出力ファイルの拡張子から判断、標準出力ならjsonl）")
+    export_parser.add_argument("--fields",
+                               help="出力する項目（カンマ区切り。例: created_at,title,ai_analysis.summary）")
+    
+    subparsers.add_parser("resume-pending",
+                          help="途中で失敗した日記作成を続きから再開し、後回しになったAI分析・Notion保存をやり直す")
+    
+    subparsers.add_parser("refresh-digests",
+                          help="アドバイスの長期の文脈に使う週・月の振り返りを生成（インポート後など）")
+    
+    subparsers.add_parser("add-idempotency-property",
+                          help="Notionの日記データベースに「冪等キー」プロパティを追加（再送時のページ重複をNotion側でも防ぐ）")
+    
+    return parser
+
+def create_diary_manager(config) -> DiaryManager:
+    """設定から日記管理システムを作成"""
+    return DiaryManager.from_config(config)
 
 def main():
     """メイン関数"""
+    args = build_parser().parse_args()
+    config = load_config()
+    
+    if args.command:
+        sys.exit(run_command(args, create_diary_manager(config)))
+    
     print("🗒️  日記AI - Notion連携アプリ")
     print("=" * 50)
     
     # OpenAI APIキーのチェック
-    if OPENAI_API_KEY == "your_openai_api_key_here":
+    if config.OPENAI_API_KEY == "your_openai_api_key_here":
         print("⚠️  OpenAI APIキーが設定されていません。")
         print("src/config.pyファイルのOPENAI_API_KEYを実際のAPIキーに変更してください。")
         print("AI機能なしで続行しますか？ (y/N): ", end="")
@@ -40,11 +103,7 @@ def main():
     
     # 日記管理システムを初期化
     try:
-        diary_manager = DiaryManager(
-            notion_api_key=NOTION_API_KEY,
-            notion_database_id=NOTION_DATABASE_ID,
-            openai_api_key=OPENAI_API_KEY
-        )
+        diary_manager = create_diary_manager(config)
         print("✅ システム初期化完了")
     except Exception as e:
         print(f"❌ システム初期化エラー: {e}")
@@ -191,5 +250,124 @@ def add_comment_to_diary(diary_manager: DiaryManager):
     except Exception as e:
         print(f"❌ エラー: {e}")
 
+def read_diary_inputs(args) -> List[Dict[str, Any]]:
+    """
+    createサブコマンドの入力（ファイルまたは標準入力）を日記のリストにする
+    
+    Raises:
+        ValueError: JSONLの行がJSONとして読めない場合（メッセージに入力と行番号を含む）
+    """
+    sources = []
+    if args.files:
+        for path in args.files:
+            with open(path, 'r', encoding='utf-8') as f:
+                sources.append((path, f.read()))
+    else:
+        sources.append(("<stdin>", sys.stdin.read()))
+    
+    diaries = []
+    for name, text in sources:
+        if args.jsonl:
+            for number, line in enumerate(text.splitlines(), start=1):
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        raise ValueError(f"{name} line {number}: {e}")
+                    if not isinstance(record, dict):
+                        raise ValueError(f"{name} line {number}: JSONオブジェクトではありません")
+                    diaries.append({
+                        "content": (record.get("content") or "").strip(),
+                        "title": record.get("title") or args.title,
+                        "date": record.get("date") or args.date
+                    })
+        else:
+            diaries.append({"content": text.strip(), "title": args.title, "date": args.date})
+    
+    return [d for d in diaries if d["content"]]
+
+def run_command(args, diary_manager: DiaryManager) -> int:
+    """
+    サブコマンドを実行して結果をJSONで標準出力に書き出す
+    
+    Returns:
+        終了コード（エラーがあれば1）
+    """
+    if args.command == "create":
+        try:
+            diaries = read_diary_inputs(args)
+        except (ValueError, OSError) as e:
+            # 入力が読めない場合も、他のサブコマンドと同じ形式のJSONでエラーを返す
+            json.dump({"status": "error", "message": str(e)}, sys.stdout, ensure_ascii=False, indent=2)
+            sys.stdout.write("\n")
+            return 1
+        
+        def create(diary):
+            return diary_manager.create_diary_with_analysis(diary["content"], diary["title"], diary["date"])
+        
+        # 1つのDiaryManager（=同じHTTP接続プール）を全日記で使い回す
+        with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+            results = list(executor.map(create, diaries))
+        
+        output = {"count": len(results), "results": results}
+        ok = all(r["status"] == "success" for r in results)
+    elif args.command == "list":
+        output = diary_manager.get_recent_diaries(args.limit)
+        ok = output["status"] == "success"
+    elif args.command == "view":
+        output = diary_manager.get_full_diaries(args.limit)
+        ok = output["status"] == "success"
+    elif args.command == "comment":
+        comment = (args.text if args.text is not None else sys.stdin.read()).strip()
+        if not comment:
+            output = {"status": "error", "message": "コメントは必須です"}
+        elif diary_manager.notion_client.add_comment_to_diary(args.page_id, comment):
+            output = {"status": "success", "page_id": args.page_id}
+        else:
+            output = {"status": "error", "message": "コメントの追加に失敗しました"}
+        ok = output["status"] == "success"
+    elif args.command == "analytics":
+        output = diary_manager.get_user_analytics()
+        ok = output["status"] == "success"
+    elif args.command == "history":
+        output = diary_manager.get_diary_history_summary(args.days)
+        ok = output["status"] == "success"
+    elif args.command == "resume-pending":
+        output = diary_manager.resume_pending_jobs()
+        ok = output["failed"] == 0 and output["backfill"]["status"] != "error"
+    elif args.command == "refresh-digests":
+        output = diary_manager.refresh_digests()
+        ok = output["status"] != "error"
+    elif args.command == "add-idempotency-property":
+        output = diary_manager.notion_client.add_idempotency_property()
+        ok = output["status"] == "success"
+    elif args.command == "export":
+        from diary_exporter import DiaryExporter
+        
+        fmt = args.format
+        if fmt is None:
+            extension = os.path.splitext(args.output or "")[1].lstrip(".").lower()
+            fmt = extension if extension in ("csv", "parquet") else "jsonl"
+        fields = [f.strip() for f in args.fields.split(",") if f.strip()] if args.fields else None
+        
+        try:
+            stats = DiaryExporter(diary_manager.history).export(fmt, args.output, args.start, args.end, fields)
+            output = dict(stats, status="success")
+        except (ValueError, RuntimeError) as e:
+            output = {"status": "error", "message": str(e)}
+        ok = output["status"] == "success"
+        
+        # 標準出力にはエクスポートした内容を書いているので、結果は標準エラーに出す
+        if not args.output:
+            json.dump(output, sys.stderr, ensure_ascii=False, default=str)
+            sys.stderr.write("\n")
+            return 0 if ok else 1
+    else:
+        raise ValueError(f"未知のコマンドです: {args.command}")
+    
+    json.dump(output, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    sys.stdout.write("\n")
+    return 0 if ok else 1
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
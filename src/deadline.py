@@ -0,0 +1,62 @@
+"""
+処理全体の期限（デッドライン）
+日記作成1回分の時間予算を各段階に引き継ぎ、API呼び出しごとのタイムアウトを残り時間から決める
+"""
+
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """期限までに呼び出しを始める時間が残っていないことを示す例外"""
+
+
+class Deadline:
+    def __init__(self, seconds: float, expires_at: Optional[float] = None):
+        """
+        期限を初期化
+
+        Args:
+            seconds: 今から何秒後を期限とするか
+            expires_at: 期限の時刻（time.monotonic() 基準。指定時は seconds より優先）
+        """
+        self.expires_at = expires_at if expires_at is not None else time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """残り秒数（期限切れなら0）"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        """期限を過ぎたかどうか"""
+        return self.remaining() <= 0
+
+    def reserve(self, seconds: float) -> "Deadline":
+        """
+        後の段階のために seconds 秒を残した期限を作る
+
+        Args:
+            seconds: 後の段階のために残す秒数
+
+        Returns:
+            この期限より seconds 秒早い期限
+        """
+        return Deadline(0, expires_at=self.expires_at - seconds)
+
+    def timeout(self, cap: Optional[float] = None, minimum: float = 0.5) -> float:
+        """
+        次の呼び出しに使うタイムアウト（残り時間と cap の小さい方）
+
+        Args:
+            cap: 段階ごとの既定のタイムアウト（Noneなら残り時間をすべて使う）
+            minimum: これより短い時間しか残っていなければ呼び出さない
+
+        Returns:
+            タイムアウト秒数
+
+        Raises:
+            DeadlineExceeded: 残り時間が minimum 未満の場合
+        """
+        remaining = self.remaining()
+        if remaining < minimum:
+            raise DeadlineExceeded(f"期限までの残り時間が足りません（残り{remaining:.2f}秒）")
+        return min(cap, remaining) if cap is not None else remaining
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+日記アーカイブのエクスポート
+履歴を1件ずつ読み込みながらJSONL / CSV / Parquet（pyarrowがある場合）に書き出す。
+全件をメモリに載せないので、日記が多くても使用メモリは1ヶ月分＋書き込みバッファ程度に収まる
+"""
+
+import csv
+import json
+import sys
+import time
+import logging
+from typing import Dict, Any, Iterable, Iterator, List, Optional
+
+FORMATS = ("jsonl", "csv", "parquet")
+
+# CSV / Parquet で項目を指定しなかったときの列（"." で ai_analysis 内の項目を指定できる）
+DEFAULT_FIELDS = [
+    "id", "created_at", "title", "content", "word_count",
+    "ai_analysis.emotions.overall_mood", "ai_analysis.summary", "ai_analysis.advice"
+]
+
+# 整数として書き出す列（それ以外は文字列。辞書やリストはJSON文字列にする）
+INTEGER_FIELDS = ("id", "word_count")
+
+
+def get_field(entry: Dict[str, Any], field: str) -> Any:
+    """"ai_analysis.summary" のようなドット区切りの項目を取り出す（なければNone）"""
+    value: Any = entry
+    for key in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def project(entry: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    """指定した項目だけを持つ辞書にする（fieldsがNoneならそのまま）"""
+    if fields is None:
+        return entry
+    return {field: get_field(entry, field) for field in fields}
+
+
+class DiaryExporter:
+    def __init__(self, history, batch_size: int = 1000):
+        """
+        エクスポーターを初期化
+
+        Args:
+            history: DiaryHistoryインスタンス
+            batch_size: Parquetの1回の書き込み（行グループ）の行数
+        """
+        self.history = history
+        self.batch_size = max(1, batch_size)
+        self.logger = logging.getLogger(__name__)
+
+    def export(self, fmt: str, output: Optional[str] = None, start: str = None, end: str = None,
+               fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        日記を期間で絞り込んでエクスポート
+
+        Args:
+            fmt: "jsonl" / "csv" / "parquet"
+            output: 出力ファイル（省略時は標準出力。Parquetでは必須）
+            start: 開始日（YYYY-MM-DD）
+            end: 終了日（YYYY-MM-DD）
+            fields: 書き出す項目（省略時はJSONLは全項目、CSV/Parquetは DEFAULT_FIELDS）
+
+        Returns:
+            件数・所要時間・1秒あたりの行数
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"対応していない形式です: {fmt}（{', '.join(FORMATS)}）")
+
+        started = time.perf_counter()
+        entries = self.history.iter_entries(start, end)
+
+        if fmt == "parquet":
+            if not output:
+                raise ValueError("Parquet形式では出力ファイルの指定が必要です")
+            rows = self._write_parquet(entries, output, fields or DEFAULT_FIELDS)
+        else:
+            stream = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+            try:
+                if fmt == "jsonl":
+                    rows = self._write_jsonl(entries, stream, fields)
+                else:
+                    rows = self._write_csv(entries, stream, fields or DEFAULT_FIELDS)
+            finally:
+                if output:
+                    stream.close()
+
+        seconds = time.perf_counter() - started
+        stats = {
+            "format": fmt,
+            "output": output or "-",
+            "rows": rows,
+            "seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds, 1) if seconds > 0 else float(rows)
+        }
+        self.logger.info(f"エクスポート完了: {rows}件 ({stats['rows_per_second']}行/秒)")
+        return stats
+
+    def _write_jsonl(self, entries: Iterable[Dict[str, Any]], stream, fields: Optional[List[str]]) -> int:
+        """1行1エントリのJSONで書き出す"""
+        rows = 0
+        for entry in entries:
+            stream.write(json.dumps(project(entry, fields), ensure_ascii=False))
+            stream.write("\n")
+            rows += 1
+        return rows
+
+    def _write_csv(self, entries: Iterable[Dict[str, Any]], stream, fields: List[str]) -> int:
+        """ヘッダー付きCSVで書き出す（辞書やリストの値はJSON文字列にする）"""
+        writer = csv.writer(stream)
+        writer.writerow(fields)
+        rows = 0
+        for entry in entries:
+            writer.writerow([self._to_text(get_field(entry, field)) for field in fields])
+            rows += 1
+        return rows
+
+    def _write_parquet(self, entries: Iterable[Dict[str, Any]], output: str, fields: List[str]) -> int:
+        """batch_size 行ずつ行グループとしてParquetに書き出す"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet形式での出力には pyarrow が必要です（pip install pyarrow）")
+
+        schema = pa.schema([
+            (field, pa.int64() if field in INTEGER_FIELDS else pa.string()) for field in fields
+        ])
+        rows = 0
+        with pq.ParquetWriter(output, schema) as writer:
+            for batch in self._batches(entries):
+                columns = {
+                    field: [
+                        get_field(entry, field) if field in INTEGER_FIELDS else self._to_text(get_field(entry, field))
+                        for entry in batch
+                    ]
+                    for field in fields
+                }
+                writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+                rows += len(batch)
+        return rows
+
+    def _batches(self, entries: Iterable[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+        """エントリを batch_size 件ずつにまとめる"""
+        batch = []
+        for entry in entries:
+            batch.append(entry)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @staticmethod
+    def _to_text(value: Any) -> Optional[str]:
+        """CSV/Parquet用に値を文字列にする"""
+        if value is None:
+            return None
+        if isinstance(value, (dict, list)):
+            return json.dumps(value, ensure_ascii=False)
+        return str(value)
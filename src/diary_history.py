@@ -1,13 +1,35 @@
 """
 日記履歴管理システム
 日記の履歴を保存し、継続的な文脈での分析を可能にする
+
+履歴は月ごとのファイル（data/history/YYYY-MM.json）に分けて保存し、
+どの月のファイルがあるか・次のエントリID・ユーザープロファイルは小さなマニフェスト
+（data/history/manifest.json）で管理する。期間を指定した読み込みでは該当する月のファイルだけを開く
+
+履歴・分析画面用に日ごとの集計（件数・気分・文字数・タイトル）を data/history/daily_rollup.json に
+保持し、エントリ追加時に更新する。最近の気分傾向はマニフェストには保存せず、この集計から求める
+
+長期の文脈として、締まった週・月ごとの振り返り（各エントリの要約からLLMで生成）と、それより古い期間全体の
+振り返りを data/history/digests.json に保持する。エントリが追加された週・月だけを作り直しが必要なものとして記録し、
+生成は DiaryManager.refresh_digests が裏で行う
 """
 
 import json
 import os
+import threading
 from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Iterator
 import logging
+from file_lock import InterProcessLock
+
+# 振り返り1件あたりの最大文字数（全期間の振り返りはより長く）
+DIGEST_MAX_CHARS = 300
+OVERALL_DIGEST_MAX_CHARS = 600
+# 文脈に入れる月ごとの振り返りの数と、そのまま入れる最近の日記の件数
+CONTEXT_MONTHS = 6
+CONTEXT_RECENT_ENTRIES = 3
+# 最近の気分傾向に使う気分の件数
+RECENT_MOOD_COUNT = 30
 
 class DiaryHistory:
     def __init__(self, data_dir: str = "data"):
@@ -18,117 +40,554 @@ class DiaryHistory:
             data_dir: データ保存ディレクトリ
         """
         self.data_dir = data_dir
-        self.history_file = os.path.join(data_dir, "diary_history.json")
+        self.history_dir = os.path.join(data_dir, "history")
+        self.manifest_file = os.path.join(self.history_dir, "manifest.json")
+        self.rollup_file = os.path.join(self.history_dir, "daily_rollup.json")
+        self.digest_file = os.path.join(self.history_dir, "digests.json")
+        # 月別保存になる前の単一ファイル（初回起動時に移行し、元のファイルはそのまま残す）
+        self.legacy_history_file = os.path.join(data_dir, "diary_history.json")
         self.logger = logging.getLogger(__name__)
         
+        # 読み込み→更新→書き込みの間に他スレッド・他プロセス（ワーカー）の書き込みが混ざらないように
+        self._write_lock = InterProcessLock(os.path.join(data_dir, "history.lock"))
+        
         # データディレクトリを作成
-        os.makedirs(data_dir, exist_ok=True)
+        os.makedirs(self.history_dir, exist_ok=True)
         
         # 履歴ファイルを初期化
         self._init_history_file()
     
     def _init_history_file(self):
-        """履歴ファイルを初期化"""
-        if not os.path.exists(self.history_file):
-            initial_data = {
-                "diaries": [],
-                "user_profile": {
-                    "created_at": datetime.now().isoformat(),
-                    "total_entries": 0,
-                    "name": "",
-                    "age": "",
-                    "occupation": "",
-                    "interests": [],
-                    "goals": [],
-                    "personality_traits": {},
-                    "recurring_themes": [],
-                    "growth_areas": []
-                }
+        """履歴ファイルを初期化（旧形式の履歴があれば月別ファイルへ移行）"""
+        if os.path.exists(self.manifest_file):
+            return
+        
+        with self._write_lock:
+            # 同時に起動したワーカーが先に初期化・移行を済ませていれば何もしない
+            if os.path.exists(self.manifest_file):
+                return
+            
+            if os.path.exists(self.legacy_history_file):
+                self._migrate_legacy_history()
+                return
+            
+            self._save_manifest(self._initial_manifest())
+    
+    @staticmethod
+    def _initial_manifest() -> Dict[str, Any]:
+        """履歴がないときのマニフェスト"""
+        return {
+            "version": 1,
+            "next_id": 1,
+            "shards": {},
+            "user_profile": {
+                "created_at": datetime.now().isoformat(),
+                "total_entries": 0,
+                "name": "",
+                "age": "",
+                "occupation": "",
+                "interests": [],
+                "goals": [],
+                "personality_traits": {},
+                "recurring_themes": [],
+                "growth_areas": []
             }
-            self._save_history(initial_data)
+        }
+    
+    def _migrate_legacy_history(self):
+        """diary_history.json の内容を月別ファイルとマニフェストに書き分ける（_write_lock を取って呼ぶ）"""
+        try:
+            with open(self.legacy_history_file, 'r', encoding='utf-8') as f:
+                legacy = json.load(f)
+        except Exception as e:
+            self.logger.error(f"旧履歴ファイル読み込みエラー: {e}")
+            legacy = {}
+        
+        diaries = legacy.get("diaries", [])
+        shards: Dict[str, List[Dict[str, Any]]] = {}
+        for entry in diaries:
+            shards.setdefault(self._month_of(entry["created_at"]), []).append(entry)
+        
+        for month, entries in shards.items():
+            self._save_shard(month, entries)
+        
+        manifest = {
+            "version": 1,
+            "next_id": max((entry["id"] for entry in diaries), default=0) + 1,
+            "shards": {month: {"count": len(entries)} for month, entries in sorted(shards.items())},
+            "user_profile": self._strip_mood_history(legacy.get("user_profile", {}))
+        }
+        # マニフェストは最後に書く（途中で失敗しても次回起動時に移行をやり直せる）
+        self._save_manifest(manifest)
+        self.rebuild_daily_rollup()
+        self.logger.info(f"履歴を月別ファイルへ移行しました: {len(diaries)}件 / {len(shards)}ヶ月")
+    
+    @staticmethod
+    def _month_of(created_at: str) -> str:
+        """作成日時（ISO形式）から月別ファイルのキー（YYYY-MM）を取り出す"""
+        return created_at[:7]
     
-    def _load_history(self) -> Dict[str, Any]:
-        """履歴を読み込む"""
+    def _shard_path(self, month: str) -> str:
+        """月別ファイルのパス"""
+        return os.path.join(self.history_dir, f"{month}.json")
+    
+    def _write_json(self, path: str, data: Any):
+        """一時ファイルに書き出してから置き換え（読み込み中の他スレッドが壊れたJSONを見ないように）"""
+        # 一時ファイル名はプロセス・スレッドごとに分け、同じファイルへの書き込みが一時ファイルを奪い合わないように
+        tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, path)
+    
+    def _load_manifest(self) -> Dict[str, Any]:
+        """マニフェストを読み込む"""
         try:
-            with open(self.history_file, 'r', encoding='utf-8') as f:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
-            self.logger.error(f"履歴読み込みエラー: {e}")
-            return {"diaries": [], "user_profile": {}}
+            self.logger.error(f"履歴マニフェスト読み込みエラー: {e}")
+            return {"version": 1, "next_id": 1, "shards": {}, "user_profile": {}}
+    
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        """マニフェストを保存"""
+        try:
+            self._write_json(self.manifest_file, manifest)
+        except Exception as e:
+            self.logger.error(f"履歴マニフェスト保存エラー: {e}")
+    
+    def _load_shard(self, month: str) -> List[Dict[str, Any]]:
+        """1ヶ月分のエントリを読み込む"""
+        path = self._shard_path(month)
+        if not os.path.exists(path):
+            return []
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)["diaries"]
+        except Exception as e:
+            self.logger.error(f"履歴読み込みエラー ({month}): {e}")
+            return []
     
-    def _save_history(self, data: Dict[str, Any]):
-        """履歴を保存"""
+    def _save_shard(self, month: str, entries: List[Dict[str, Any]]):
+        """1ヶ月分のエントリを保存"""
         try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            self._write_json(self._shard_path(month), {"month": month, "diaries": entries})
         except Exception as e:
-            self.logger.error(f"履歴保存エラー: {e}")
+            self.logger.error(f"履歴保存エラー ({month}): {e}")
     
-    def add_diary_entry(self, title: str, content: str, ai_analysis: Dict[str, Any]) -> bool:
+    def _iter_shards(self, months: List[str] = None) -> Iterator[tuple]:
         """
-        新しい日記エントリを追加
+        月別ファイルを古い順に読み込む
+        
+        Args:
+            months: 読み込む月（省略時はすべて）
+            
+        Yields:
+            (月, その月のエントリリスト)
+        """
+        if months is None:
+            months = sorted(self._load_manifest()["shards"])
+        for month in months:
+            yield month, self._load_shard(month)
+    
+    def _save_changes(self, manifest: Dict[str, Any], shards: Dict[str, List[Dict[str, Any]]]):
+        """変更した月別ファイルとマニフェストを保存（月別ファイルを先に書く）"""
+        for month, entries in shards.items():
+            self._save_shard(month, entries)
+            manifest["shards"][month] = {"count": len(entries)}
+        manifest["shards"] = dict(sorted(manifest["shards"].items()))
+        self._save_manifest(manifest)
+    
+    def add_diary_entry(self, title: str, content: str, ai_analysis: Dict[str, Any],
+                        idempotency_key: str = None, notion_page: Dict[str, Any] = None,
+                        pending: List[str] = None) -> bool:
+        """
+        新しい日記エントリを追加（書き換えるのは今月のファイルとマニフェストのみ）
         
         Args:
             title: 日記のタイトル
             content: 日記の内容
             ai_analysis: AI分析結果
+            idempotency_key: 重複作成を防ぐためのキー（任意）
+            notion_page: 作成したNotionページ（id, url）
+            pending: 障害で後回しにした処理（"analysis": AI分析, "notion": Notionページ作成）
             
         Returns:
             成功の場合True
         """
         try:
-            history = self._load_history()
+            with self._write_lock:
+                manifest = self._load_manifest()
+                shards: Dict[str, List[Dict[str, Any]]] = {}
+                entry = self._append_entry(manifest, shards, title, content, ai_analysis,
+                                           idempotency_key=idempotency_key, notion_page=notion_page,
+                                           pending=pending)
+                self._save_changes(manifest, shards)
+                self._update_rollup([entry])
+                self._mark_digests_dirty([entry])
+            return True
             
-            entry = {
-                "id": len(history["diaries"]) + 1,
-                "title": title,
-                "content": content,
-                "created_at": datetime.now().isoformat(),
-                "ai_analysis": ai_analysis,
-                "word_count": len(content)
-            }
+        except Exception as e:
+            self.logger.error(f"日記エントリ追加エラー: {e}")
+            return False
+    
+    def add_diary_entries(self, entries: List[Dict[str, Any]]) -> int:
+        """
+        複数の日記エントリをまとめて追加（各ファイルの書き込みは1回のみ）
+        
+        Args:
+            entries: title, content, ai_analysis, created_at・idempotency_key・notion_page・pending(任意) を持つ辞書のリスト
+            
+        Returns:
+            追加したエントリ数
+        """
+        if not entries:
+            return 0
+        
+        try:
+            with self._write_lock:
+                manifest = self._load_manifest()
+                shards: Dict[str, List[Dict[str, Any]]] = {}
+                added = []
+                
+                # 過去の日記は日付順に追加して月別ファイル内の順序を保つ
+                for entry in sorted(entries, key=lambda e: e.get("created_at") or ""):
+                    added.append(self._append_entry(
+                        manifest,
+                        shards,
+                        entry["title"],
+                        entry["content"],
+                        entry["ai_analysis"],
+                        entry.get("created_at"),
+                        idempotency_key=entry.get("idempotency_key"),
+                        notion_page=entry.get("notion_page"),
+                        pending=entry.get("pending")
+                    ))
+                
+                self._save_changes(manifest, shards)
+                self._update_rollup(added)
+                self._mark_digests_dirty(added)
+            return len(entries)
+            
+        except Exception as e:
+            self.logger.error(f"日記エントリ一括追加エラー: {e}")
+            return 0
+    
+    def _append_entry(self, manifest: Dict[str, Any], shards: Dict[str, List[Dict[str, Any]]],
+                      title: str, content: str, ai_analysis: Dict[str, Any], created_at: str = None,
+                      idempotency_key: str = None, notion_page: Dict[str, Any] = None,
+                      pending: List[str] = None) -> Dict[str, Any]:
+        """
+        読み込み済みのマニフェストと月別データにエントリを1件追加
+        
+        Args:
+            manifest: マニフェスト
+            shards: 変更する月 -> エントリリスト（未読み込みの月はここで読み込んで追加する）
+        """
+        entry = {
+            "id": manifest["next_id"],
+            "title": title,
+            "content": content,
+            "created_at": created_at or datetime.now().isoformat(),
+            "ai_analysis": ai_analysis,
+            "word_count": len(content)
+        }
+        if idempotency_key:
+            entry["idempotency_key"] = idempotency_key
+        if notion_page and notion_page.get("id"):
+            entry["notion_page"] = {"id": notion_page.get("id"), "url": notion_page.get("url", "")}
+        
+        month = self._month_of(entry["created_at"])
+        if month not in shards:
+            shards[month] = self._load_shard(month)
+        shards[month].append(entry)
+        
+        if pending:
+            # 後回しにした処理のあるエントリは、全月を読まずに探せるようマニフェストにも記録する
+            entry["pending"] = list(pending)
+            manifest.setdefault("pending", {})[str(entry["id"])] = month
+        
+        manifest["next_id"] += 1
+        profile = self._strip_mood_history(manifest.setdefault("user_profile", {}))
+        profile["total_entries"] = profile.get("total_entries", 0) + 1
+        return entry
+    
+    @staticmethod
+    def _strip_mood_history(profile: Dict[str, Any]) -> Dict[str, Any]:
+        """以前の形式でプロファイルに保存していた気分履歴を取り除く（日別集計から求められるため）"""
+        profile.pop("mood_history", None)
+        profile.pop("recent_mood_trend", None)
+        return profile
+    
+    @staticmethod
+    def _mood_trend(rollup: Dict[str, Dict[str, Any]], before: str = None) -> Optional[Dict[str, Any]]:
+        """
+        日別集計から最近の気分傾向を求める
+        
+        Args:
+            rollup: 日別集計
+            before: この日付（YYYY-MM-DD）より前の日だけを使う（省略時はすべて）
             
-            history["diaries"].append(entry)
-            history["user_profile"]["total_entries"] = len(history["diaries"])
+        Returns:
+            positive_ratio, dominant_mood を持つ辞書（気分の分かるエントリがなければNone）
+        """
+        counts: Dict[str, int] = {}
+        remaining = RECENT_MOOD_COUNT
+        for date in sorted(rollup, reverse=True):
+            if before and date >= before:
+                continue
+            for mood, count in rollup[date]["moods"].items():
+                if mood == "不明" or remaining <= 0:
+                    continue
+                taken = min(count, remaining)
+                counts[mood] = counts.get(mood, 0) + taken
+                remaining -= taken
+            if remaining <= 0:
+                break
+        
+        total = sum(counts.values())
+        if not total:
+            return None
+        return {
+            "positive_ratio": counts.get("positive", 0) / total,
+            "dominant_mood": max(counts, key=counts.get)
+        }
+    
+    def update_ai_analysis(self, updates: Dict[int, Dict[str, Any]]) -> int:
+        """
+        既存エントリのAI分析結果をエントリIDごとに上書き（再分析結果の反映用）
+        
+        Args:
+            updates: エントリID -> 上書きするAI分析項目（emotions, summary, advice など）
             
-            # ユーザープロファイルを更新
-            self._update_user_profile(history, entry)
+        Returns:
+            更新したエントリ数
+        """
+        if not updates:
+            return 0
+        
+        try:
+            with self._write_lock:
+                manifest = self._load_manifest()
+                changed: Dict[str, List[Dict[str, Any]]] = {}
+                resummarized = []
+                remooded = []
+                updated = 0
+                
+                for month, entries in self._iter_shards(sorted(manifest["shards"])):
+                    for entry in entries:
+                        fields = updates.get(entry["id"])
+                        if fields:
+                            old_mood = self._mood_of(entry)
+                            entry.setdefault("ai_analysis", {}).update(fields)
+                            changed[month] = entries
+                            updated += 1
+                            if "summary" in fields:
+                                resummarized.append(entry)
+                            if self._mood_of(entry) != old_mood:
+                                remooded.append((entry, old_mood))
+                
+                self._save_changes(manifest, changed)
+                self._move_rollup_moods(remooded)
+                self._mark_digests_dirty(resummarized)
+            return updated
             
-            self._save_history(history)
+        except Exception as e:
+            self.logger.error(f"AI分析結果更新エラー: {e}")
+            return 0
+    
+    def get_pending_entries(self) -> List[Dict[str, Any]]:
+        """
+        障害で後回しにした処理（AI分析・Notionページ作成）が残っているエントリを取得（古い順）
+        
+        Returns:
+            pending を持つエントリのリスト
+        """
+        try:
+            pending = self._load_manifest().get("pending", {})
+            entries = []
+            for _, shard in self._iter_shards(sorted(set(pending.values()))):
+                entries.extend(entry for entry in shard if str(entry["id"]) in pending)
+            return sorted(entries, key=lambda e: e["id"])
+        except Exception as e:
+            self.logger.error(f"保留エントリ取得エラー: {e}")
+            return []
+    
+    def update_entry(self, entry_id: int, ai_analysis: Dict[str, Any] = None,
+                     notion_page: Dict[str, Any] = None, pending: List[str] = None) -> bool:
+        """
+        後回しにした処理の結果をエントリに反映
+        
+        Args:
+            entry_id: エントリID
+            ai_analysis: 上書きするAI分析項目
+            notion_page: 作成したNotionページ（id, url。途中まで書き込んだ場合は batches_done, ai_analysis も）
+            pending: 残っている後回しの処理（空リストなら保留を解除）
+            
+        Returns:
+            成功の場合True
+        """
+        try:
+            with self._write_lock:
+                manifest = self._load_manifest()
+                month = manifest.get("pending", {}).get(str(entry_id))
+                months = [month] if month else sorted(manifest["shards"])
+                for month, entries in self._iter_shards(months):
+                    entry = next((e for e in entries if e["id"] == entry_id), None)
+                    if entry is not None:
+                        break
+                else:
+                    return False
+                
+                old_mood = self._mood_of(entry)
+                if ai_analysis:
+                    entry.setdefault("ai_analysis", {}).update(ai_analysis)
+                if notion_page and notion_page.get("id"):
+                    entry["notion_page"] = {"id": notion_page.get("id"), "url": notion_page.get("url", "")}
+                    if notion_page.get("batches_done"):
+                        # ページの途中まで書き込んだので、続きを同じ内容で書き込むための情報も残す
+                        entry["notion_page"].update(batches_done=notion_page["batches_done"],
+                                                    ai_analysis=notion_page.get("ai_analysis"))
+                if pending is not None:
+                    if pending:
+                        entry["pending"] = list(pending)
+                        manifest.setdefault("pending", {})[str(entry_id)] = month
+                    else:
+                        entry.pop("pending", None)
+                        manifest.get("pending", {}).pop(str(entry_id), None)
+                
+                self._save_changes(manifest, {month: entries})
+                if ai_analysis and "summary" in ai_analysis:
+                    # 要約が後から揃ったので、その週・月の振り返りを作り直す
+                    self._mark_digests_dirty([entry])
+                if self._mood_of(entry) != old_mood:
+                    # 気分が後から分かったので、その日の集計だけを直す
+                    self._move_rollup_moods([(entry, old_mood)])
             return True
             
         except Exception as e:
-            self.logger.error(f"日記エントリ追加エラー: {e}")
+            self.logger.error(f"エントリ更新エラー: {e}")
             return False
     
-    def _update_user_profile(self, history: Dict[str, Any], new_entry: Dict[str, Any]):
-        """ユーザープロファイルを更新"""
-        profile = history["user_profile"]
-        
-        # 感情の傾向を分析
-        if "emotions" in new_entry["ai_analysis"]:
-            emotions = new_entry["ai_analysis"]["emotions"]
-            if isinstance(emotions, dict) and "overall_mood" in emotions:
-                mood = emotions["overall_mood"]
-                if "mood_history" not in profile:
-                    profile["mood_history"] = []
-                profile["mood_history"].append({
-                    "date": new_entry["created_at"][:10],
-                    "mood": mood
-                })
-                
-                # 最近30日間の気分の分析
-                recent_moods = profile["mood_history"][-30:]
-                positive_count = sum(1 for m in recent_moods if m["mood"] == "positive")
-                profile["recent_mood_trend"] = {
-                    "positive_ratio": positive_count / len(recent_moods),
-                    "dominant_mood": max(set([m["mood"] for m in recent_moods]), 
-                                       key=[m["mood"] for m in recent_moods].count)
-                }
+    @staticmethod
+    def _mood_of(entry: Dict[str, Any]) -> str:
+        """エントリの全体的な気分（分析結果がなければ「不明」）"""
+        emotions = entry.get("ai_analysis", {}).get("emotions", {})
+        if isinstance(emotions, dict) and emotions.get("overall_mood"):
+            return emotions["overall_mood"]
+        return "不明"
+    
+    def _build_rollup(self, entries: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """エントリのリストから日別集計を作る"""
+        rollup: Dict[str, Dict[str, Any]] = {}
+        for entry in sorted(entries, key=lambda e: e["created_at"]):
+            self._add_to_rollup(rollup, entry)
+        return rollup
+    
+    def _add_to_rollup(self, rollup: Dict[str, Dict[str, Any]], entry: Dict[str, Any]):
+        """日別集計にエントリ1件分を加算"""
+        day = rollup.setdefault(entry["created_at"][:10], {"count": 0, "moods": {}, "chars": 0, "titles": []})
+        mood = self._mood_of(entry)
+        day["count"] += 1
+        day["moods"][mood] = day["moods"].get(mood, 0) + 1
+        day["chars"] += entry.get("word_count", len(entry.get("content", "")))
+        day["titles"].append(entry["title"])
+    
+    def _load_rollup(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """日別集計を読み込む（まだ作られていなければNone）"""
+        if not os.path.exists(self.rollup_file):
+            return None
+        try:
+            with open(self.rollup_file, 'r', encoding='utf-8') as f:
+                return json.load(f)["days"]
+        except Exception as e:
+            self.logger.error(f"日別集計読み込みエラー: {e}")
+            return None
+    
+    def _save_rollup(self, rollup: Dict[str, Dict[str, Any]]):
+        """日別集計を保存"""
+        try:
+            self._write_json(self.rollup_file, {"days": dict(sorted(rollup.items()))})
+        except Exception as e:
+            self.logger.error(f"日別集計保存エラー: {e}")
+    
+    def _update_rollup(self, entries: List[Dict[str, Any]]):
+        """追加したエントリを日別集計に反映（集計ファイルがなければ作り直す）"""
+        rollup = self._load_rollup()
+        if rollup is None:
+            self.rebuild_daily_rollup()
+            return
+        for entry in entries:
+            self._add_to_rollup(rollup, entry)
+        self._save_rollup(rollup)
+    
+    def _move_rollup_moods(self, changes: List[tuple]):
+        """
+        気分が変わったエントリの日の集計だけを直す（変更前の気分を-1、変更後の気分を+1）
+        
+        Args:
+            changes: (エントリ, 変更前の気分) のリスト
+        """
+        if not changes:
+            return
+        rollup = self._load_rollup()
+        if rollup is None:
+            self.rebuild_daily_rollup()
+            return
+        for entry, old_mood in changes:
+            moods = rollup.get(entry["created_at"][:10], {}).get("moods", {})
+            if not moods.get(old_mood):
+                # 集計がエントリと食い違っているので全体を作り直す
+                self.rebuild_daily_rollup()
+                return
+            moods[old_mood] -= 1
+            if not moods[old_mood]:
+                del moods[old_mood]
+            new_mood = self._mood_of(entry)
+            moods[new_mood] = moods.get(new_mood, 0) + 1
+        self._save_rollup(rollup)
+    
+    def rebuild_daily_rollup(self) -> int:
+        """
+        全エントリから日別集計を作り直す
+        
+        Returns:
+            集計した日数
+        """
+        try:
+            with self._write_lock:
+                rollup = self._build_rollup(self.get_all_entries())
+                self._save_rollup(rollup)
+            return len(rollup)
+        except Exception as e:
+            self.logger.error(f"日別集計再構築エラー: {e}")
+            return 0
+    
+    def get_daily_rollup(self, days: int = 30) -> List[Dict[str, Any]]:
+        """
+        日別集計を取得（日記を書いた日のみ、新しい日付順）
+        
+        Args:
+            days: 過去何日分を取得するか（Noneなら全期間）
+            
+        Returns:
+            date, count, moods, chars, titles を持つ辞書のリスト
+        """
+        try:
+            rollup = self._load_rollup()
+            if rollup is None:
+                self.rebuild_daily_rollup()
+                rollup = self._load_rollup() or {}
+            
+            cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d") if days is not None else ""
+            return [dict(day, date=date) for date, day in sorted(rollup.items(), reverse=True) if date >= cutoff]
+            
+        except Exception as e:
+            self.logger.error(f"日別集計取得エラー: {e}")
+            return []
     
     def get_recent_entries(self, days: int = 30) -> List[Dict[str, Any]]:
         """
-        最近の日記エントリを取得
+        最近の日記エントリを取得（期間に重なる月のファイルだけを読み込む）
         
         Args:
             days: 過去何日分を取得するか
@@ -137,14 +596,16 @@ class DiaryHistory:
             最近の日記エントリリスト
         """
         try:
-            history = self._load_history()
             cutoff_date = datetime.now() - timedelta(days=days)
+            cutoff_month = cutoff_date.strftime("%Y-%m")
+            months = [month for month in sorted(self._load_manifest()["shards"]) if month >= cutoff_month]
             
             recent_entries = []
-            for entry in history["diaries"]:
-                entry_date = datetime.fromisoformat(entry["created_at"])
-                if entry_date >= cutoff_date:
-                    recent_entries.append(entry)
+            for _, entries in self._iter_shards(months):
+                for entry in entries:
+                    entry_date = datetime.fromisoformat(entry["created_at"])
+                    if entry_date >= cutoff_date:
+                        recent_entries.append(entry)
             
             return sorted(recent_entries, key=lambda x: x["created_at"], reverse=True)
             
@@ -152,28 +613,371 @@ class DiaryHistory:
             self.logger.error(f"最近のエントリ取得エラー: {e}")
             return []
     
+    def get_version(self) -> int:
+        """履歴のバージョン（書き込みのたびに更新されるマニフェストの更新時刻。キャッシュの無効化に使う）"""
+        try:
+            return os.stat(self.manifest_file).st_mtime_ns
+        except OSError:
+            return 0
+    
+    def get_entries_page(self, offset: int = 0, limit: int = 20, days: Optional[int] = None) -> Dict[str, Any]:
+        """
+        エントリを新しい順に1ページ分取得（件数は月別・日別の集計から求め、読み込むのはページにかかる月のファイルのみ）
+        
+        Args:
+            offset: 先頭から何件目のページか
+            limit: 1ページの件数
+            days: 過去何日分に絞り込むか（省略時は全期間）
+            
+        Returns:
+            entries, total, offset, limit, has_more を持つ辞書
+        """
+        try:
+            offset = max(0, offset)
+            limit = max(1, limit)
+            
+            if days is None:
+                cutoff = ""
+                month_counts = {month: info["count"] for month, info in self._load_manifest()["shards"].items()}
+            else:
+                cutoff = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+                month_counts: Dict[str, int] = {}
+                for day in self.get_daily_rollup(days):
+                    month = day["date"][:7]
+                    month_counts[month] = month_counts.get(month, 0) + day["count"]
+            total = sum(month_counts.values())
+            
+            # ページより前の月は件数だけ数えて読み飛ばす
+            skip = offset
+            page: List[Dict[str, Any]] = []
+            for month in sorted(month_counts, reverse=True):
+                if len(page) >= limit:
+                    break
+                if skip >= month_counts[month]:
+                    skip -= month_counts[month]
+                    continue
+                entries = sorted(
+                    (entry for entry in self._load_shard(month) if entry["created_at"][:10] >= cutoff),
+                    key=lambda e: e["created_at"], reverse=True
+                )
+                page.extend(entries[skip:skip + limit - len(page)])
+                skip = 0
+            
+            return {
+                "entries": page,
+                "total": total,
+                "offset": offset,
+                "limit": limit,
+                "has_more": offset + len(page) < total
+            }
+            
+        except Exception as e:
+            self.logger.error(f"ページ取得エラー: {e}")
+            return {"entries": [], "total": 0, "offset": offset, "limit": limit, "has_more": False}
+    
+    def find_entry_by_idempotency_key(self, keys: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        冪等キーが一致する保存済みエントリを探す（新しい月から順に確認）
+        
+        Args:
+            keys: 候補となる冪等キーのリスト
+            
+        Returns:
+            見つかったエントリ（なければNone）
+        """
+        try:
+            wanted = set(keys)
+            months = sorted(self._load_manifest()["shards"], reverse=True)
+            for _, entries in self._iter_shards(months):
+                for entry in reversed(entries):
+                    if entry.get("idempotency_key") in wanted:
+                        return entry
+            return None
+        except Exception as e:
+            self.logger.error(f"冪等キー検索エラー: {e}")
+            return None
+    
+    def get_all_entries(self) -> List[Dict[str, Any]]:
+        """全日記エントリを取得（追加順）"""
+        try:
+            entries = [entry for _, shard in self._iter_shards() for entry in shard]
+            return sorted(entries, key=lambda e: e["id"])
+        except Exception as e:
+            self.logger.error(f"全エントリ取得エラー: {e}")
+            return []
+    
+    def iter_entries(self, start: str = None, end: str = None) -> Iterator[Dict[str, Any]]:
+        """
+        エントリを古い順に1件ずつ返す（読み込むのは期間に重なる月のファイルのみで、同時に保持するのは1ヶ月分）
+        
+        Args:
+            start: 開始日（YYYY-MM-DD、この日を含む）
+            end: 終了日（YYYY-MM-DD、この日を含む）
+            
+        Yields:
+            日記エントリ
+        """
+        months = [
+            month for month in sorted(self._load_manifest()["shards"])
+            if (not start or month >= start[:7]) and (not end or month <= end[:7])
+        ]
+        for _, entries in self._iter_shards(months):
+            for entry in sorted(entries, key=lambda e: e["created_at"]):
+                date = entry["created_at"][:10]
+                if (not start or date >= start) and (not end or date <= end):
+                    yield entry
+    
+    def search_entries(self, query: str, days: Optional[int] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        タイトル・本文・要約にキーワードを含むエントリを新しい順に検索（新しい月から読み、limit件見つかったら止める）
+        
+        Args:
+            query: キーワード（空白区切りで複数指定するとすべてを含むもの）
+            days: 過去何日分から探すか（Noneなら全期間）
+            limit: 最大件数
+            
+        Returns:
+            見つかったエントリのリスト
+        """
+        terms = [term.lower() for term in query.split() if term]
+        if not terms:
+            return []
+        
+        try:
+            cutoff = (datetime.now() - timedelta(days=days)).isoformat() if days is not None else ""
+            months = [month for month in sorted(self._load_manifest()["shards"], reverse=True) if month >= cutoff[:7]]
+            
+            results = []
+            for _, entries in self._iter_shards(months):
+                for entry in sorted(entries, key=lambda e: e["created_at"], reverse=True):
+                    if entry["created_at"] < cutoff:
+                        continue
+                    summary = entry.get("ai_analysis", {}).get("summary")
+                    text = "\n".join([entry["title"], entry["content"], summary if isinstance(summary, str) else ""]).lower()
+                    if all(term in text for term in terms):
+                        results.append(entry)
+                        if len(results) >= limit:
+                            return results
+            return results
+            
+        except Exception as e:
+            self.logger.error(f"日記検索エラー: {e}")
+            return []
+    
     def get_user_profile(self) -> Dict[str, Any]:
-        """ユーザープロファイルを取得"""
+        """ユーザープロファイルを取得（最近の気分傾向は日別集計から求めて加える）"""
         try:
-            history = self._load_history()
-            return history.get("user_profile", {})
+            profile = self._strip_mood_history(self._load_manifest().get("user_profile", {}))
+            trend = self._mood_trend(self._load_rollup() or {})
+            if trend:
+                profile["recent_mood_trend"] = trend
+            return profile
         except Exception as e:
             self.logger.error(f"ユーザープロファイル取得エラー: {e}")
             return {}
     
-    def get_context_for_analysis(self, days: int = 7) -> str:
+    @staticmethod
+    def _week_of(created_at: str) -> str:
+        """作成日時（ISO形式）から週のキー（ISO週、YYYY-Www）を取り出す"""
+        year, week, _ = datetime.strptime(created_at[:10], "%Y-%m-%d").isocalendar()
+        return f"{year}-W{week:02d}"
+    
+    @staticmethod
+    def _digest_range(level: str, key: str) -> tuple:
+        """振り返りの期間（開始日, 終了日。YYYY-MM-DD、両端を含む）"""
+        if level == "week":
+            year, week = key.split("-W")
+            monday = datetime.fromisocalendar(int(year), int(week), 1)
+            return monday.strftime("%Y-%m-%d"), (monday + timedelta(days=6)).strftime("%Y-%m-%d")
+        first = datetime.strptime(f"{key}-01", "%Y-%m-%d")
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")
+    
+    def _load_digests(self) -> Dict[str, Any]:
+        """
+        振り返りを読み込む（まだ作られていなければ、日記のあるすべての週・月を作り直しが必要なものとして返す）
+        
+        Returns:
+            weeks, months（キー -> 振り返り）, overall（全期間の振り返り）, dirty（作り直しが必要な期間 -> 変更回数）
+        """
+        if os.path.exists(self.digest_file):
+            try:
+                with open(self.digest_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except Exception as e:
+                self.logger.error(f"振り返り読み込みエラー: {e}")
+        
+        dirty = {}
+        for day in (self._load_rollup() or {}):
+            dirty[self._week_of(day)] = 1
+            dirty[self._month_of(day)] = 1
+        return {"weeks": {}, "months": {}, "overall": None, "dirty": dirty}
+    
+    def _save_digests(self, digests: Dict[str, Any]):
+        """振り返りを保存"""
+        try:
+            self._write_json(self.digest_file, digests)
+        except Exception as e:
+            self.logger.error(f"振り返り保存エラー: {e}")
+    
+    def _mark_digests_dirty(self, entries: List[Dict[str, Any]]):
+        """追加・要約が変わったエントリの週・月の振り返りを作り直しが必要なものとして記録"""
+        if not entries:
+            return
+        digests = self._load_digests()
+        for entry in entries:
+            for key in (self._week_of(entry["created_at"]), self._month_of(entry["created_at"])):
+                digests["dirty"][key] = digests["dirty"].get(key, 0) + 1
+        self._save_digests(digests)
+    
+    def get_stale_digest_periods(self, now: datetime = None) -> List[Dict[str, Any]]:
+        """
+        作り直しが必要な振り返りの期間を取得（締まった週・月のみ。今週・今月の分は最近の日記として直接文脈に入る）
+        
+        Args:
+            now: 基準時刻（省略時は現在時刻）
+        
+        Returns:
+            level（"week" / "month"）, key, start, end, mark（記録時点の変更回数）を持つ辞書のリスト
+            （文脈に入る期間から生成できるよう、期間の終わりが新しい順）
+        """
+        try:
+            today = (now or datetime.now()).isoformat()
+            current = {"week": self._week_of(today), "month": self._month_of(today)}
+            periods = []
+            for key, mark in self._load_digests()["dirty"].items():
+                level = "week" if "-W" in key else "month"
+                if key < current[level]:
+                    start, end = self._digest_range(level, key)
+                    periods.append({"level": level, "key": key, "start": start, "end": end, "mark": mark})
+            return sorted(periods, key=lambda p: (p["end"], p["level"] == "week"), reverse=True)
+        except Exception as e:
+            self.logger.error(f"振り返り対象取得エラー: {e}")
+            return []
+    
+    def get_digest_source(self, period: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        期間内の日記の要約を振り返り生成用のテキストにまとめる
+        
+        Args:
+            period: get_stale_digest_periods の要素
+        
+        Returns:
+            text（1行1件の要約）, entry_count
+        """
+        lines = []
+        for entry in self.iter_entries(period["start"], period["end"]):
+            line = f"- {entry['created_at'][5:10].replace('-', '/')} 「{entry['title']}」"
+            summary = entry.get("ai_analysis", {}).get("summary")
+            # 後回し中・生成に失敗した要約は使わず、タイトルだけにする
+            if isinstance(summary, str) and summary and "エラーが発生しました" not in summary:
+                line += f": {self._clip(summary)}"
+            lines.append(line)
+        return {"text": f"期間: {period['start']}〜{period['end']}\n" + "\n".join(lines), "entry_count": len(lines)}
+    
+    def get_overall_digest_source(self, now: datetime = None) -> Optional[Dict[str, Any]]:
+        """
+        全期間の振り返り（月ごとの振り返りとして文脈に入らない古い月をまとめたもの）の作り直しが必要なら生成用のテキストを返す
+        
+        Args:
+            now: 基準時刻（省略時は現在時刻）
+        
+        Returns:
+            text, months（対象の月）。作り直しが不要ならNone
+        """
+        try:
+            digests = self._load_digests()
+            months = self._context_months(digests, now)
+            older = [
+                month for month, digest in sorted(digests["months"].items())
+                if months and month < months[0] and digest["summary"]
+            ]
+            overall = digests.get("overall")
+            if not older:
+                return None
+            if overall and overall.get("months") == older and \
+                    all(digests["months"][month]["updated_at"] <= overall["updated_at"] for month in older):
+                return None
+            lines = [f"- {month}: {digests['months'][month]['summary']}" for month in older]
+            return {"text": f"期間: {older[0]}〜{older[-1]}（月ごとの振り返り）\n" + "\n".join(lines), "months": older}
+        except Exception as e:
+            self.logger.error(f"全期間の振り返り対象取得エラー: {e}")
+            return None
+    
+    def save_digest(self, level: str, key: str, summary: str, entry_count: int = 0,
+                    mark: Optional[int] = None, months: List[str] = None):
+        """
+        生成した振り返りを保存
+        
+        Args:
+            level: "week" / "month" / "overall"
+            key: 週・月のキー（overall では未使用）
+            summary: 振り返りの文
+            entry_count: 期間内のエントリ数
+            mark: 生成に使ったデータを読んだ時点の変更回数（その後にエントリが追加されていれば作り直しの記録を残す）
+            months: 全期間の振り返りの対象の月
+        """
+        try:
+            with self._write_lock:
+                digests = self._load_digests()
+                digest = {"summary": self._clip(summary.strip(), OVERALL_DIGEST_MAX_CHARS if level == "overall" else DIGEST_MAX_CHARS), "updated_at": datetime.now().isoformat()}
+                if level == "overall":
+                    digests["overall"] = dict(digest, months=months or [])
+                else:
+                    digests["weeks" if level == "week" else "months"][key] = dict(digest, entry_count=entry_count)
+                    if digests["dirty"].get(key) == mark:
+                        digests["dirty"].pop(key, None)
+                self._save_digests(digests)
+        except Exception as e:
+            self.logger.error(f"振り返り保存エラー: {e}")
+    
+    @staticmethod
+    def _clip(text: str, limit: int = DIGEST_MAX_CHARS) -> str:
+        """文脈の大きさを一定に保つため、長い要約・振り返りを切り詰める"""
+        text = " ".join(text.split())
+        return text if len(text) <= limit else text[:limit - 1] + "…"
+    
+    def _context_months(self, digests: Dict[str, Any], now: datetime = None) -> List[str]:
+        """月ごとの振り返りを文脈に入れる月（今月を除く直近の月、古い順）"""
+        current = (now or datetime.now()).strftime("%Y-%m")
+        months = [month for month, digest in sorted(digests["months"].items()) if month < current and digest["summary"]]
+        return months[-CONTEXT_MONTHS:]
+    
+    def _profile_as_of(self, profile: Dict[str, Any], as_of: datetime) -> Dict[str, Any]:
+        """ある時点までの日記から求めた日記の回数と最近の気分傾向（過去の日記の再分析用）"""
+        date = as_of.strftime("%Y-%m-%d")
+        rollup = self._load_rollup() or {}
+        snapshot = {"total_entries": sum(day["count"] for key, day in rollup.items() if key < date)}
+        trend = self._mood_trend(rollup, before=date)
+        if trend:
+            snapshot["recent_mood_trend"] = trend
+        return snapshot
+    
+    def get_context_for_analysis(self, days: int = 7, as_of: Optional[datetime] = None) -> str:
         """
         AI分析用の文脈情報を生成
         
+        全期間の振り返り → 直近の月ごとの振り返り → 今月の週ごとの振り返り → 最近の日記 の順に、
+        古い期間ほど粗くまとめた内容を並べる（履歴が長くなっても文脈の大きさはほぼ一定）
+        
         Args:
-            days: 過去何日分の文脈を含めるか
+            days: 過去何日分の日記をそのまま含めるか
+            as_of: この時点より前の日記だけで文脈を作る（過去の日記を再分析する場合。省略時は現在）
             
         Returns:
             文脈情報の文字列
         """
         try:
-            recent_entries = self.get_recent_entries(days)
+            now = as_of or datetime.now()
+            cutoff = now - timedelta(days=days)
+            recent_entries = [
+                entry for entry in self.iter_entries(cutoff.strftime("%Y-%m-%d"), now.strftime("%Y-%m-%d"))
+                if cutoff <= datetime.fromisoformat(entry["created_at"]) < now
+            ]
             profile = self.get_user_profile()
+            if as_of is not None and profile:
+                profile = self._profile_as_of(profile, as_of)
+            digests = self._load_digests()
             
             context_parts = []
             
@@ -188,14 +992,41 @@ class DiaryHistory:
                     dominant_mood = trend.get("dominant_mood", "不明")
                     context_parts.append(f"最近の気分傾向: ポジティブ{positive_ratio:.1f}%, 主要な気分: {dominant_mood}")
             
+            # 古い期間の振り返り
+            months = self._context_months(digests, now)
+            overall = digests.get("overall")
+            # 全期間の振り返りは、月ごとの振り返りより前の月だけをまとめたものの場合に使う
+            if overall and overall.get("months") and \
+                    overall["months"][-1] < (months[0] if months else now.strftime("%Y-%m")):
+                context_parts.append(f"\n{overall['months'][0]}〜{overall['months'][-1]}の振り返り:")
+                context_parts.append(overall["summary"])
+            if months:
+                context_parts.append("\n月ごとの振り返り:")
+                for month in months:
+                    context_parts.append(f"- {month}: {digests['months'][month]['summary']}")
+            
+            month_start = now.strftime("%Y-%m-01")
+            current_week = self._week_of(now.isoformat())
+            weeks = [
+                week for week in sorted(digests["weeks"])
+                if week < current_week and self._digest_range("week", week)[1] >= month_start
+                and digests["weeks"][week]["summary"]
+            ]
+            if weeks:
+                context_parts.append("\n今月の週ごとの振り返り:")
+                for week in weeks:
+                    start, end = self._digest_range("week", week)
+                    context_parts.append(f"- {start[5:].replace('-', '/')}〜{end[5:].replace('-', '/')}: "
+                                         f"{digests['weeks'][week]['summary']}")
+            
             # 最近の日記の要約
             if recent_entries:
                 context_parts.append(f"\n過去{days}日間の日記:")
-                for entry in recent_entries[-3:]:  # 最新3件
+                for entry in recent_entries[-CONTEXT_RECENT_ENTRIES:]:  # 最新3件を古い順に
                     date = entry["created_at"][:10]
                     title = entry["title"]
-                    summary = entry["ai_analysis"].get("summary", "要約なし")
-                    context_parts.append(f"- {date}: 「{title}」- {summary}")
+                    summary = entry["ai_analysis"].get("summary") or "要約なし"
+                    context_parts.append(f"- {date}: 「{title}」- {self._clip(summary)}")
             
             return "\n".join(context_parts)
             
@@ -205,23 +1036,22 @@ class DiaryHistory:
     
     def analyze_patterns(self) -> Dict[str, Any]:
         """
-        日記のパターンを分析
+        日記のパターンを分析（頻度・気分・文章量は日別集計から、テーマは直近90日の本文から求める）
         
         Returns:
             パターン分析結果
         """
         try:
-            history = self._load_history()
-            entries = history["diaries"]
+            daily = sorted(self.get_daily_rollup(days=None), key=lambda day: day["date"])
             
-            if not entries:
+            if not daily:
                 return {"message": "分析に十分なデータがありません"}
             
             patterns = {
-                "writing_frequency": self._analyze_frequency(entries),
-                "common_themes": self._analyze_themes(entries),
-                "mood_patterns": self._analyze_mood_patterns(entries),
-                "growth_indicators": self._analyze_growth(entries)
+                "writing_frequency": self._analyze_frequency(daily),
+                "common_themes": self._analyze_themes(self.get_recent_entries(90)),
+                "mood_patterns": self._analyze_mood_patterns(daily),
+                "growth_indicators": self._analyze_growth(daily)
             }
             
             return patterns
@@ -230,21 +1060,20 @@ class DiaryHistory:
             self.logger.error(f"パターン分析エラー: {e}")
             return {"error": str(e)}
     
-    def _analyze_frequency(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """書く頻度を分析"""
-        if len(entries) < 2:
+    def _analyze_frequency(self, daily: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """書く頻度を分析（日付順の日別集計から）"""
+        total_entries = sum(day["count"] for day in daily)
+        if total_entries < 2:
             return {"message": "頻度分析には2つ以上のエントリが必要です"}
         
-        dates = [datetime.fromisoformat(entry["created_at"]).date() for entry in entries]
-        dates.sort()
-        
         # 日記を書いた日数と期間を計算
-        unique_dates = list(set(dates))
-        total_days = (dates[-1] - dates[0]).days + 1
-        writing_days = len(unique_dates)
+        first_date = datetime.fromisoformat(daily[0]["date"]).date()
+        last_date = datetime.fromisoformat(daily[-1]["date"]).date()
+        total_days = (last_date - first_date).days + 1
+        writing_days = len(daily)
         
         return {
-            "total_entries": len(entries),
+            "total_entries": total_entries,
             "writing_days": writing_days,
             "total_period_days": total_days,
             "frequency_percentage": (writing_days / max(total_days, 1)) * 100
@@ -266,36 +1095,40 @@ class DiaryHistory:
         sorted_words = sorted(common_words.items(), key=lambda x: x[1], reverse=True)
         return [word for word, count in sorted_words[:5]]
     
-    def _analyze_mood_patterns(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """気分のパターンを分析"""
-        moods = []
-        for entry in entries:
-            ai_analysis = entry.get("ai_analysis", {})
-            emotions = ai_analysis.get("emotions", {})
-            if isinstance(emotions, dict) and "overall_mood" in emotions:
-                moods.append(emotions["overall_mood"])
+    def _analyze_mood_patterns(self, daily: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """気分のパターンを分析（日別集計の気分件数を合計）"""
+        mood_counts = {}
+        for day in daily:
+            for mood, count in day["moods"].items():
+                if mood != "不明":
+                    mood_counts[mood] = mood_counts.get(mood, 0) + count
         
-        if not moods:
+        if not mood_counts:
             return {"message": "気分データが不足しています"}
         
-        mood_counts = {}
-        for mood in moods:
-            mood_counts[mood] = mood_counts.get(mood, 0) + 1
-        
         return {
             "mood_distribution": mood_counts,
             "most_common_mood": max(mood_counts.items(), key=lambda x: x[1])[0] if mood_counts else "不明"
         }
     
-    def _analyze_growth(self, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """成長の指標を分析"""
-        if len(entries) < 5:
+    def _analyze_growth(self, daily: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """成長の指標を分析（最初と最近の5件前後を含む日の平均文字数を比較）"""
+        total_entries = sum(day["count"] for day in daily)
+        if total_entries < 5:
             return {"message": "成長分析には5つ以上のエントリが必要です"}
         
+        def average_chars(days_in_order):
+            count = chars = 0
+            for day in days_in_order:
+                count += day["count"]
+                chars += day["chars"]
+                if count >= 5:
+                    break
+            return chars / count
+        
         # 文字数の変化
-        word_counts = [entry["word_count"] for entry in entries]
-        recent_avg = sum(word_counts[-5:]) / 5
-        early_avg = sum(word_counts[:5]) / 5
+        early_avg = average_chars(daily)
+        recent_avg = average_chars(reversed(daily))
         
         return {
             "writing_length_trend": {
@@ -304,8 +1137,8 @@ class DiaryHistory:
                 "improvement": recent_avg > early_avg
             },
             "consistency": {
-                "total_entries": len(entries),
-                "writing_consistency": "良好" if len(entries) > 10 else "改善の余地あり"
+                "total_entries": total_entries,
+                "writing_consistency": "良好" if total_entries > 10 else "改善の余地あり"
             }
         }
     
@@ -320,15 +1153,16 @@ class DiaryHistory:
             成功の場合True
         """
         try:
-            history = self._load_history()
-            profile = history["user_profile"]
-            
-            # プロフィールデータを更新
-            for key, value in profile_data.items():
-                if key in ["name", "age", "occupation", "interests", "goals"]:
-                    profile[key] = value
-            
-            self._save_history(history)
+            with self._write_lock:
+                manifest = self._load_manifest()
+                profile = manifest["user_profile"]
+                
+                # プロフィールデータを更新
+                for key, value in profile_data.items():
+                    if key in ["name", "age", "occupation", "interests", "goals"]:
+                        profile[key] = value
+                
+                self._save_manifest(manifest)
             return True
             
         except Exception as e:
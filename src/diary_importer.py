@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+"""
+過去の日記の一括インポート
+テキスト/Markdownファイルのディレクトリ、またはJSONLファイルから日記を読み込み、
+並列数を制限したワーカーでAI分析・Notion保存を行い、履歴にはまとめて書き込む
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional
+
+# 現在のディレクトリをパスに追加
+sys.path.append(os.path.dirname(__file__))
+
+from rate_limiter import RateLimiter
+
+# ファイル名先頭の日付（例: 2024-05-01_散歩.md, 20240501.txt）
+DATE_PATTERN = re.compile(r"^(\d{4})-?(\d{2})-?(\d{2})")
+TEXT_EXTENSIONS = (".txt", ".md", ".markdown")
+
+
+class DiaryImporter:
+    def __init__(self, diary_manager, max_workers: int = 4, batch_size: int = 20,
+                 openai_rate_per_second: float = 3.0, notion_rate_per_second: float = 3.0,
+                 checkpoint_file: str = None):
+        """
+        一括インポーターを初期化
+
+        Args:
+            diary_manager: DiaryManagerインスタンス
+            max_workers: 同時に処理する日記の最大数
+            batch_size: 履歴ファイルへまとめて書き込む件数
+            openai_rate_per_second: OpenAI APIの1秒あたりの最大呼び出し回数
+            notion_rate_per_second: Notion APIの1秒あたりの最大呼び出し回数（公式上限は平均3回/秒）
+            checkpoint_file: 進捗を記録するファイル（省略時は data/import_checkpoint.json）
+        """
+        self.diary_manager = diary_manager
+        self.max_workers = max(1, max_workers)
+        self.batch_size = max(1, batch_size)
+        self.checkpoint_file = checkpoint_file or os.path.join(
+            diary_manager.history.data_dir, "import_checkpoint.json"
+        )
+        self.logger = logging.getLogger(__name__)
+
+        # 外部APIの呼び出し頻度を全ワーカーで共有して制限
+        diary_manager.ai_analyzer.rate_limiter = RateLimiter(openai_rate_per_second, burst=self.max_workers)
+        diary_manager.notion_client.rate_limiter = RateLimiter(notion_rate_per_second)
+
+    def load_items(self, source: str) -> Iterator[Dict[str, Any]]:
+        """
+        インポート元から日記を順に読み込む
+
+        Args:
+            source: ディレクトリ（.txt/.md）またはJSONLファイルのパス
+
+        Yields:
+            key, content, title, date を持つ辞書
+        """
+        if os.path.isdir(source):
+            yield from self._load_directory(source)
+        elif source.endswith(".jsonl"):
+            yield from self._load_jsonl(source)
+        else:
+            raise ValueError(f"対応していないインポート元です: {source}")
+
+    def _load_directory(self, directory: str) -> Iterator[Dict[str, Any]]:
+        """ディレクトリ内のテキスト/Markdownファイルを読み込む"""
+        for root, _, files in os.walk(directory):
+            for file_name in sorted(files):
+                if not file_name.lower().endswith(TEXT_EXTENSIONS):
+                    continue
+
+                path = os.path.join(root, file_name)
+                with open(path, 'r', encoding='utf-8') as f:
+                    content = f.read().strip()
+                if not content:
+                    continue
+
+                title = None
+                # Markdownの先頭見出しをタイトルとして使う
+                first_line, _, rest = content.partition("\n")
+                if first_line.startswith("#"):
+                    title = first_line.lstrip("#").strip() or None
+                    content = rest.strip()
+
+                yield {
+                    "content": content,
+                    "title": title,
+                    "date": self._parse_date(file_name),
+                    "key": self._item_key(content, os.path.relpath(path, directory))
+                }
+
+    def _load_jsonl(self, path: str) -> Iterator[Dict[str, Any]]:
+        """JSONLファイル（1行1日記: content, title, date）を読み込む"""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError as e:
+                    self.logger.warning(f"JSONL解析エラー ({line_number}行目): {e}")
+                    continue
+
+                content = (record.get("content") or "").strip()
+                if not content:
+                    continue
+
+                date = record.get("date")
+                yield {
+                    "content": content,
+                    "title": record.get("title"),
+                    "date": self._parse_date(date) if date else None,
+                    "key": self._item_key(content, date or "")
+                }
+
+    def _parse_date(self, text: str) -> Optional[str]:
+        """文字列先頭の日付をYYYY-MM-DD形式で取り出す"""
+        match = DATE_PATTERN.match(os.path.basename(text))
+        if not match:
+            return None
+        try:
+            return datetime(*map(int, match.groups())).strftime("%Y-%m-%d")
+        except ValueError:
+            return None
+
+    def _item_key(self, content: str, origin: str) -> str:
+        """チェックポイント用の識別キー（内容と出どころのハッシュ）"""
+        return hashlib.sha1(f"{origin}\n{content}".encode("utf-8")).hexdigest()
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        """チェックポイントを読み込む"""
+        try:
+            if os.path.exists(self.checkpoint_file):
+                with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+        except Exception as e:
+            self.logger.error(f"チェックポイント読み込みエラー: {e}")
+        return {"completed": [], "failed": {}}
+
+    def _save_checkpoint(self, checkpoint: Dict[str, Any]):
+        """チェックポイントを保存"""
+        try:
+            tmp_file = f"{self.checkpoint_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, self.checkpoint_file)
+        except Exception as e:
+            self.logger.error(f"チェックポイント保存エラー: {e}")
+
+    def _process_item(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        """1件の日記を分析・Notion保存する（履歴への保存はまとめて行う）"""
+        result = self.diary_manager.create_diary_with_analysis(
+            item["content"], title=item["title"], date=item["date"], save_history=False,
+            # 一括インポートは画面の応答時間の制約がないので期限なし
+            idempotency_key=item["key"], deadline_seconds=0
+        )
+        if result["status"] != "success":
+            raise RuntimeError(result.get("message", "不明なエラー"))
+
+        return {
+            "title": result["generated_title"],
+            "content": item["content"],
+            "ai_analysis": result["ai_analysis"],
+            "created_at": f"{item['date']}T00:00:00" if item["date"] else None,
+            "idempotency_key": result["idempotency_key"],
+            "notion_page": result["diary_entry"],
+            "pending": result.get("pending")
+        }
+
+    def run(self, source: str) -> Dict[str, Any]:
+        """
+        一括インポートを実行（中断後に再実行すると完了済みの日記はスキップ）
+
+        Args:
+            source: ディレクトリまたはJSONLファイルのパス
+
+        Returns:
+            インポート結果の集計
+        """
+        checkpoint = self._load_checkpoint()
+        completed = set(checkpoint.get("completed", []))
+        failed = checkpoint.get("failed", {})
+        stats = {"imported": 0, "skipped": 0, "failed": 0}
+
+        pending_entries: List[Dict[str, Any]] = []
+        pending_keys: List[str] = []
+
+        def flush():
+            # 履歴に書き込んでからチェックポイントを進める（クラッシュ時は再処理される側に倒す）
+            if not pending_entries:
+                return
+            self.diary_manager.history.add_diary_entries(pending_entries)
+            completed.update(pending_keys)
+            for key in pending_keys:
+                failed.pop(key, None)
+            checkpoint["completed"] = sorted(completed)
+            checkpoint["failed"] = failed
+            self._save_checkpoint(checkpoint)
+            self.logger.info(f"インポート進捗: {len(completed)}件完了")
+            pending_entries.clear()
+            pending_keys.clear()
+
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for item in self.load_items(source):
+                if item["key"] in completed:
+                    stats["skipped"] += 1
+                    continue
+
+                # 読み込みすぎないよう、処理中の件数をワーカー数の2倍までに抑える
+                while len(in_flight) >= self.max_workers * 2:
+                    self._collect(in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done,
+                                  pending_entries, pending_keys, failed, stats)
+                    if len(pending_entries) >= self.batch_size:
+                        flush()
+
+                in_flight[executor.submit(self._process_item, item)] = item
+
+            while in_flight:
+                self._collect(in_flight, wait(in_flight, return_when=FIRST_COMPLETED).done,
+                              pending_entries, pending_keys, failed, stats)
+                if len(pending_entries) >= self.batch_size:
+                    flush()
+
+        flush()
+        checkpoint["failed"] = failed
+        self._save_checkpoint(checkpoint)
+        return stats
+
+    def _collect(self, in_flight: Dict, done, pending_entries: List[Dict[str, Any]],
+                 pending_keys: List[str], failed: Dict[str, str], stats: Dict[str, int]):
+        """完了したワーカーの結果を書き込み待ちリストへ移す"""
+        for future in done:
+            item = in_flight.pop(future)
+            try:
+                pending_entries.append(future.result())
+                pending_keys.append(item["key"])
+                stats["imported"] += 1
+            except Exception as e:
+                self.logger.error(f"インポート失敗 ({item['title'] or item['date'] or item['key'][:8]}): {e}")
+                failed[item["key"]] = str(e)
+                stats["failed"] += 1
+
+
+def main():
+    """コマンドラインから一括インポートを実行"""
+    parser = argparse.ArgumentParser(description="過去の日記を一括インポートしてAI分析します")
+    parser.add_argument("source", help="日記ファイル(.txt/.md)のディレクトリ、またはJSONLファイル")
+    parser.add_argument("--workers", type=int, default=4, help="同時処理数（デフォルト: 4）")
+    parser.add_argument("--batch-size", type=int, default=20, help="履歴へまとめて書き込む件数（デフォルト: 20）")
+    parser.add_argument("--openai-rps", type=float, default=3.0, help="OpenAI APIの1秒あたり最大呼び出し数")
+    parser.add_argument("--notion-rps", type=float, default=3.0, help="Notion APIの1秒あたり最大呼び出し数")
+    parser.add_argument("--checkpoint", default=None, help="チェックポイントファイルのパス")
+    args = parser.parse_args()
+    if args.openai_rps <= 0 or args.notion_rps <= 0:
+        parser.error("--openai-rps と --notion-rps は正の数で指定してください")
+
+    try:
+        import config
+    except ImportError:
+        print("エラー: src/config.pyファイルが見つかりません。")
+        sys.exit(1)
+
+    from diary_manager import DiaryManager
+
+    diary_manager = DiaryManager.from_config(config)
+    importer = DiaryImporter(
+        diary_manager,
+        max_workers=args.workers,
+        batch_size=args.batch_size,
+        openai_rate_per_second=args.openai_rps,
+        notion_rate_per_second=args.notion_rps,
+        checkpoint_file=args.checkpoint
+    )
+
+    print(f"📥 インポート開始: {args.source}")
+    stats = importer.run(args.source)
+    print(f"✅ 完了: {stats['imported']}件インポート / {stats['skipped']}件スキップ / {stats['failed']}件失敗")
+
+
+if __name__ == "__main__":
+    main()
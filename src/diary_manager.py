@@ -3,16 +3,35 @@
 NotionクライアントとAI分析機能を統合して日記アプリの中核機能を提供
 """
 
-from notion_diary_client import NotionDiaryClient
+from notion_diary_client import NotionDiaryClient, NotionWriteError
 from ai_analyzer import DiaryAIAnalyzer
 from diary_history import DiaryHistory
 from profile_manager import ProfileManager
-from typing import Dict, Any, List, Optional
+from mood_classifier import MoodClassifier
+from prompt_templates import PROMPT_VERSION
+from speculative_analysis import SpeculativeAnalyzer
+from deadline import Deadline
+from pipeline_checkpoint import PipelineCheckpoints
+from file_lock import InterProcessLock
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Callable
+import asyncio
+import hashlib
 import logging
+import os
+import threading
 from datetime import datetime
 
+# 日記1件ごとに実行するAI分析（ai_analysis のキー）
+ANALYSIS_TASKS = ("emotions", "summary", "advice")
+
+# 日記作成後に裏で生成する振り返りの上限（初回やインポート後のすべての期間の生成は cli.py refresh-digests で行う）
+AUTO_DIGEST_PERIODS = 4
+
 class DiaryManager:
-    def __init__(self, notion_api_key: str, notion_database_id: str, openai_api_key: str, data_dir: str = "data"):
+    def __init__(self, notion_api_key: str, notion_database_id: str, openai_api_key: str, data_dir: str = "data",
+                 openai_base_url: str = None, openai_model: str = None):
         """
         日記管理システムを初期化
         
@@ -21,83 +40,344 @@ class DiaryManager:
             notion_database_id: 日記データベースID
             openai_api_key: OpenAI API キー
             data_dir: データ保存ディレクトリ
+            openai_base_url: OpenAI互換APIのURL（省略時は公式API）
+            openai_model: アドバイス生成に使うモデル（省略時はルーターの既定値）
         """
         self.notion_client = NotionDiaryClient(notion_api_key, notion_database_id)
-        self.ai_analyzer = DiaryAIAnalyzer(openai_api_key)
+        self.ai_analyzer = DiaryAIAnalyzer(openai_api_key, base_url=openai_base_url, model=openai_model)
         self.history = DiaryHistory(data_dir)
         self.profile_manager = ProfileManager(data_dir)
         self.logger = logging.getLogger(__name__)
         
+        # 気分判定はまずローカル分類器で行い、確信度が低い場合のみLLMを使う
+        # （学習は初回の感情分析時に行い、起動を遅くしない）
+        self.ai_analyzer.mood_classifier_loader = lambda: MoodClassifier.from_history(self.history)
+        
+        # 入力中の本文からタイトル・気分を先に分析しておく
+        self.speculative = SpeculativeAnalyzer(self.ai_analyzer)
+        
+        # 実行中の日記作成（冪等キー -> 結果のFuture）。同じ内容の二重送信は同じ処理の完了を待つ
+        self.idempotency_window_minutes = 10
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # ローカル履歴の一覧のページキャッシュ（キー -> ページ）。日記を作成したら破棄する
+        self.page_cache_size = 32
+        self._page_cache: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._page_cache_lock = threading.Lock()
+        
+        # 日記作成の段階ごとの結果（失敗後の再実行は続きから再開する）
+        self.checkpoints = PipelineCheckpoints(data_dir)
+        
+        # 日記作成1回あたりの時間予算（秒）。AI分析はNotionへの保存用の時間を残して打ち切り、残りは後回しにする
+        self.deadline_seconds = 8.0
+        self.notion_reserve_seconds = 2.0
+        
+        # OpenAI・Notionの障害で後回しにした処理は、復旧（サーキットブレーカーが閉じた）時に裏でやり直す
+        # （ワーカープロセスごとに同時にやり直すと同じエントリのNotionページを重複して作るため、プロセス間で排他する）
+        self._backfill_lock = InterProcessLock(os.path.join(data_dir, "backfill.lock"))
+        for breaker in (self.ai_analyzer.circuit_breaker, self.notion_client.circuit_breaker):
+            breaker.on_close(self._schedule_backfill)
+        
+        # 長期の文脈に使う週・月の振り返りは、期間が締まった後に裏で生成する（同じ期間を複数のプロセスで生成しない）
+        self._digest_lock = InterProcessLock(os.path.join(data_dir, "digests.lock"))
+        
+        # 日記全文の並行取得に使う非同期クライアントと、それを動かすイベントループのスレッド
+        # （初回の取得時に作り、以降は使い回してHTTP接続を再利用する）
+        self._async_notion = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._async_lock = threading.Lock()
+        
         # ログ設定
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
         )
     
-    def create_diary_with_analysis(self, content: str, title: str = None, date: str = None) -> Dict[str, Any]:
+    @classmethod
+    def from_config(cls, config, **overrides) -> "DiaryManager":
+        """
+        設定モジュール（src/config.py）から日記管理システムを作成
+        
+        Args:
+            config: 設定モジュール
+            overrides: 設定値を上書きするコンストラクタ引数
+            
+        Returns:
+            DiaryManagerインスタンス
+        """
+        kwargs = {
+            "notion_api_key": config.NOTION_API_KEY,
+            "notion_database_id": config.NOTION_DATABASE_ID,
+            "openai_api_key": config.OPENAI_API_KEY,
+            "openai_base_url": getattr(config, "OPENAI_BASE_URL", None),
+            "openai_model": getattr(config, "OPENAI_MODEL", None)
+        }
+        kwargs.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**kwargs)
+    
+    def prefetch_analysis(self, content: str, session: str = None):
+        """
+        入力中の日記のタイトル・気分の先行分析を予約（入力が落ち着いたら開始される）
+        
+        Args:
+            content: 入力中の日記の内容
+            session: 画面のセッションID（タブごとに別の先行分析として扱う）
+        """
+        self.speculative.schedule(content, session)
+    
+    def make_idempotency_key(self, content: str, now: datetime = None, offset: int = 0) -> str:
+        """
+        日記内容のハッシュと時間帯から冪等キーを作る
+        
+        Args:
+            content: 日記の内容
+            now: 基準時刻（省略時は現在時刻）
+            offset: 時間帯をいくつずらすか（-1で直前の時間帯）
+            
+        Returns:
+            "内容ハッシュ:時間帯番号" 形式のキー
+        """
+        digest = hashlib.sha256(content.strip().encode("utf-8")).hexdigest()[:32]
+        window_seconds = self.idempotency_window_minutes * 60
+        bucket = int((now or datetime.now()).timestamp() // window_seconds) + offset
+        return f"{digest}:{bucket}"
+    
+    def make_idempotency_keys(self, content: str, now: datetime = None) -> List[str]:
+        """
+        重複確認に使う冪等キーの候補（今の時間帯のキーと、境目をまたいだ再送を拾うための直前の時間帯のキー）
+        
+        Args:
+            content: 日記の内容
+            now: 基準時刻（省略時は現在時刻）
+            
+        Returns:
+            [今の時間帯のキー, 直前の時間帯のキー]（新しく作る場合は先頭のキーを使う）
+        """
+        now = now or datetime.now()
+        return [self.make_idempotency_key(content, now), self.make_idempotency_key(content, now, offset=-1)]
+    
+    def create_diary_with_analysis(self, content: str, title: str = None, date: str = None,
+                                   save_history: bool = True, precomputed: Dict[str, Any] = None,
+                                   idempotency_key: str = None, deadline_seconds: float = None,
+                                   session: str = None, idempotency_keys: List[str] = None) -> Dict[str, Any]:
         """
         日記を作成し、AI分析も同時に実行（履歴を考慮したタイトル自動生成対応）
         
+        同じ冪等キーの作成が実行中ならその完了を待ち、保存済みなら保存済みの結果を返す
+        （ダブルクリックや再送でNotionページやAI分析が重複しないように）
+        
         Args:
             content: 日記の内容
             title: 日記のタイトル（省略時はAIが生成）
             date: 日付（ISO形式、省略時は現在日時）
+            save_history: Falseの場合はローカル履歴へ保存しない（一括インポートで後からまとめて保存する場合）
+            precomputed: 先行分析済みの title / emotions（省略時は先行分析の結果があれば使う）
+            idempotency_key: 冪等キー（省略時は内容のハッシュと時間帯から作る）
+            deadline_seconds: 時間予算（秒）。省略時は self.deadline_seconds、0なら期限なし
+            session: 先行分析を予約した画面のセッションID（prefetch_analysis と同じもの）
+            idempotency_keys: 冪等キーの候補（make_idempotency_keys の結果。受付時に作ったキーをワーカーに渡す場合）
             
         Returns:
             作成結果とAI分析結果（生成されたタイトル含む）
         """
+        if deadline_seconds is None:
+            deadline_seconds = self.deadline_seconds
+        deadline = Deadline(deadline_seconds) if deadline_seconds else None
+        
+        if idempotency_key:
+            keys = [idempotency_key]
+        else:
+            # 時間帯の境目をまたいだ再送も拾えるよう、直前の時間帯のキーも確認する
+            keys = list(idempotency_keys or self.make_idempotency_keys(content))
+        
+        with self._inflight_lock:
+            running = next((self._inflight[key] for key in keys if key in self._inflight), None)
+            if running is None:
+                future = Future()
+                self._inflight[keys[0]] = future
+        
+        if running is not None:
+            self.logger.info("同じ内容の日記を作成中のため、その結果を待ちます")
+            return dict(running.result(), deduplicated=True)
+        
+        try:
+            stored = self.history.find_entry_by_idempotency_key(keys)
+            if stored is not None:
+                self.logger.info(f"保存済みの日記を返します: {stored['title']}")
+                # 履歴への保存直後に止まったジョブの記録が残っていれば消す
+                for key in keys:
+                    self.checkpoints.complete(key)
+                result = self._stored_result(stored)
+            else:
+                # 途中で失敗したジョブがあれば、そのキーで続きから再開する
+                job_key = self.checkpoints.find_key(keys) or keys[0]
+                result = self._create_diary_with_analysis(content, title, date, save_history, precomputed, job_key,
+                                                          deadline, session)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(keys[0], None)
+    
+    def _stored_result(self, entry: Dict[str, Any]) -> Dict[str, Any]:
+        """保存済みの履歴エントリから作成結果を組み立てる"""
+        return {
+            "diary_entry": entry.get("notion_page", {}),
+            "generated_title": entry["title"],
+            "ai_analysis": entry["ai_analysis"],
+            "status": "success",
+            "context_used": False,
+            "idempotency_key": entry.get("idempotency_key"),
+            "pending": entry.get("pending", []),
+            "deduplicated": True
+        }
+    
+    def _run_analysis(self, content: str, context: str, profile_prefix: str,
+                      emotions: Dict[str, Any] = None, tasks=ANALYSIS_TASKS,
+                      deadline: Optional[Deadline] = None,
+                      on_result: Optional[Callable[[str, Any], None]] = None) -> tuple:
+        """
+        AI分析を実行（失敗した項目はエラー文を保存せず、後回しにする項目として返す）
+        
+        Args:
+            content: 日記の内容
+            context: 過去の日記履歴からの文脈情報
+            profile_prefix: ユーザープロフィール
+            emotions: 先行分析済みの感情分析結果
+            tasks: 実行する項目（ANALYSIS_TASKS の一部）
+            deadline: 期限（間に合わない項目は呼び出さずに後回しにする）
+            on_result: 項目が成功するたびに (項目, 結果) で呼ぶ関数（チェックポイントの記録用）
+            
+        Returns:
+            (成功した項目 -> 結果, 失敗した項目のリスト)
+        """
+        analysis: Dict[str, Any] = {}
+        failed = []
+        for task in tasks:
+            try:
+                if task == "emotions":
+                    value = emotions if emotions and "error" not in emotions else \
+                        self.ai_analyzer.analyze_emotion(content, strict=True, deadline=deadline)
+                elif task == "summary":
+                    value = self.ai_analyzer.generate_summary(content, strict=True, deadline=deadline)
+                else:
+                    value = self.ai_analyzer.generate_advice(content, context, profile_prefix,
+                                                             strict=True, deadline=deadline)
+                analysis[task] = value
+                if on_result is not None:
+                    on_result(task, value)
+            except Exception as e:
+                # 障害中（サーキットブレーカーが開いている間）や期限切れの場合は、呼び出さずにすぐここに来る
+                self.logger.warning(f"AI分析（{task}）を後回しにします: {e}")
+                failed.append(task)
+        return analysis, failed
+    
+    def _create_diary_with_analysis(self, content: str, title: Optional[str], date: Optional[str],
+                                    save_history: bool, precomputed: Optional[Dict[str, Any]],
+                                    idempotency_key: str, deadline: Optional[Deadline] = None,
+                                    session: Optional[str] = None) -> Dict[str, Any]:
+        """
+        日記作成とAI分析の本体（create_diary_with_analysis から冪等キーの確認後に呼ばれる）
+        
+        段階（タイトル → 感情・要約・アドバイス → Notionページ → ローカル履歴）ごとに結果をチェックポイントに記録し、
+        同じ冪等キーで再実行されたときは完了済みの段階を飛ばす
+        """
         try:
-            # 履歴からの文脈情報を取得
+            job = self.checkpoints.start(idempotency_key, content, title, date, save_history)
+            stages = job["stages"]
+            # 再実行の場合、前回のNotionページ作成が応答前に失敗していてもページはできている可能性がある
+            resumed = bool(stages)
+            if stages:
+                self.logger.info(f"途中まで完了した日記作成を再開します（完了済み: {', '.join(stages)}）")
+            title = title or job.get("title")
+            date = date or job.get("date")
+            
+            # AI分析はNotionへの保存の時間を残した期限で打ち切る
+            ai_deadline = deadline.reserve(self.notion_reserve_seconds) if deadline is not None else None
+            
+            # 履歴からの文脈情報を取得（毎回変わるのでプロンプトの末尾側に置かれる）
             context = self.history.get_context_for_analysis()
             
-            # プロフィールファイルから文脈情報を取得
-            profile_context = self.profile_manager.get_profile_for_ai()
+            # プロフィールファイルから文脈情報を取得（変更があるまでキャッシュされ、プロンプトの先頭側に固定で置かれる）
+            profile_prefix = self.profile_manager.get_profile_prefix()
+            context_used = bool(context.strip() or profile_prefix.strip())
             
-            # プロフィール情報と履歴を統合
-            full_context = ""
-            if profile_context:
-                full_context += f"【ユーザープロフィール】\n{profile_context}\n\n"
-            if context:
-                full_context += f"【日記履歴】\n{context}"
+            # 入力中に先行分析した結果があれば再利用する
+            if precomputed is None:
+                precomputed = self.speculative.take(
+                    content, timeout=ai_deadline.remaining() if ai_deadline is not None else None, session=session
+                ) or {}
             
             # タイトルが指定されていない場合はAIで生成
-            if not title:
-                generated_title = self.ai_analyzer.generate_title(content)
-            else:
+            if title:
                 generated_title = title
+            elif stages.get("title"):
+                generated_title = stages["title"]
+            elif precomputed.get("title"):
+                generated_title = precomputed["title"]
+            else:
+                generated_title = self.ai_analyzer.generate_title(content, deadline=ai_deadline)
+            if "title" not in stages:
+                self.checkpoints.save_stage(job, "title", generated_title)
+            
+            # AI分析を実行（履歴を考慮）。失敗した・間に合わない項目は後回しにして日記の保存は続ける
+            # Notionへの書き込みを始めた後の再実行では、ページと同じ分析結果を使う
+            if "ai_analysis" in stages:
+                ai_analysis = stages["ai_analysis"]
+            else:
+                done = {task: stages[task] for task in ANALYSIS_TASKS if task in stages}
+                analysis, failed = self._run_analysis(
+                    content, context, profile_prefix, precomputed.get("emotions"),
+                    tasks=[task for task in ANALYSIS_TASKS if task not in done], deadline=ai_deadline,
+                    on_result=lambda task, value: self.checkpoints.save_stage(job, task, value)
+                )
+                done.update(analysis)
+                ai_analysis = {task: done[task] for task in ANALYSIS_TASKS if task in done}
+                ai_analysis["prompt_version"] = PROMPT_VERSION
+                if failed:
+                    ai_analysis.update(status="pending", pending_tasks=failed)
+                self.checkpoints.save_stage(job, "ai_analysis", ai_analysis)
+            pending = ["analysis"] if ai_analysis.get("status") == "pending" else []
             
-            # 日記をNotionに作成
-            diary_entry = self.notion_client.create_diary_entry(generated_title, content, date)
+            # 本文とAI分析結果を1回のリクエストでNotionに作成（前回ページの途中で失敗していれば続きを書き込む）
+            diary_entry = self._write_notion_page(job, generated_title, content, date, ai_analysis, deadline, resumed)
+            if diary_entry is None:
+                diary_entry = {}
+                pending.append("notion")
             
-            if diary_entry:
-                # AI分析を実行（履歴を考慮）
-                emotion_analysis = self.ai_analyzer.analyze_emotion(content)
-                summary = self.ai_analyzer.generate_summary(content)
-                advice = self.ai_analyzer.generate_advice(content, full_context)  # 完全な文脈を追加
-                
-                ai_analysis = {
-                    "emotions": emotion_analysis,
-                    "summary": summary,
-                    "advice": advice
-                }
+            if diary_entry or "notion" in pending:
+                # 一覧のキャッシュは古くなるので破棄
+                self.clear_page_cache()
                 
-                # ローカル履歴にも保存
-                self.history.add_diary_entry(generated_title, content, ai_analysis)
-                
-                # AI分析結果をNotionページに追加
-                page_id = diary_entry.get("id")
-                if page_id:
-                    self.notion_client.add_ai_analysis_to_diary(page_id, ai_analysis)
+                # ローカル履歴にも保存（保存できたらジョブは完了。失敗時は記録を残して再実行で保存する）
+                if save_history:
+                    if self.history.add_diary_entry(generated_title, content, ai_analysis,
+                                                    idempotency_key=idempotency_key, notion_page=diary_entry,
+                                                    pending=pending):
+                        self.checkpoints.complete(idempotency_key)
+                        # 週・月が変わって最初の日記なら、締まった期間の振り返りを作る
+                        self._schedule_digest_refresh()
+                    if pending:
+                        # 期限で打ち切った分はすぐ裏でやり直す（障害中ならサーキットブレーカーが閉じるまで何もしない）
+                        self._schedule_backfill()
+                else:
+                    self.checkpoints.complete(idempotency_key)
                 
                 result = {
                     "diary_entry": diary_entry,
                     "generated_title": generated_title,
                     "ai_analysis": ai_analysis,
                     "status": "success",
-                    "context_used": bool(full_context.strip())  # 文脈が使用されたかを示す
+                    "context_used": context_used,  # 文脈が使用されたかを示す
+                    "idempotency_key": idempotency_key,
+                    "pending": pending  # 障害で後回しにした処理（"analysis", "notion"）
                 }
                 
-                self.logger.info(f"日記作成完了: {generated_title} (履歴考慮: {bool(full_context.strip())})")
+                self.logger.info(f"日記作成完了: {generated_title} (履歴考慮: {context_used})")
                 return result
             else:
                 return {"status": "error", "message": "日記の作成に失敗しました"}
@@ -106,6 +386,269 @@ class DiaryManager:
             self.logger.error(f"日記作成・分析エラー: {e}")
             return {"status": "error", "message": str(e)}
     
+    def _write_notion_page(self, job: Dict[str, Any], title: str, content: str, date: Optional[str],
+                           ai_analysis: Dict[str, Any], deadline: Optional[Deadline],
+                           resumed: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Notionページを作成（前回の実行でページの途中まで書き込んでいれば残りを追加する）
+        
+        再実行の場合は、作成の応答を受け取れなかったページがないか冪等キーで確認してから作成する
+        
+        Returns:
+            作成したページ（障害・期限切れでページを作れなかった場合はNone）
+            
+        Raises:
+            NotionWriteError: 障害以外の理由で失敗した場合、またはページの途中で失敗した場合
+        """
+        page = job["stages"].get("notion_page")
+        key = job["idempotency_key"]
+        try:
+            if page is None and resumed:
+                existing = self.notion_client.find_page_by_idempotency_key([key])
+                if existing is not None:
+                    self.logger.info(f"作成済みのNotionページを使います: {existing.get('id')}")
+                    # ページ作成のリクエストには本文の最初の1回分が含まれる
+                    page = {"id": existing["id"], "url": existing.get("url", ""), "batches_done": 1}
+            if page is None:
+                diary_entry = self.notion_client.create_diary_entry(title, content, date, ai_analysis,
+                                                                    deadline=deadline, idempotency_key=key)
+            else:
+                if page.get("batches_done"):
+                    self.notion_client.resume_diary_entry(page["id"], content, ai_analysis,
+                                                          page["batches_done"], page.get("url", ""))
+                diary_entry = {"id": page["id"], "url": page.get("url", "")}
+        except NotionWriteError as e:
+            if e.page_id is not None:
+                # ページは作成済みなので、再実行時に続きから書き込めるよう記録する
+                self.checkpoints.save_stage(job, "notion_page",
+                                            {"id": e.page_id, "url": e.page_url, "batches_done": e.batches_done})
+                raise
+            if not e.outage:
+                raise
+            # ページを作れていない障害時・期限切れ時はローカルにだけ保存し、後でページを作成する
+            self.logger.warning(f"Notionに障害が発生しているため、ローカル履歴にのみ保存します: {e}")
+            return None
+        
+        if diary_entry:
+            self.checkpoints.save_stage(job, "notion_page", {"id": diary_entry.get("id"), "url": diary_entry.get("url", "")})
+        return diary_entry
+    
+    def resume_pending_jobs(self) -> Dict[str, Any]:
+        """
+        途中で失敗した日記作成をまとめて続きから再開し、障害で後回しにした処理もやり直す
+        
+        Returns:
+            resumed（完了したジョブ数）, failed（失敗したジョブ数）, errors, backfill（後回し処理の結果）
+        """
+        resumed = 0
+        errors = []
+        for job in self.checkpoints.list_jobs():
+            # 一括インポートのジョブはインポートの再実行で再開する（履歴への保存はインポート側で行うため）
+            if not job.get("save_history", True):
+                continue
+            result = self.create_diary_with_analysis(
+                job["content"], title=job.get("title"), date=job.get("date"),
+                idempotency_key=job["idempotency_key"], deadline_seconds=0
+            )
+            if result["status"] == "success":
+                resumed += 1
+            else:
+                errors.append({"idempotency_key": job["idempotency_key"], "message": result.get("message", "")})
+        
+        return {
+            "status": "success",
+            "resumed": resumed,
+            "failed": len(errors),
+            "errors": errors,
+            "backfill": self.backfill_pending()
+        }
+    
+    def _schedule_backfill(self):
+        """後回しにした処理のやり直しを裏で開始（復旧した呼び出しを待たせない）"""
+        threading.Thread(target=self.backfill_pending, name="backfill-pending", daemon=True).start()
+    
+    def backfill_pending(self) -> Dict[str, Any]:
+        """
+        障害で後回しにしたAI分析・Notionページ作成をやり直す（サーキットブレーカーの復旧時にも自動で実行）
+        
+        Returns:
+            completed（すべて完了したエントリ数）, remaining（処理が残っているエントリ数）
+        """
+        if not self._backfill_lock.acquire(blocking=False):
+            return {"status": "skipped", "message": "やり直しを実行中です"}
+        
+        try:
+            completed = remaining = 0
+            for entry in self.history.get_pending_entries():
+                if self._backfill_entry(entry):
+                    completed += 1
+                else:
+                    remaining += 1
+            
+            if completed:
+                self.clear_page_cache()
+                self.logger.info(f"後回しにした処理を完了しました: {completed}件（残り{remaining}件）")
+                # 後から揃った要約を振り返りにも反映する
+                self._schedule_digest_refresh()
+            return {"status": "success", "completed": completed, "remaining": remaining}
+            
+        except Exception as e:
+            self.logger.error(f"後回し処理のやり直しエラー: {e}")
+            return {"status": "error", "message": str(e)}
+        finally:
+            self._backfill_lock.release()
+    
+    def _backfill_entry(self, entry: Dict[str, Any]) -> bool:
+        """
+        1件分の後回しにした処理をやり直す
+        
+        Returns:
+            すべて完了した場合True
+        """
+        pending = list(entry.get("pending", []))
+        ai_analysis = dict(entry.get("ai_analysis") or {})
+        updates: Dict[str, Any] = {}
+        notion_page = None
+        
+        if "analysis" in pending and self.ai_analyzer.circuit_breaker.is_available():
+            tasks = ai_analysis.get("pending_tasks") or list(ANALYSIS_TASKS)
+            missing = [task for task in tasks if not ai_analysis.get(task)]
+            context = self.history.get_context_for_analysis()
+            profile_prefix = self.profile_manager.get_profile_prefix()
+            analysis, failed = self._run_analysis(entry["content"], context, profile_prefix, tasks=missing)
+            ai_analysis.update(analysis)
+            updates.update(analysis)
+            
+            if not failed:
+                # 作成済みのページには、後から揃った分析結果を追記する（ページ未作成なら作成時に含める）
+                page_id = (entry.get("notion_page") or {}).get("id")
+                if "notion" in pending or not page_id or \
+                        self.notion_client.add_ai_analysis_to_diary(page_id, {task: ai_analysis[task] for task in tasks}):
+                    ai_analysis.update(status="complete", pending_tasks=[])
+                    updates.update(status="complete", pending_tasks=[])
+                    pending.remove("analysis")
+        
+        if "notion" in pending and self.notion_client.circuit_breaker.is_available():
+            page = entry.get("notion_page") or {}
+            try:
+                if not page.get("id"):
+                    # 作成の応答を受け取れずに後回しにした場合は、Notion側でページができている可能性がある
+                    existing = self.notion_client.find_page_by_idempotency_key([entry.get("idempotency_key")])
+                    if existing is not None:
+                        self.logger.info(f"作成済みのNotionページを使います ({entry['id']}): {existing.get('id')}")
+                        # ページ作成のリクエストには本文の最初の1回分と、保存時の分析結果が含まれる
+                        page = {"id": existing["id"], "url": existing.get("url", ""), "batches_done": 1,
+                                "ai_analysis": entry.get("ai_analysis") or {}}
+                if page.get("batches_done"):
+                    # 前回ページの途中で失敗したので、作成時と同じ分析結果で続きを書き込む
+                    page_analysis = page.get("ai_analysis") or {}
+                    self.notion_client.resume_diary_entry(page["id"], entry["content"], page_analysis,
+                                                          page["batches_done"], page.get("url", ""))
+                    notion_page = {"id": page["id"], "url": page.get("url", "")}
+                    pending.remove("notion")
+                    # ページ作成後に揃った分析結果は追記する（失敗したらAI分析の後回しとして追記をやり直す）
+                    added = {task: ai_analysis[task] for task in ANALYSIS_TASKS
+                             if ai_analysis.get(task) and ai_analysis.get(task) != page_analysis.get(task)}
+                    if added and not self.notion_client.add_ai_analysis_to_diary(page["id"], added):
+                        updates.update(status="pending", pending_tasks=list(added))
+                        if "analysis" not in pending:
+                            pending.append("analysis")
+                else:
+                    notion_page = self.notion_client.create_diary_entry(
+                        entry["title"], entry["content"], entry["created_at"][:10], ai_analysis,
+                        idempotency_key=entry.get("idempotency_key")
+                    )
+                    pending.remove("notion")
+            except NotionWriteError as e:
+                if e.page_id is not None:
+                    # ページは作成済みなので、次回は新しく作らずに続きから書き込む
+                    notion_page = {"id": e.page_id, "url": e.page_url, "batches_done": e.batches_done,
+                                   "ai_analysis": page.get("ai_analysis") if page.get("batches_done") else ai_analysis}
+                self.logger.warning(f"Notionページの書き込みを再度後回しにします ({entry['id']}): {e}")
+            except Exception as e:
+                self.logger.warning(f"Notionページの作成を再度後回しにします ({entry['id']}): {e}")
+        
+        self.history.update_entry(entry["id"], ai_analysis=updates or None, notion_page=notion_page, pending=pending)
+        return not pending
+    
+    def _schedule_digest_refresh(self):
+        """振り返りの生成を裏で開始（日記作成の応答を待たせない）"""
+        threading.Thread(target=self.refresh_digests, args=(AUTO_DIGEST_PERIODS,),
+                         name="refresh-digests", daemon=True).start()
+    
+    def refresh_digests(self, max_periods: Optional[int] = None) -> Dict[str, Any]:
+        """
+        新しいエントリが入った締まった週・月の振り返りと、全期間の振り返りを作り直す
+        （一度作った期間は、エントリが追加・要約が更新されるまで生成しない）
+        
+        Args:
+            max_periods: 1回で生成する週・月の数の上限（新しい期間から。省略時はすべて）
+        
+        Returns:
+            refreshed（生成した振り返りの数）, failed（生成に失敗した数）, remaining（次回以降に残った期間の数）
+        """
+        if not self._digest_lock.acquire(blocking=False):
+            return {"status": "skipped", "message": "振り返りを生成中です"}
+        
+        try:
+            refreshed = failed = 0
+            periods = self.history.get_stale_digest_periods()
+            for period in periods[:max_periods]:
+                if not self.ai_analyzer.circuit_breaker.is_available():
+                    break
+                try:
+                    source = self.history.get_digest_source(period)
+                    summary = self.ai_analyzer.generate_digest(source["text"]) if source["entry_count"] else ""
+                    self.history.save_digest(period["level"], period["key"], summary,
+                                             entry_count=source["entry_count"], mark=period["mark"])
+                    refreshed += 1
+                except Exception as e:
+                    # 作り直しの記録は残るので、次回の実行でやり直す
+                    self.logger.error(f"振り返り生成エラー（{period['key']}）: {e}")
+                    failed += 1
+            
+            # 全期間の振り返りは月ごとの振り返りから作る
+            overall = self.history.get_overall_digest_source()
+            if overall is not None and self.ai_analyzer.circuit_breaker.is_available():
+                try:
+                    self.history.save_digest("overall", "overall", self.ai_analyzer.generate_digest(overall["text"]),
+                                             months=overall["months"])
+                    refreshed += 1
+                except Exception as e:
+                    self.logger.error(f"全期間の振り返り生成エラー: {e}")
+                    failed += 1
+            
+            if refreshed:
+                self.logger.info(f"振り返りを生成しました: {refreshed}件")
+            stale = len(periods) + (1 if overall is not None else 0)
+            return {"status": "success", "refreshed": refreshed, "failed": failed, "remaining": stale - refreshed}
+            
+        except Exception as e:
+            self.logger.error(f"振り返り生成エラー: {e}")
+            return {"status": "error", "message": str(e)}
+        finally:
+            self._digest_lock.release()
+    
+    def clear_page_cache(self):
+        """一覧表示のページキャッシュを破棄"""
+        with self._page_cache_lock:
+            self._page_cache.clear()
+    
+    def _cached_page(self, key: tuple, loader) -> Dict[str, Any]:
+        """ページキャッシュにあれば返し、なければ loader() の結果をキャッシュして返す"""
+        with self._page_cache_lock:
+            if key in self._page_cache:
+                self._page_cache.move_to_end(key)
+                return self._page_cache[key]
+        
+        page = loader()
+        if page.get("status") == "success":
+            with self._page_cache_lock:
+                self._page_cache[key] = page
+                while len(self._page_cache) > self.page_cache_size:
+                    self._page_cache.popitem(last=False)
+        return page
+    
     def get_recent_diaries(self, limit: int = 5) -> Dict[str, Any]:
         """
         最近の日記を取得
@@ -116,8 +659,22 @@ class DiaryManager:
         Returns:
             日記リスト
         """
+        return self.get_recent_diaries_page(limit)
+    
+    def get_recent_diaries_page(self, page_size: int = 5, start_cursor: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Notionの日記を1ページ分取得（一覧の応答は NotionDiaryClient がキャッシュする）
+        
+        Args:
+            page_size: 1ページの件数
+            start_cursor: 前のページの next_cursor（省略時は先頭ページ）
+            
+        Returns:
+            日記リストと次のページのカーソル
+        """
         try:
-            diary_entries = self.notion_client.get_diary_entries(limit)
+            page = self.notion_client.get_diary_entries_page(page_size, start_cursor)
+            diary_entries = page["results"]
             
             if not diary_entries:
                 return {"status": "error", "message": "日記が見つかりませんでした"}
@@ -142,6 +699,8 @@ class DiaryManager:
             
             return {
                 "diary_entries": processed_entries,
+                "next_cursor": page["next_cursor"],
+                "has_more": page["has_more"],
                 "status": "success"
             }
             
@@ -149,6 +708,107 @@ class DiaryManager:
             self.logger.error(f"日記取得エラー: {e}")
             return {"status": "error", "message": str(e)}
     
+    def get_full_diaries(self, limit: int = 20) -> Dict[str, Any]:
+        """
+        最近の日記を本文・AI分析結果付きで取得（各ページの内容は非同期クライアントで並行取得）
+        
+        Args:
+            limit: 取得する件数
+            
+        Returns:
+            日記リスト
+        """
+        try:
+            client, loop = self._get_async_notion()
+            diaries = asyncio.run_coroutine_threadsafe(client.get_full_diaries(limit), loop).result()
+            if not diaries:
+                return {"status": "error", "message": "日記が見つかりませんでした"}
+            return {"status": "success", "diaries": diaries}
+            
+        except Exception as e:
+            self.logger.error(f"日記全文取得エラー: {e}")
+            return {"status": "error", "message": str(e)}
+    
+    def _get_async_notion(self) -> tuple:
+        """日記全文の取得用の非同期クライアントとイベントループ（初回のみ作成し、ループは専用スレッドで動かす）"""
+        with self._async_lock:
+            if self._async_loop is None:
+                from async_notion_client import AsyncNotionDiaryClient
+                
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-notion", daemon=True).start()
+                # 障害中に並行取得で呼び出し続けないよう、同期クライアントとサーキットブレーカーを共有する
+                self._async_notion = AsyncNotionDiaryClient(self.notion_client.api_key, self.notion_client.database_id,
+                                                            circuit_breaker=self.notion_client.circuit_breaker)
+                self._async_loop = loop
+            return self._async_notion, self._async_loop
+    
+    def get_history_page(self, offset: int = 0, page_size: int = 20, days: Optional[int] = None,
+                         preview_chars: int = 50) -> Dict[str, Any]:
+        """
+        ローカル履歴の日記を新しい順に1ページ分取得（履歴が更新されるまでキャッシュから返す）
+        
+        Args:
+            offset: 先頭から何件目のページか
+            page_size: 1ページの件数
+            days: 過去何日分に絞り込むか（省略時は全期間）
+            preview_chars: 要約を何文字まで返すか
+            
+        Returns:
+            表示用の行リストと総件数
+        """
+        key = ("history", self.history.get_version(), offset, page_size, days, preview_chars)
+        return self._cached_page(key, lambda: self._load_history_page(offset, page_size, days, preview_chars))
+    
+    def _load_history_page(self, offset: int, page_size: int, days: Optional[int],
+                           preview_chars: int) -> Dict[str, Any]:
+        """ローカル履歴から1ページ分取得して表示用に整形（本文やアドバイスは含めない）"""
+        try:
+            page = self.history.get_entries_page(offset, page_size, days)
+            rows = []
+            for entry in page["entries"]:
+                summary = entry["ai_analysis"].get("summary", "要約なし")
+                emotions = entry["ai_analysis"].get("emotions", {})
+                rows.append({
+                    "id": entry["id"],
+                    "date": entry["created_at"][:10],
+                    "title": entry["title"],
+                    "mood": emotions.get("overall_mood", "不明") if isinstance(emotions, dict) else "不明",
+                    "summary": summary[:preview_chars] + "..." if len(summary) > preview_chars else summary
+                })
+            
+            return {
+                "status": "success",
+                "entries": rows,
+                "total": page["total"],
+                "offset": page["offset"],
+                "page_size": page["limit"],
+                "has_more": page["has_more"]
+            }
+            
+        except Exception as e:
+            self.logger.error(f"履歴ページ取得エラー: {e}")
+            return {"status": "error", "message": str(e)}
+    
+    def search_diaries(self, query: str, days: Optional[int] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        ローカル履歴からキーワードで日記を検索
+        
+        Args:
+            query: キーワード（空白区切りで複数指定するとすべてを含むもの）
+            days: 過去何日分から探すか（Noneなら全期間）
+            limit: 最大件数
+            
+        Returns:
+            検索結果（新しい順）
+        """
+        try:
+            entries = self.history.search_entries(query, days, limit)
+            return {"query": query, "entries": entries, "count": len(entries), "status": "success"}
+        except Exception as e:
+            self.logger.error(f"日記検索エラー: {e}")
+            return {"status": "error", "message": str(e)}
+    
     def get_user_analytics(self) -> Dict[str, Any]:
         """
         ユーザーの分析情報を取得
@@ -163,6 +823,12 @@ class DiaryManager:
             return {
                 "user_profile": profile,
                 "patterns": patterns,
+                "ai_usage": self.ai_analyzer.get_usage_stats(),
+                "ai_routes": self.ai_analyzer.router.get_stats(),
+                "notion_cache": self.notion_client.listing_cache.get_stats(),
+                "circuit_breakers": [self.ai_analyzer.circuit_breaker.get_stats(),
+                                     self.notion_client.circuit_breaker.get_stats()],
+                "pending_entries": len(self.history.get_pending_entries()),
                 "status": "success"
             }
             
@@ -172,37 +838,36 @@ class DiaryManager:
     
     def get_diary_history_summary(self, days: int = 30) -> Dict[str, Any]:
         """
-        日記履歴の要約を取得
+        日記履歴の要約を取得（日別集計から作るので、読み込むのは日数分の行のみ）
         
         Args:
             days: 過去何日分を取得するか
             
         Returns:
-            履歴要約
+            履歴要約（日ごとの件数・気分・文字数・タイトルを含む）
         """
         try:
-            recent_entries = self.history.get_recent_entries(days)
+            daily = self.history.get_daily_rollup(days)
             
-            if not recent_entries:
+            if not daily:
                 return {"status": "success", "message": "指定期間内の日記がありません"}
             
+            mood_counts: Dict[str, int] = {}
+            for day in daily:
+                for mood, count in day["moods"].items():
+                    mood_counts[mood] = mood_counts.get(mood, 0) + count
+            
             summary = {
-                "total_entries": len(recent_entries),
+                "total_entries": sum(day["count"] for day in daily),
+                "writing_days": len(daily),
                 "date_range": {
-                    "start": recent_entries[-1]["created_at"][:10] if recent_entries else "",
-                    "end": recent_entries[0]["created_at"][:10] if recent_entries else ""
+                    "start": daily[-1]["date"],
+                    "end": daily[0]["date"]
                 },
-                "entries": []
+                "mood_counts": mood_counts,
+                "days": daily
             }
             
-            for entry in recent_entries:
-                summary["entries"].append({
-                    "title": entry["title"],
-                    "date": entry["created_at"][:10],
-                    "summary": entry["ai_analysis"].get("summary", "要約なし"),
-                    "mood": entry["ai_analysis"].get("emotions", {}).get("overall_mood", "不明")
-                })
-            
             return {"status": "success", "summary": summary}
             
         except Exception as e:
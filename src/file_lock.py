@@ -0,0 +1,69 @@
+"""
+プロセス間ファイルロック
+複数のワーカープロセスが同じ履歴ファイルを読み込み→更新→書き込みするときに、書き込みが混ざらないようにする
+"""
+
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windowsではプロセス内のロックのみ
+    fcntl = None
+
+
+class InterProcessLock:
+    def __init__(self, path: str):
+        """
+        ロックを初期化（ロックファイルは最初に取得するときに作成）
+
+        Args:
+            path: ロックファイルのパス
+        """
+        self.path = path
+        # 同じプロセス内ではスレッド間の排他と再入（ロック中のメソッドから別のロック中メソッドを呼ぶ）を扱う
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._file = None
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        ロックを取得（他プロセスが保持中なら解放されるまで待つ）
+
+        Args:
+            blocking: Falseの場合は待たずに、他のスレッド・プロセスが保持中ならFalseを返す
+
+        Returns:
+            取得できた場合True
+        """
+        if not self._thread_lock.acquire(blocking=blocking):
+            return False
+        if self._depth == 0 and fcntl is not None:
+            try:
+                self._file = open(self.path, "a")
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except Exception as e:
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                self._thread_lock.release()
+                if isinstance(e, BlockingIOError):
+                    return False
+                raise
+        self._depth += 1
+        return True
+
+    def release(self):
+        """ロックを解放"""
+        self._depth -= 1
+        if self._depth == 0 and self._file is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+        self._thread_lock.release()
+
+    def __enter__(self) -> "InterProcessLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,237 @@
+"""
+ジョブキュー
+日記作成などの重い処理をSQLiteのキュー（data/jobs.sqlite3）に登録し、
+ワーカープロセス（worker_pool.py）が取り出して実行する。画面はジョブIDで完了を確認する
+
+実行中のジョブはワーカーが定期的に heartbeat_at を更新する（リース）。更新が途絶えたジョブ
+（ワーカーの異常終了など）だけを待機中に戻し、動いているワーカーのジョブを二重に実行しない
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from typing import Dict, Any, List, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+
+# 実行中のジョブのリース（秒）。この間 heartbeat_at が更新されなければワーカーが止まったとみなす
+LEASE_SECONDS = 60.0
+# ワーカーが止まって戻されたジョブを何回まで再実行するか（毎回ワーカーを落とすジョブを繰り返さない）
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    dedupe_key TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    worker_pid INTEGER,
+    heartbeat_at REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_dedupe_key ON jobs (dedupe_key);
+"""
+
+
+class JobQueue:
+    def __init__(self, data_dir: str = "data"):
+        """
+        ジョブキューを初期化
+
+        Args:
+            data_dir: データ保存ディレクトリ
+        """
+        self.db_file = os.path.join(data_dir, "jobs.sqlite3")
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(data_dir, exist_ok=True)
+        with closing(self._connect()) as conn:
+            # 読み込み（進捗確認）と書き込み（ワーカー）が互いを待たないようにする
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # リースの列がない古いキューに列を追加する
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, sql_type in (("worker_pid", "INTEGER"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {sql_type}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """接続を作成（プロセス・スレッドごとに使い捨てる。トランザクションは明示的に開始する）"""
+        conn = sqlite3.connect(self.db_file, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    @staticmethod
+    def _to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        """行をジョブの辞書に変換"""
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def submit(self, kind: str, payload: Dict[str, Any], dedupe_key: Optional[str] = None,
+               alternate_keys: Optional[List[str]] = None) -> str:
+        """
+        ジョブを登録
+
+        Args:
+            kind: ジョブの種類（"create_diary" など）
+            payload: ワーカーに渡す引数
+            dedupe_key: 同じキーのジョブが待機中・実行中・完了済みなら新しく登録せずそのIDを返す（二重送信対策）
+            alternate_keys: dedupe_key と同じジョブとみなす別のキー（時間帯の境目をまたいだ再送など）
+
+        Returns:
+            ジョブID
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                keys = [dedupe_key, *(alternate_keys or [])] if dedupe_key else []
+                if keys:
+                    row = conn.execute(
+                        f"SELECT id FROM jobs WHERE dedupe_key IN ({', '.join('?' * len(keys))}) AND status != ? "
+                        "ORDER BY created_at DESC LIMIT 1",
+                        (*keys, ERROR)
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute("COMMIT")
+                        return row["id"]
+
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, payload, dedupe_key, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(payload, ensure_ascii=False), dedupe_key, QUEUED, time.time())
+                )
+                conn.execute("COMMIT")
+                return job_id
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def claim(self, worker: str, pid: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        最も古い待機中のジョブを1件取り出して実行中にする（複数のワーカーが同じジョブを取らないよう排他的に行う）
+
+        Args:
+            worker: ワーカー名
+            pid: ワーカーのプロセスID（省略時はこのプロセス）
+
+        Returns:
+            ジョブ（待機中のジョブがなければNone）
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, worker_pid = ?, attempts = attempts + 1, "
+                    "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (RUNNING, worker, pid or os.getpid(), now, now, row["id"])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return dict(self._to_job(row), status=RUNNING, worker=worker, attempts=row["attempts"] + 1)
+
+    def heartbeat(self, job_id: str):
+        """実行中のジョブのリースを延長（ワーカーが LEASE_SECONDS より短い間隔で呼ぶ）"""
+        with closing(self._connect()) as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None):
+        """ジョブの実行結果を記録"""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, json.dumps(result, ensure_ascii=False, default=str) if result is not None else None,
+                 error, time.time(), job_id)
+            )
+
+    def complete(self, job_id: str, result: Any):
+        """ジョブの完了を記録"""
+        self._finish(job_id, DONE, result=result)
+
+    def fail(self, job_id: str, error: str):
+        """ジョブの失敗を記録（同じ内容の再送は新しいジョブとして登録できる）"""
+        self._finish(job_id, ERROR, error=error)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ジョブを取得
+
+        Returns:
+            ジョブ（status, result, error などを含む。存在しなければNone）
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._to_job(row)
+            if job["status"] == QUEUED:
+                # 画面に順番を表示するため、先に待っているジョブ数を数える
+                job["queued_ahead"] = conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (QUEUED, job["created_at"])
+                ).fetchone()[0]
+            return job
+
+    def requeue_running(self, older_than_seconds: float = 0.0, pid: Optional[int] = None) -> int:
+        """
+        実行中のまま止まったジョブ（ワーカーが異常終了した場合など）を待機中に戻す
+        （MAX_ATTEMPTS 回実行しても終わらなかったジョブは失敗にする）
+
+        Args:
+            older_than_seconds: 最後のハートビートからこの秒数以上たったジョブのみ戻す（0ならすべて）
+            pid: 指定した場合はこのプロセスのワーカーが実行していたジョブのみ戻す（終了を確認したワーカー用）
+
+        Returns:
+            戻したジョブ数
+        """
+        condition = "status = ? AND COALESCE(heartbeat_at, started_at) <= ?"
+        params: list = [RUNNING, time.time() - older_than_seconds]
+        if pid is not None:
+            condition += " AND worker_pid = ?"
+            params.append(pid)
+
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE {condition} AND attempts >= ?",
+                    [ERROR, "ワーカーが処理中に停止したため中断しました", time.time(), *params, MAX_ATTEMPTS]
+                )
+                cursor = conn.execute(
+                    f"UPDATE jobs SET status = ?, worker = NULL, worker_pid = NULL WHERE {condition}",
+                    [QUEUED, *params]
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return cursor.rowcount
+
+    def get_stats(self) -> Dict[str, int]:
+        """状態ごとのジョブ数"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS count FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["count"] for row in rows}
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+モデルルーティング
+分析タスクごとに使うモデル・temperature・max_tokens・タイムアウトを決め、
+タイムアウト時により安価で速いモデルへ切り替える。ルートごとのレイテンシとコストも集計する
+"""
+
+import argparse
+import os
+import sys
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+# タスクごとの既定ルート
+# max_tokens / stop は出力の上限（応答時間のばらつきを抑える）、fallbacks はタイムアウト時に順に試すモデル
+DEFAULT_ROUTES: Dict[str, Dict[str, Any]] = {
+    "title": {"model": "gpt-4o-mini", "temperature": 0.6, "max_tokens": 40, "stop": ["\n"],
+              "timeout": 8.0, "fallbacks": ["gpt-3.5-turbo"]},
+    "emotion": {"model": "gpt-4o-mini", "temperature": 0.3, "max_tokens": 300, "stop": None,
+                "timeout": 10.0, "fallbacks": ["gpt-3.5-turbo"]},
+    "summary": {"model": "gpt-4o-mini", "temperature": 0.5, "max_tokens": 300, "stop": ["\n\n\n"],
+                "timeout": 15.0, "fallbacks": ["gpt-3.5-turbo"]},
+    "advice": {"model": "gpt-4o", "temperature": 0.7, "max_tokens": 700, "stop": None,
+               "timeout": 30.0, "fallbacks": ["gpt-4o-mini"]},
+    "digest": {"model": "gpt-4o-mini", "temperature": 0.3, "max_tokens": 400, "stop": None,
+               "timeout": 30.0, "fallbacks": ["gpt-3.5-turbo"]}
+}
+
+# 100万トークンあたりの料金（USD）: (入力, キャッシュ済み入力, 出力)
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4": (30.00, 30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50)
+}
+
+# パーセンタイルの計算に使う直近の呼び出し数（ルートごと。サーバーの稼働中に増え続けないよう上限を設ける）
+LATENCY_WINDOW = 1000
+
+
+class ModelRouter:
+    def __init__(self, routes: Optional[Dict[str, Dict[str, Any]]] = None, advice_model: Optional[str] = None):
+        """
+        モデルルーターを初期化
+
+        Args:
+            routes: タスク名 -> ルート設定（既定ルートに上書きする項目のみでよい）
+            advice_model: アドバイス生成に使うモデル（config.OPENAI_MODEL）
+        """
+        self.routes = {task: dict(route) for task, route in DEFAULT_ROUTES.items()}
+        if advice_model:
+            self.routes["advice"]["model"] = advice_model
+        for task, overrides in (routes or {}).items():
+            self.routes.setdefault(task, {}).update(overrides)
+
+        # (タスク, モデル) -> 集計値
+        self._stats: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_route(self, task: str) -> Dict[str, Any]:
+        """タスクのルート設定を取得"""
+        if task not in self.routes:
+            raise ValueError(f"未知の分析タスクです: {task}")
+        return self.routes[task]
+
+    def candidates(self, task: str) -> List[str]:
+        """試す順番に並べたモデルのリスト（重複なし）"""
+        route = self.get_route(task)
+        models = []
+        for model in [route["model"], *route.get("fallbacks", [])]:
+            if model not in models:
+                models.append(model)
+        return models
+
+    def record(self, task: str, model: str, latency: float, usage=None,
+               error: bool = False, fallback: bool = False, truncated: bool = False):
+        """
+        1回の呼び出し結果を記録
+
+        Args:
+            task: 分析タスク
+            model: 使用したモデル
+            latency: 所要時間（秒）
+            usage: APIの usage（失敗時はNone）
+            error: タイムアウトなどで失敗した場合True
+            fallback: 代替モデルでの呼び出しだった場合True
+            truncated: 出力がmax_tokensで打ち切られた場合True
+        """
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+
+        with self._lock:
+            stats = self._stats.setdefault((task, model), {
+                "calls": 0, "errors": 0, "fallbacks": 0, "truncated": 0, "latencies": deque(maxlen=LATENCY_WINDOW),
+                "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0
+            })
+            stats["calls"] += 1
+            stats["errors"] += int(error)
+            stats["fallbacks"] += int(fallback)
+            stats["truncated"] += int(truncated)
+            stats["latencies"].append(latency)
+            stats["prompt_tokens"] += prompt_tokens
+            stats["cached_tokens"] += cached_tokens
+            stats["completion_tokens"] += completion_tokens
+
+    def estimate_cost(self, model: str, prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> Optional[float]:
+        """トークン数から料金（USD）を見積もる（料金表にないモデルはNone）"""
+        prices = MODEL_PRICES.get(model)
+        if prices is None:
+            return None
+        input_price, cached_price, output_price = prices
+        return ((prompt_tokens - cached_tokens) * input_price
+                + cached_tokens * cached_price
+                + completion_tokens * output_price) / 1_000_000
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """
+        ルート（タスク×モデル）ごとのレイテンシとコストの集計（レイテンシは直近 LATENCY_WINDOW 回分）
+
+        Returns:
+            集計結果のリスト
+        """
+        with self._lock:
+            items = [(key, dict(stats, latencies=list(stats["latencies"]))) for key, stats in self._stats.items()]
+
+        results = []
+        for (task, model), stats in sorted(items):
+            latencies = sorted(stats["latencies"])
+            cost = self.estimate_cost(model, stats["prompt_tokens"], stats["cached_tokens"], stats["completion_tokens"])
+            succeeded = stats["calls"] - stats["errors"]
+            results.append({
+                "task": task,
+                "model": model,
+                "calls": stats["calls"],
+                "errors": stats["errors"],
+                "fallbacks": stats["fallbacks"],
+                "truncated": stats["truncated"],
+                "avg_output_tokens": stats["completion_tokens"] / succeeded if succeeded else 0.0,
+                "p50_latency": latencies[len(latencies) // 2] if latencies else 0.0,
+                "p95_latency": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+                "total_cost_usd": cost,
+                "cost_per_call_usd": cost / succeeded if cost is not None and succeeded else None
+            })
+        return results
+
+
+def main():
+    """各ルートを実際に呼び出してレイテンシとコストを比較"""
+    parser = argparse.ArgumentParser(description="分析タスクごとのモデルルートをベンチマークします")
+    parser.add_argument("--runs", type=int, default=3, help="タスクごとの実行回数")
+    parser.add_argument("--models", default=None,
+                        help="比較するモデル（カンマ区切り。省略時は各タスクの既定ルート）")
+    args = parser.parse_args()
+
+    sys.path.append(os.path.dirname(__file__))
+    try:
+        import config
+    except ImportError:
+        print("エラー: src/config.pyファイルが見つかりません。")
+        sys.exit(1)
+
+    from ai_analyzer import DiaryAIAnalyzer
+
+    sample = "今日は研究室で発表の準備をした。スライドがなかなかまとまらず焦ったが、夕方には形になって少し安心した。"
+    analyzer = DiaryAIAnalyzer(config.OPENAI_API_KEY, base_url=getattr(config, "OPENAI_BASE_URL", None),
+                               model=getattr(config, "OPENAI_MODEL", None))
+    models = [m.strip() for m in args.models.split(",")] if args.models else [None]
+
+    for model in models:
+        for task in ("title", "emotion", "summary", "advice"):
+            if model:
+                # 比較対象のモデルだけを使い、代替モデルには切り替えない
+                analyzer.router.routes[task].update({"model": model, "fallbacks": []})
+            for _ in range(args.runs):
+                request = analyzer.build_request(task, sample)
+                try:
+                    analyzer._chat(task, request)
+                except Exception as e:
+                    print(f"⚠️  {task} ({request['model']}): {e}")
+
+    print("📊 ルート別ベンチマーク")
+    print(f"{'タスク':<8} {'モデル':<16} {'回数':>4} {'p50(s)':>7} {'p95(s)':>7} {'出力tok':>7} {'1回あたり(USD)':>14}")
+    for row in analyzer.router.get_stats():
+        cost = f"{row['cost_per_call_usd']:.6f}" if row["cost_per_call_usd"] is not None else "-"
+        print(f"{row['task']:<8} {row['model']:<16} {row['calls']:>4} "
+              f"{row['p50_latency']:>7.2f} {row['p95_latency']:>7.2f} {row['avg_output_tokens']:>7.1f} {cost:>14}")
+
+
+if __name__ == "__main__":
+    main()
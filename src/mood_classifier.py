@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+ローカル気分分類器
+文字n-gramの多項ナイーブベイズで日記の全体的な気分（positive/neutral/negative）を判定し、
+確信度が高い場合はLLMを呼ばずに感情分析結果を返す
+"""
+
+import argparse
+import math
+import os
+import sys
+import threading
+import time
+import logging
+from typing import Dict, Any, List, Tuple, Iterable
+
+LABELS = ("positive", "neutral", "negative")
+
+# ローカル判定を採用する確信度の閾値（DiaryAIAnalyzer とベンチマークで共通）
+CONFIDENCE_THRESHOLD = 0.85
+
+# 学習データが少ないうちに使う初期語彙（気分ラベルごとの擬似文書）
+SEED_LEXICON = {
+    "positive": [
+        "嬉しい", "楽しい", "楽しかった", "幸せ", "充実", "充実した", "達成", "成功", "良かった",
+        "よかった", "感謝", "ありがとう", "最高", "ワクワク", "頑張れた", "うまくいった",
+        "褒められ", "笑った", "元気", "前向き", "安心した", "スッキリ", "満足", "好き"
+    ],
+    "neutral": [
+        "普通", "いつも通り", "特に", "予定", "作業", "移動", "会議", "買い物", "昼食",
+        "夕食", "天気", "確認した", "準備", "記録", "まあまあ", "淡々と"
+    ],
+    "negative": [
+        "悲しい", "辛い", "つらい", "疲れた", "しんどい", "不安", "心配", "怖い", "寂しい",
+        "イライラ", "腹が立", "落ち込", "失敗", "後悔", "最悪", "眠れない", "憂鬱",
+        "焦り", "ストレス", "嫌だ", "泣いた", "うまくいかない", "怒られ", "体調が悪"
+    ]
+}
+
+# 検出された感情のリスト用（LLMの emotions 出力に相当）
+EMOTION_LEXICON = {
+    "喜び": ["嬉し", "楽し", "幸せ", "喜", "笑"],
+    "充実感": ["充実", "達成", "満足", "頑張れ"],
+    "感謝": ["感謝", "ありがと"],
+    "期待": ["楽しみ", "期待", "ワクワク"],
+    "安心": ["安心", "ほっと", "スッキリ"],
+    "悲しみ": ["悲し", "寂し", "泣"],
+    "怒り": ["怒", "腹が立", "イライラ", "ムカ"],
+    "不安": ["不安", "心配", "怖", "焦"],
+    "疲れ": ["疲れ", "しんど", "だる", "眠"],
+    "後悔": ["後悔", "失敗", "反省"]
+}
+
+
+class MoodClassifier:
+    def __init__(self, ngram_range: Tuple[int, int] = (1, 3), alpha: float = 1.0,
+                 evidence_scale: float = 8.0):
+        """
+        気分分類器を初期化
+
+        Args:
+            ngram_range: 使用する文字n-gramの長さの範囲
+            alpha: ラプラススムージング係数
+            evidence_scale: n-gram1個あたりの平均対数尤度を確信度に換算する係数
+        """
+        self.ngram_range = ngram_range
+        self.alpha = alpha
+        self.evidence_scale = evidence_scale
+        self.logger = logging.getLogger(__name__)
+
+        self._feature_counts: Dict[str, Dict[str, int]] = {label: {} for label in LABELS}
+        self._total_counts = {label: 0 for label in LABELS}
+        self._doc_counts = {label: 0 for label in LABELS}
+        # 特徴量 -> ラベルごとの log(出現数 + alpha)。学習した文書のn-gramだけを更新し、
+        # 語彙数・総数に依存する分母は予測時にラベルごとに1回だけ引く（追加学習で表全体を作り直さない）
+        self._log_counts: Dict[str, Tuple[float, ...]] = {}
+        # LLMのラベルでの追加学習と、他スレッドからの予測を排他する
+        self._lock = threading.Lock()
+
+    def _ngrams(self, text: str) -> Iterable[str]:
+        """空白を除いた文字n-gramを列挙"""
+        text = "".join(text.split())
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                yield text[i:i + n]
+
+    def learn(self, text: str, label: str):
+        """
+        1件の日記と気分ラベルを学習（LLMのラベルが得られるたびに追加学習できる）
+
+        Args:
+            text: 日記の内容
+            label: positive / neutral / negative
+        """
+        if label not in LABELS or not text:
+            return
+
+        grams = list(self._ngrams(text))
+        with self._lock:
+            counts = self._feature_counts[label]
+            for gram in grams:
+                counts[gram] = counts.get(gram, 0) + 1
+            self._total_counts[label] += len(grams)
+            self._doc_counts[label] += 1
+            for gram in set(grams):
+                self._log_counts[gram] = tuple(
+                    math.log(self._feature_counts[l].get(gram, 0) + self.alpha) for l in LABELS
+                )
+
+    def fit(self, texts: List[str], labels: List[str]) -> "MoodClassifier":
+        """複数の日記をまとめて学習"""
+        for text, label in zip(texts, labels):
+            self.learn(text, label)
+        return self
+
+    def predict(self, text: str) -> Tuple[str, float]:
+        """
+        気分ラベルと確信度を予測
+
+        Args:
+            text: 日記の内容
+
+        Returns:
+            (ラベル, 確信度0-1)
+        """
+        grams = list(self._ngrams(text))
+        scores = [0.0] * len(LABELS)
+        matched = 0
+        with self._lock:
+            # 学習語彙にないn-gramは全ラベルでほぼ同じ値なので無視する
+            for gram in grams:
+                log_counts = self._log_counts.get(gram)
+                if log_counts is None:
+                    continue
+                matched += 1
+                for i, value in enumerate(log_counts):
+                    scores[i] += value
+
+            vocab_size = max(len(self._log_counts), 1)
+            denominators = [
+                math.log(self._total_counts[label] + self.alpha * vocab_size) for label in LABELS
+            ]
+            total_docs = sum(self._doc_counts.values())
+            log_priors = [
+                math.log((self._doc_counts[label] + 1) / (total_docs + len(LABELS))) for label in LABELS
+            ]
+
+        if matched == 0:
+            return "neutral", 0.0
+
+        # 長文ほど事後確率が極端になるのを防ぐため、n-gram1個あたりの平均で確信度を出す
+        # （n-gramごとの対数確率は log(出現数 + alpha) - 分母 なので、平均では分母を1回引けばよい）
+        logits = [
+            log_priors[i] + (scores[i] / matched - denominators[i]) * self.evidence_scale
+            for i in range(len(LABELS))
+        ]
+        top = max(logits)
+        exps = [math.exp(value - top) for value in logits]
+        total = sum(exps)
+        best = max(range(len(LABELS)), key=lambda i: exps[i])
+        return LABELS[best], exps[best] / total
+
+    def detect_emotions(self, text: str) -> List[str]:
+        """語彙から検出された感情のリストを返す"""
+        return [emotion for emotion, words in EMOTION_LEXICON.items() if any(w in text for w in words)]
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """
+        analyze_emotion と同じ形式の感情分析結果を返す
+
+        Args:
+            text: 日記の内容
+
+        Returns:
+            感情分析結果（source: "local"）
+        """
+        mood, confidence = self.predict(text)
+        emotions = self.detect_emotions(text)
+        return {
+            "overall_mood": mood,
+            "emotions": emotions,
+            "confidence": round(confidence, 3),
+            "summary": f"ローカル分類器による判定: {mood}（{'、'.join(emotions) or '特徴的な感情語なし'}）",
+            "source": "local"
+        }
+
+    @classmethod
+    def from_history(cls, history, **kwargs) -> "MoodClassifier":
+        """
+        初期語彙と保存済みの日記（LLMが付けた overall_mood）から分類器を作成
+
+        Args:
+            history: DiaryHistoryインスタンス
+
+        Returns:
+            学習済みの分類器
+        """
+        classifier = cls(**kwargs)
+        for label, words in SEED_LEXICON.items():
+            for word in words:
+                classifier.learn(word, label)
+
+        for text, label in labeled_entries(history.get_all_entries()):
+            classifier.learn(text, label)
+        return classifier
+
+    def benchmark(self, texts: List[str], labels: List[str],
+                  threshold: float = CONFIDENCE_THRESHOLD) -> Dict[str, Any]:
+        """
+        LLMのラベルと比較した精度と判定時間を計測
+
+        Args:
+            texts: 日記の内容
+            labels: LLMが付けた気分ラベル
+            threshold: ローカル判定を採用する確信度の閾値
+
+        Returns:
+            精度・閾値以上の割合（LLM呼び出し削減率）・1件あたりの判定時間
+        """
+        correct = confident = confident_correct = 0
+        started = time.perf_counter()
+        for text, label in zip(texts, labels):
+            predicted, confidence = self.predict(text)
+            correct += predicted == label
+            if confidence >= threshold:
+                confident += 1
+                confident_correct += predicted == label
+        elapsed = time.perf_counter() - started
+
+        total = max(len(texts), 1)
+        return {
+            "samples": len(texts),
+            "accuracy": correct / total,
+            "coverage": confident / total,
+            "accuracy_when_confident": confident_correct / confident if confident else None,
+            "avg_latency_us": elapsed / total * 1_000_000
+        }
+
+
+def labeled_entries(entries: List[Dict[str, Any]]) -> List[Tuple[str, str]]:
+    """LLMが付けた気分ラベルを持つエントリを (内容, ラベル) で取り出す"""
+    pairs = []
+    for entry in entries:
+        emotions = entry.get("ai_analysis", {}).get("emotions", {})
+        if not isinstance(emotions, dict) or emotions.get("source") == "local":
+            continue
+        mood = emotions.get("overall_mood")
+        if mood in LABELS:
+            pairs.append((entry["content"], mood))
+    return pairs
+
+
+def main():
+    """保存済み履歴のLLMラベルを使ってローカル分類器をベンチマーク"""
+    parser = argparse.ArgumentParser(description="ローカル気分分類器をLLMのラベルと比較します")
+    parser.add_argument("--data-dir", default="data", help="データ保存ディレクトリ")
+    parser.add_argument("--threshold", type=float, default=CONFIDENCE_THRESHOLD,
+                        help=f"ローカル判定を採用する確信度（デフォルト: {CONFIDENCE_THRESHOLD}。日記作成時と同じ）")
+    parser.add_argument("--folds", type=int, default=5, help="交差検証の分割数")
+    args = parser.parse_args()
+
+    sys.path.append(os.path.dirname(__file__))
+    from diary_history import DiaryHistory
+
+    pairs = labeled_entries(DiaryHistory(args.data_dir).get_all_entries())
+    if len(pairs) < 2:
+        print("ベンチマークにはLLMの気分ラベル付きの日記が2件以上必要です。")
+        return
+
+    # 評価対象を学習に含めないよう交差検証で計測
+    folds = min(args.folds, len(pairs))
+    totals = {"samples": 0, "correct": 0.0, "confident": 0.0, "confident_correct": 0.0, "latency": 0.0}
+    for fold in range(folds):
+        train = [p for i, p in enumerate(pairs) if i % folds != fold]
+        test = [p for i, p in enumerate(pairs) if i % folds == fold]
+
+        classifier = MoodClassifier()
+        for label, words in SEED_LEXICON.items():
+            classifier.fit(words, [label] * len(words))
+        classifier.fit([t for t, _ in train], [l for _, l in train])
+
+        result = classifier.benchmark([t for t, _ in test], [l for _, l in test], args.threshold)
+        n = result["samples"]
+        totals["samples"] += n
+        totals["correct"] += result["accuracy"] * n
+        totals["confident"] += result["coverage"] * n
+        totals["confident_correct"] += (result["accuracy_when_confident"] or 0) * result["coverage"] * n
+        totals["latency"] += result["avg_latency_us"] * n
+
+    n = totals["samples"]
+    print(f"📊 ローカル気分分類器ベンチマーク（{n}件, {folds}分割交差検証）")
+    print(f"精度（LLMラベルとの一致率）: {totals['correct'] / n * 100:.1f}%")
+    print(f"確信度{args.threshold}以上の割合（LLM呼び出し削減率）: {totals['confident'] / n * 100:.1f}%")
+    if totals["confident"]:
+        print(f"確信度{args.threshold}以上での精度: {totals['confident_correct'] / totals['confident'] * 100:.1f}%")
+    print(f"1件あたりの判定時間: {totals['latency'] / n:.1f}µs")
+
+
+if __name__ == "__main__":
+    main()
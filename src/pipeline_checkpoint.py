@@ -0,0 +1,114 @@
+"""
+日記作成のチェックポイント
+タイトル生成・AI分析・Notionページ作成など段階ごとの結果をジョブ記録として保存し、
+失敗後の再実行では完了済みの段階を飛ばして続きから再開する
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+
+class PipelineCheckpoints:
+    def __init__(self, data_dir: str = "data"):
+        """
+        チェックポイントの保存先を初期化
+
+        Args:
+            data_dir: データ保存ディレクトリ（ジョブ記録は checkpoints/ 以下に1ジョブ1ファイルで保存）
+        """
+        self.checkpoint_dir = os.path.join(data_dir, "checkpoints")
+        self.logger = logging.getLogger(__name__)
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        """ジョブ記録のファイルパス（冪等キーにはファイル名に使えない文字が入りうるのでハッシュにする）"""
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.checkpoint_dir, f"{name}.json")
+
+    def _write(self, job: Dict[str, Any]):
+        """ジョブ記録を保存（書きかけのファイルを残さないよう一時ファイルから置き換える）"""
+        job["updated_at"] = datetime.now().isoformat()
+        path = self._path(job["idempotency_key"])
+        try:
+            tmp_file = f"{path}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(job, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, path)
+        except Exception as e:
+            self.logger.error(f"チェックポイント保存エラー: {e}")
+
+    def load(self, key: str) -> Optional[Dict[str, Any]]:
+        """冪等キーのジョブ記録を読み込む（なければNone）"""
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"チェックポイント読み込みエラー: {e}")
+            return None
+
+    def find_key(self, keys: List[str]) -> Optional[str]:
+        """候補の冪等キーのうち、途中まで進んだジョブがあるもの（なければNone）"""
+        return next((key for key in keys if os.path.exists(self._path(key))), None)
+
+    def start(self, key: str, content: str, title: Optional[str] = None, date: Optional[str] = None,
+              save_history: bool = True) -> Dict[str, Any]:
+        """
+        ジョブを開始（同じ冪等キーのジョブ記録があればそれを返して再開する）
+
+        Args:
+            key: 冪等キー（ジョブID）
+            content: 日記の内容
+            title: 指定されたタイトル
+            date: 指定された日付
+            save_history: ローカル履歴への保存までをこのジョブで行うか
+
+        Returns:
+            ジョブ記録（stages に完了済みの段階の結果を持つ）
+        """
+        job = self.load(key)
+        if job is None:
+            job = {
+                "idempotency_key": key,
+                "content": content,
+                "title": title,
+                "date": date,
+                "save_history": save_history,
+                "created_at": datetime.now().isoformat(),
+                "stages": {}
+            }
+            self._write(job)
+        return job
+
+    def save_stage(self, job: Dict[str, Any], stage: str, value: Any):
+        """段階の結果を記録"""
+        job["stages"][stage] = value
+        self._write(job)
+
+    def complete(self, key: str):
+        """ジョブが完了したので記録を削除"""
+        path = self._path(key)
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except Exception as e:
+            self.logger.error(f"チェックポイント削除エラー: {e}")
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """途中で止まっているジョブの一覧（古い順）"""
+        jobs = []
+        for name in os.listdir(self.checkpoint_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.checkpoint_dir, name), 'r', encoding='utf-8') as f:
+                    jobs.append(json.load(f))
+            except Exception as e:
+                self.logger.error(f"チェックポイント読み込みエラー ({name}): {e}")
+        return sorted(jobs, key=lambda job: job.get("created_at", ""))
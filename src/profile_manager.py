@@ -5,7 +5,9 @@ data/profile.jsonを読み書きして、AIの文脈に使用
 
 import json
 import os
-from typing import Dict, Any, List
+import hashlib
+import threading
+from typing import Dict, Any, List, Optional
 import logging
 
 class ProfileManager:
@@ -22,6 +24,54 @@ class ProfileManager:
         
         # データディレクトリを作成
         os.makedirs(data_dir, exist_ok=True)
+        
+        # 描画済みのAI用文脈・要約のキャッシュ（ファイルの更新時刻・サイズ・内容ハッシュで判定）
+        self._cache: Optional[Dict[str, Any]] = None
+        self._cache_lock = threading.Lock()
+    
+    def _file_signature(self) -> Optional[tuple]:
+        """プロフィールファイルの更新時刻とサイズ（存在しなければNone）"""
+        try:
+            stat = os.stat(self.profile_file)
+            return (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            return None
+    
+    def _get_cache(self) -> Dict[str, Any]:
+        """
+        プロフィールと描画結果のキャッシュを取得
+        ファイルの更新時刻・サイズが変わった場合のみ読み直し、内容ハッシュが同じなら描画結果を再利用する
+        """
+        signature = self._file_signature()
+        with self._cache_lock:
+            cache = self._cache
+            if cache is not None and cache["signature"] == signature:
+                return cache
+            
+            raw = b""
+            if signature is not None:
+                with open(self.profile_file, 'rb') as f:
+                    raw = f.read()
+            content_hash = hashlib.sha256(raw).hexdigest()
+            
+            if cache is not None and cache["hash"] == content_hash:
+                cache["signature"] = signature
+                return cache
+            
+            profile = json.loads(raw.decode('utf-8')) if raw else {}
+            self._cache = {
+                "signature": signature,
+                "hash": content_hash,
+                "profile": profile,
+                "ai_context": self._render_profile_for_ai(profile),
+                "summary": self._render_profile_summary(profile)
+            }
+            return self._cache
+    
+    def invalidate_cache(self):
+        """キャッシュを破棄（次回アクセス時に読み直す）"""
+        with self._cache_lock:
+            self._cache = None
     
     def load_profile(self) -> Dict[str, Any]:
         """
@@ -53,6 +103,7 @@ class ProfileManager:
         try:
             with open(self.profile_file, 'w', encoding='utf-8') as f:
                 json.dump(profile_data, f, ensure_ascii=False, indent=2)
+            self.invalidate_cache()
             return True
         except Exception as e:
             self.logger.error(f"プロフィール保存エラー: {e}")
@@ -60,14 +111,39 @@ class ProfileManager:
     
     def get_profile_for_ai(self) -> str:
         """
-        AI用のプロフィール文脈を生成
+        AI用のプロフィール文脈を取得（プロフィールが変わるまでキャッシュを使用）
         
         Returns:
             AI分析用のプロフィール文字列
         """
         try:
-            profile = self.load_profile()
-            
+            return self._get_cache()["ai_context"]
+        except Exception as e:
+            self.logger.error(f"AI用プロフィール生成エラー: {e}")
+            return ""
+    
+    def get_profile_prefix(self) -> str:
+        """
+        プロンプト先頭に置くためのプロフィール文脈
+        プロフィールが変わらない限り毎回同じ文字列になるので、プロンプトキャッシュの共通接頭辞として使える
+        
+        Returns:
+            見出し付きのプロフィール文脈（未設定なら空文字）
+        """
+        profile_context = self.get_profile_for_ai()
+        return f"【ユーザープロフィール】\n{profile_context}\n\n" if profile_context else ""
+    
+    def get_profile_version(self) -> str:
+        """プロフィール内容のハッシュ（短縮形）"""
+        try:
+            return self._get_cache()["hash"][:12]
+        except Exception as e:
+            self.logger.error(f"プロフィールバージョン取得エラー: {e}")
+            return ""
+    
+    def _render_profile_for_ai(self, profile: Dict[str, Any]) -> str:
+        """プロフィールデータからAI用の文脈文字列を組み立てる"""
+        try:
             if not profile:
                 return ""
             
@@ -166,14 +242,20 @@ class ProfileManager:
     
     def get_profile_summary(self) -> str:
         """
-        プロフィールの要約を取得
+        プロフィールの要約を取得（プロフィールが変わるまでキャッシュを使用）
         
         Returns:
             プロフィール要約文字列
         """
         try:
-            profile = self.load_profile()
-            
+            return self._get_cache()["summary"]
+        except Exception as e:
+            self.logger.error(f"プロフィール要約生成エラー: {e}")
+            return "プロフィール要約の生成に失敗しました。"
+    
+    def _render_profile_summary(self, profile: Dict[str, Any]) -> str:
+        """プロフィールデータから要約文字列を組み立てる"""
+        try:
             if not profile:
                 return "プロフィールが設定されていません。"
             
@@ -0,0 +1,102 @@
+"""
+プロンプトテンプレート
+分析タスクごとのプロンプトをバージョン管理し、プロバイダー側のプロンプトキャッシュが効くように
+「固定の指示 → ユーザープロフィール → 変化する内容（履歴・今日の日記）」の順で組み立てる
+"""
+
+from typing import Dict, Any, List
+
+# テンプレートを変更したら更新する（保存される分析結果に記録され、再分析の対象判定に使える）
+PROMPT_VERSION = "v2"
+
+TEMPLATES: Dict[str, Dict[str, Any]] = {
+    "emotion": {
+        "system": "あなたは日記の感情分析を行う専門家です。",
+        "instructions": """ユーザーから送られる日記の内容から感情を分析してください。
+結果はJSON形式で、以下の項目を含めてください：
+- overall_mood: 全体的な気分（positive/neutral/negative）
+- emotions: 検出された感情のリスト（喜び、悲しみ、怒り、不安、期待など）
+- confidence: 分析の信頼度（0-1の数値）
+- summary: 感情についての簡潔な説明""",
+        "uses_profile": False
+    },
+    "summary": {
+        "system": "あなたは日記の要約を作成する専門家です。",
+        "instructions": """ユーザーから送られる日記を簡潔に要約してください。
+重要なポイントや出来事を3-4文でまとめてください。""",
+        "uses_profile": False
+    },
+    "advice": {
+        "system": "あなたは親身になって相談に乗る優しいカウンセラーです。長期的な関係性を大切にし、継続的なサポートを提供します。",
+        "instructions": """あなたは長期間にわたってこのユーザーの日記を見守っている優しいカウンセラーです。
+ユーザーのプロフィールと、送られてくる履歴・傾向を参考に、今日の日記に対して継続的で個人的なアドバイスを提供してください。
+履歴がない場合は、建設的で励ましになるアドバイスを優しく支援的な言葉で提供してください。
+
+以下の点を考慮してアドバイスしてください：
+- 過去の経験や成長の軌跡を踏まえる
+- 繰り返しのパターンがあれば指摘し、改善のヒントを提供
+- 前向きな変化があれば認めて励ます
+- 継続的なサポートの姿勢を示す
+- 個人の成長と幸福に焦点を当てる""",
+        "uses_profile": True
+    },
+    "title": {
+        "system": "あなたは日記のタイトルを作成する専門家です。",
+        "instructions": """ユーザーから送られる日記の内容から、適切なタイトルを生成してください。
+タイトルは：
+- 10-20文字程度
+- 日記の主要なテーマや感情を表現
+- 読みやすく親しみやすい表現
+- 日本語で自然な表現
+
+タイトルのみを返答してください。""",
+        "uses_profile": False
+    },
+    "digest": {
+        "system": "あなたは日記の振り返りを作成する専門家です。",
+        "instructions": """ユーザーから送られる、ある期間の日記の要約（または月ごとの振り返り）をもとに、その期間の振り返りを作成してください。
+主な出来事、気分の流れ、繰り返し現れるテーマや変化を、後で読み返して文脈として使えるように3-4文でまとめてください。
+振り返りの文のみを返答してください。""",
+        "uses_profile": False
+    }
+}
+
+
+def get_template(task: str) -> Dict[str, Any]:
+    """タスク名からテンプレートを取得"""
+    if task not in TEMPLATES:
+        raise ValueError(f"未知の分析タスクです: {task}")
+    return TEMPLATES[task]
+
+
+def render_messages(task: str, diary_content: str, context: str = "",
+                    profile_prefix: str = "") -> List[Dict[str, str]]:
+    """
+    タスクのChat Completionsメッセージを組み立てる
+
+    Args:
+        task: "emotion" / "summary" / "advice" / "title" / "digest"
+        diary_content: 日記の内容（digest では期間内の要約を並べたテキスト）
+        context: 過去の日記履歴からの文脈情報（毎回変わる内容なのでユーザーメッセージに入れる）
+        profile_prefix: ユーザープロフィール（変更が少ないのでシステムメッセージ末尾に入れる）
+
+    Returns:
+        メッセージのリスト
+    """
+    template = get_template(task)
+
+    # 固定部分（同じタスク・同じユーザーなら毎回同一の接頭辞になる）
+    system = f"{template['system']}\n\n{template['instructions']}"
+    if template["uses_profile"] and profile_prefix.strip():
+        system += f"\n\n{profile_prefix.strip()}"
+
+    # 変化する部分は最後に置く
+    if context.strip():
+        user = f"【ユーザーの履歴・傾向】\n{context.strip()}\n\n【今日の日記】\n{diary_content}"
+    else:
+        user = f"日記内容:\n{diary_content}"
+
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user}
+    ]
@@ -0,0 +1,46 @@
+"""
+レート制限機能
+OpenAI・Notion APIへの呼び出し頻度をトークンバケット方式で制御する
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    def __init__(self, rate_per_second: float, burst: int = 1):
+        """
+        レートリミッターを初期化
+
+        Args:
+            rate_per_second: 1秒あたりに許可する呼び出し回数
+            burst: 連続して許可する最大呼び出し回数
+
+        Raises:
+            ValueError: rate_per_second が正でない場合
+        """
+        if not rate_per_second > 0:
+            raise ValueError(f"1秒あたりの呼び出し回数は正の数で指定してください: {rate_per_second}")
+        self.rate_per_second = rate_per_second
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """呼び出し枠が空くまで待機してから1回分を消費する"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._last_refill
+                self._tokens = min(self.burst, self._tokens + elapsed * self.rate_per_second)
+                self._last_refill = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                wait_seconds = (1 - self._tokens) / self.rate_per_second
+
+            # ロックを解放した状態で待機（他スレッドをブロックしない）
+            time.sleep(wait_seconds)
@@ -0,0 +1,174 @@
+"""
+先行分析（入力中のタイトル・気分の事前生成）
+入力が落ち着いたタイミングでタイトル生成と感情分析をバックグラウンドで実行しておき、
+保存時の本文が同じ（または十分近い）場合は結果を再利用して保存時の待ち時間を減らす
+
+入力の予約・結果はセッション（Gradioのタブごと）に分けて持ち、
+あるセッションの入力や保存が他のセッションの先行分析を取り消さないようにする
+"""
+
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from difflib import SequenceMatcher
+from typing import Dict, Any, Optional
+
+
+class SpeculativeAnalyzer:
+    def __init__(self, ai_analyzer, debounce_seconds: float = 1.5, min_chars: int = 30,
+                 similarity_threshold: float = 0.95, max_entries: int = 4, max_sessions: int = 64):
+        """
+        先行分析を初期化
+
+        Args:
+            ai_analyzer: DiaryAIAnalyzerインスタンス
+            debounce_seconds: 最後の入力からこの秒数だけ変化がなければ分析を開始する
+            min_chars: これより短い入力では分析しない
+            similarity_threshold: 保存時の本文と先行分析時の本文がこの類似度以上なら結果を再利用する
+            max_entries: セッションごとに保持する先行分析結果の最大数
+            max_sessions: 保持するセッションの最大数（古いセッションから破棄する）
+        """
+        self.ai_analyzer = ai_analyzer
+        self.debounce_seconds = debounce_seconds
+        self.min_chars = min_chars
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.max_sessions = max_sessions
+        self.logger = logging.getLogger(__name__)
+
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="speculative")
+        self._lock = threading.Lock()
+        # セッション -> {"timer": 予約中のタイマー, "entries": 本文ハッシュ -> {"content": 本文, "future": Future}}
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.stats = {"scheduled": 0, "started": 0, "exact_hits": 0, "similar_hits": 0, "misses": 0}
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        """本文のハッシュ（前後の空白は無視）"""
+        return hashlib.sha256(content.strip().encode("utf-8")).hexdigest()
+
+    def _session(self, session: Optional[str]) -> Dict[str, Any]:
+        """セッションの予約・結果（なければ作成。ロック取得済みで呼ぶ）"""
+        session = session or ""
+        state = self._sessions.pop(session, None) or {"timer": None, "entries": OrderedDict()}
+        self._sessions[session] = state
+        while len(self._sessions) > self.max_sessions:
+            _, old = self._sessions.popitem(last=False)
+            if old["timer"] is not None:
+                old["timer"].cancel()
+            for entry in old["entries"].values():
+                entry["future"].cancel()
+        return state
+
+    def schedule(self, content: str, session: Optional[str] = None):
+        """
+        入力のたびに呼び出す。同じセッションの直前の予約を取り消し、入力が落ち着いたら分析を開始する
+
+        Args:
+            content: 入力中の日記の内容
+            session: セッションID（Gradioの session_hash など。省略時は共通のセッション）
+        """
+        content = (content or "").strip()
+        with self._lock:
+            state = self._session(session)
+            if state["timer"] is not None:
+                state["timer"].cancel()
+                state["timer"] = None
+
+            if len(content) < self.min_chars or self.content_hash(content) in state["entries"]:
+                return
+
+            self.stats["scheduled"] += 1
+            state["timer"] = threading.Timer(self.debounce_seconds, self._start, args=(content, session))
+            state["timer"].daemon = True
+            state["timer"].start()
+
+    def _start(self, content: str, session: Optional[str] = None):
+        """タイトル生成・感情分析をバックグラウンドで開始"""
+        key = self.content_hash(content)
+        with self._lock:
+            entries = self._session(session)["entries"]
+            if key in entries:
+                return
+
+            # 同じセッションのまだ始まっていない古い分析は取り消す（実行中のAPI呼び出しは結果だけ残す）
+            for old_key in list(entries):
+                if entries[old_key]["future"].cancel():
+                    del entries[old_key]
+
+            future = self._executor.submit(self._analyze, content)
+            entries[key] = {"content": content, "future": future}
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self.stats["started"] += 1
+
+    def _analyze(self, content: str) -> Dict[str, Any]:
+        """先行分析の本体"""
+        return {
+            "title": self.ai_analyzer.generate_title(content),
+            "emotions": self.ai_analyzer.analyze_emotion(content)
+        }
+
+    def take(self, content: str, timeout: Optional[float] = None,
+             session: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        保存時の本文に使える先行分析結果を取り出す
+
+        Args:
+            content: 保存する日記の内容
+            timeout: 同じ本文の分析が実行中の場合に待つ最大秒数（Noneなら完了まで待つ）
+            session: セッションID（schedule と同じもの）
+
+        Returns:
+            title と emotions を持つ辞書（使える結果がなければNone）
+        """
+        content = (content or "").strip()
+        key = self.content_hash(content)
+
+        with self._lock:
+            state = self._session(session)
+            if state["timer"] is not None:
+                state["timer"].cancel()
+                state["timer"] = None
+
+            entry = state["entries"].pop(key, None)
+            similar = None
+            if entry is None:
+                similar = self._find_similar(state["entries"], content)
+
+        if entry is not None:
+            # 同じ本文の分析が実行中なら、新しく呼び出すより完了を待つ方が速い
+            result = self._result(entry["future"], timeout)
+            outcome = "exact_hits" if result is not None else "misses"
+        elif similar is not None:
+            result, outcome = similar, "similar_hits"
+        else:
+            result, outcome = None, "misses"
+
+        with self._lock:
+            self.stats[outcome] += 1
+        return result
+
+    def _find_similar(self, entries: Dict[str, Dict[str, Any]], content: str) -> Optional[Dict[str, Any]]:
+        """セッションの完了済みの先行分析のうち、本文が十分に近いものの結果を返す（ロック取得済みで呼ぶ）"""
+        for key, entry in reversed(list(entries.items())):
+            future = entry["future"]
+            if not future.done() or future.cancelled() or future.exception() is not None:
+                continue
+
+            matcher = SequenceMatcher(None, entry["content"], content, autojunk=False)
+            # quick_ratio は ratio の上限なので、先に安い方で足切りする
+            if matcher.quick_ratio() >= self.similarity_threshold and matcher.ratio() >= self.similarity_threshold:
+                del entries[key]
+                return future.result()
+        return None
+
+    def _result(self, future: Future, timeout: Optional[float]) -> Optional[Dict[str, Any]]:
+        """Futureの結果を取り出す（取り消し・失敗・時間切れならNone）"""
+        try:
+            return future.result(timeout=timeout)
+        except Exception as e:
+            self.logger.info(f"先行分析の結果を使えませんでした: {e}")
+            return None
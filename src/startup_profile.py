@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+起動時間プロファイル
+`python -X importtime` でCLIの起動経路を計測し、ネットワーク系の重いライブラリ
+（openai, notion_client, httpx, gradio, pandas）が読み込まれていないことを確認する
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, Any, List, Tuple
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 起動時（メニュー表示・--help）に読み込まれてはいけないモジュール
+HEAVY_MODULES = ("openai", "notion_client", "httpx", "gradio", "pandas")
+
+# メニュー表示までと同じ処理（DiaryManagerの構築まで）をダミーの設定で実行
+MENU_SCENARIO = """
+import sys, tempfile
+sys.path.insert(0, {src!r})
+from diary_manager import DiaryManager
+DiaryManager("dummy", "dummy", "dummy", data_dir=tempfile.mkdtemp())
+"""
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """
+    -X importtime の出力を解析
+
+    Returns:
+        (モジュール名, 自身の時間µs, 累積時間µs) のリスト
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cumulative_us, name = parts
+        # 名前の先頭の空白はネストの深さを表すので残す
+        rows.append((name[1:], int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_scenario(label: str, args: List[str]) -> Dict[str, Any]:
+    """
+    1つの起動経路を子プロセスで実行して計測
+
+    Args:
+        label: 表示名
+        args: python に渡す引数（-X importtime は自動で付与）
+
+    Returns:
+        計測結果
+    """
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", *args],
+        cwd=SRC_DIR, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    rows = parse_importtime(completed.stderr)
+    # 最上位の（インデントなしの）インポートの累積時間の合計がインポート全体の時間
+    total_us = sum(cumulative for name, _, cumulative in rows if not name.startswith(" "))
+    top_level_names = {name.strip().split(".")[0] for name, _, _ in rows}
+
+    return {
+        "label": label,
+        "returncode": completed.returncode,
+        "wall_ms": wall_ms,
+        "import_ms": total_us / 1000,
+        "heavy_modules": sorted(m for m in HEAVY_MODULES if m in top_level_names),
+        "slowest": sorted(rows, key=lambda row: row[2], reverse=True)[:10]
+    }
+
+
+def main():
+    """起動経路ごとの計測結果を表示"""
+    parser = argparse.ArgumentParser(description="CLIの起動時間を -X importtime で計測します")
+    parser.add_argument("--budget-ms", type=float, default=500.0, help="メニュー表示までの許容時間（ミリ秒）")
+    parser.add_argument("--verbose", action="store_true", help="遅いインポート上位10件を表示")
+    args = parser.parse_args()
+
+    scenarios = [
+        profile_scenario("cli.py --help", ["cli.py", "--help"]),
+        profile_scenario("メニュー表示まで（DiaryManager構築）", ["-c", MENU_SCENARIO.format(src=SRC_DIR)])
+    ]
+
+    failed = False
+    print("⏱️  起動時間プロファイル")
+    print("=" * 50)
+    for result in scenarios:
+        ok = result["returncode"] == 0 and not result["heavy_modules"] and result["wall_ms"] <= args.budget_ms
+        failed = failed or not ok
+        print(f"{'✅' if ok else '❌'} {result['label']}")
+        print(f"   実行時間: {result['wall_ms']:.0f}ms / インポート: {result['import_ms']:.1f}ms")
+        if result["heavy_modules"]:
+            print(f"   ⚠️  重いライブラリを読み込んでいます: {', '.join(result['heavy_modules'])}")
+        if result["returncode"] != 0:
+            print(f"   ⚠️  終了コード: {result['returncode']}")
+        if args.verbose:
+            for name, self_us, cumulative_us in result["slowest"]:
+                print(f"   {cumulative_us / 1000:8.1f}ms  {name.strip()}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
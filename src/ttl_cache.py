@@ -0,0 +1,89 @@
+"""
+有効期限付きキャッシュ
+外部APIの応答を一定時間使い回し、書き込み時には明示的に破棄する
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    def __init__(self, ttl_seconds: float = 60.0, max_entries: int = 128):
+        """
+        キャッシュを初期化
+
+        Args:
+            ttl_seconds: 値を使い回す秒数
+            max_entries: 保持する最大件数（超えたら最も古く使われたものから捨てる）
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        # キー -> (有効期限, 値)
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        有効な値を取得
+
+        Returns:
+            キャッシュされた値（ない・期限切れならNone）
+        """
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return item[1]
+            if item is not None:
+                del self._entries[key]
+            self._misses += 1
+            return None
+
+    def set(self, key: Hashable, value: Any):
+        """値を保存"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        キャッシュにあれば返し、なければ loader() の結果を保存して返す
+
+        Args:
+            key: キャッシュのキー
+            loader: 値を取得する関数
+
+        Returns:
+            値
+        """
+        value = self.get(key)
+        if value is None:
+            value = loader()
+            self.set(key, value)
+        return value
+
+    def invalidate(self):
+        """すべての値を破棄（書き込みで内容が変わったとき）"""
+        with self._lock:
+            self._entries.clear()
+            self._invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """ヒット数・ミス数・ヒット率"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "invalidations": self._invalidations,
+                "entries": len(self._entries)
+            }
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+ワーカープロセスプール
+ジョブキュー（job_queue.py）から日記作成などのジョブを取り出し、別プロセスの DiaryManager で実行する。
+AI分析・Notion保存・履歴の書き込みをWebサーバーのプロセスから切り離し、ワーカー数に応じて同時に処理する
+
+単体でも起動でき、Webアプリとは別にワーカーを増やせる:
+    python src/worker_pool.py --workers 4
+
+ワーカーは実行中のジョブのハートビートを送り続け、プールは止まったワーカーのジョブを待機中に戻して
+ワーカーを起動し直す。ほかのプールのワーカーが実行中のジョブは、リースが切れるまで戻さない
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+sys.path.append(os.path.dirname(__file__))
+
+from job_queue import JobQueue, LEASE_SECONDS
+
+# 実行中のジョブのハートビート間隔（秒）。リースが切れる前に何度か送る
+HEARTBEAT_INTERVAL = LEASE_SECONDS / 4
+
+
+def run_job(diary_manager, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ジョブの種類に応じて DiaryManager の処理を実行
+
+    Args:
+        diary_manager: DiaryManagerインスタンス
+        job: キューから取り出したジョブ
+
+    Returns:
+        処理結果
+    """
+    if job["kind"] == "create_diary":
+        return diary_manager.create_diary_with_analysis(**job["payload"])
+    raise ValueError(f"未知のジョブです: {job['kind']}")
+
+
+def _send_heartbeats(queue: JobQueue, job_id: str, finished: threading.Event, interval: float):
+    """ジョブが終わるまで定期的にリースを延長"""
+    while not finished.wait(interval):
+        try:
+            queue.heartbeat(job_id)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"ハートビート送信エラー ({job_id}): {e}")
+
+
+def worker_main(name: str, data_dir: str, stop_event, poll_interval: float = 0.5):
+    """
+    ワーカープロセスの本体（停止の指示があるまでジョブを取り出して実行する）
+
+    Args:
+        name: ワーカー名
+        data_dir: データ保存ディレクトリ
+        stop_event: 停止の指示（multiprocessing.Event）
+        poll_interval: 待機中のジョブがないときに次に確認するまでの秒数
+    """
+    import config
+    from diary_manager import DiaryManager
+
+    logger = logging.getLogger(__name__)
+    diary_manager = DiaryManager.from_config(config, data_dir=data_dir)
+    queue = JobQueue(data_dir)
+    logger.info(f"{name} を起動しました")
+
+    while not stop_event.is_set():
+        try:
+            job = queue.claim(name)
+        except Exception as e:
+            logger.error(f"ジョブ取得エラー ({name}): {e}")
+            job = None
+        if job is None:
+            # stop_event.wait() で待つと、待機中に強制終了したワーカーがいるときに set() が戻らなくなる
+            time.sleep(poll_interval)
+            continue
+
+        finished = threading.Event()
+        heartbeat = threading.Thread(
+            target=_send_heartbeats, args=(queue, job["id"], finished, HEARTBEAT_INTERVAL), daemon=True
+        )
+        heartbeat.start()
+        try:
+            result = run_job(diary_manager, job)
+            # DiaryManager は失敗を例外ではなく status="error" の結果で返す
+            if result.get("status") == "error":
+                queue.fail(job["id"], result.get("message") or "日記の作成に失敗しました")
+            else:
+                queue.complete(job["id"], result)
+        except Exception as e:
+            logger.error(f"ジョブ実行エラー ({name}, {job['id']}): {e}")
+            queue.fail(job["id"], str(e))
+        finally:
+            finished.set()
+
+
+class WorkerPool:
+    def __init__(self, workers: int = 2, data_dir: str = "data", poll_interval: float = 0.5,
+                 monitor_interval: float = 5.0):
+        """
+        ワーカープロセスプールを初期化
+
+        Args:
+            workers: ワーカープロセス数
+            data_dir: データ保存ディレクトリ
+            poll_interval: 待機中のジョブがないときに次に確認するまでの秒数
+            monitor_interval: ワーカーの停止とリース切れを確認する間隔（秒）
+        """
+        self.workers = max(1, workers)
+        self.data_dir = data_dir
+        self.poll_interval = poll_interval
+        self.monitor_interval = monitor_interval
+        self.logger = logging.getLogger(__name__)
+
+        # Webサーバーのスレッドを引き継がないよう、forkではなく新しいインタープリタで起動する
+        self._context = multiprocessing.get_context("spawn")
+        self._stop_event = None
+        self._processes: List[multiprocessing.Process] = []
+        self._monitor_stop = threading.Event()
+        self._monitor: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.respawned = 0
+
+    def _spawn(self, index: int) -> multiprocessing.Process:
+        """index 番目のワーカープロセスを起動"""
+        process = self._context.Process(
+            target=worker_main,
+            args=(f"worker-{index + 1}", self.data_dir, self._stop_event, self.poll_interval),
+            name=f"diary-worker-{index + 1}",
+            daemon=True
+        )
+        process.start()
+        return process
+
+    def _requeue_expired(self):
+        """リースが切れたジョブ（どのプールのワーカーかを問わず止まったもの）を待機中に戻す"""
+        requeued = JobQueue(self.data_dir).requeue_running(LEASE_SECONDS)
+        if requeued:
+            # 日記作成は段階ごとにチェックポイントがあるので、やり直しても完了済みの段階は繰り返さない
+            self.logger.info(f"リースが切れたジョブを再実行します: {requeued}件")
+
+    def start(self):
+        """ワーカープロセスを起動し、停止したワーカーを起動し直す監視スレッドを開始"""
+        # 動いているワーカー（別に起動したプールなど）のジョブはハートビートで延長されるので戻さない
+        self._requeue_expired()
+
+        self._stop_event = self._context.Event()
+        self._monitor_stop.clear()
+        with self._lock:
+            self._processes = [self._spawn(index) for index in range(self.workers)]
+        self._monitor = threading.Thread(target=self._monitor_workers, name="worker-pool-monitor", daemon=True)
+        self._monitor.start()
+
+    def _monitor_workers(self):
+        """停止するまで定期的にワーカーの生存とリース切れを確認"""
+        while not self._monitor_stop.wait(self.monitor_interval):
+            try:
+                self.check_workers()
+            except Exception as e:
+                self.logger.error(f"ワーカー監視エラー: {e}")
+
+    def check_workers(self) -> int:
+        """
+        停止したワーカーのジョブを待機中に戻してワーカーを起動し直す
+
+        Returns:
+            起動し直したワーカー数
+        """
+        queue = JobQueue(self.data_dir)
+        restarted = 0
+        with self._lock:
+            if self._stop_event is None or self._stop_event.is_set():
+                return 0
+            for index, process in enumerate(self._processes):
+                if process.is_alive():
+                    continue
+                requeued = queue.requeue_running(pid=process.pid)
+                self.logger.warning(
+                    f"{process.name} が停止しました（終了コード: {process.exitcode}）。"
+                    f"起動し直します（再実行するジョブ: {requeued}件）"
+                )
+                self._processes[index] = self._spawn(index)
+                restarted += 1
+        self.respawned += restarted
+        self._requeue_expired()
+        return restarted
+
+    def stop(self, timeout: float = 10.0):
+        """
+        ワーカープロセスを停止（実行中のジョブの完了を timeout 秒まで待つ）
+
+        Args:
+            timeout: 待つ最大秒数
+        """
+        self._monitor_stop.set()
+        with self._lock:
+            if self._stop_event is not None:
+                self._stop_event.set()
+        if self._monitor is not None:
+            self._monitor.join()
+            self._monitor = None
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+    def alive_count(self) -> int:
+        """動いているワーカープロセス数"""
+        return sum(1 for process in self._processes if process.is_alive())
+
+
+def main():
+    """ワーカープロセスを起動して、Ctrl+Cで停止するまで待つ"""
+    parser = argparse.ArgumentParser(description="日記作成ジョブを処理するワーカープロセスを起動します")
+    parser.add_argument("--workers", type=int, default=2, help="ワーカープロセス数（デフォルト: 2）")
+    parser.add_argument("--data-dir", default="data", help="データ保存ディレクトリ（デフォルト: data）")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    pool = WorkerPool(args.workers, args.data_dir)
+    pool.start()
+    print(f"👷 ワーカーを{pool.workers}個起動しました（Ctrl+Cで停止）")
+    try:
+        # 停止したワーカーは監視スレッドが起動し直す
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
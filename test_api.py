@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+JSON API テストスクリプト
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from starlette.requests import Request
+
+from api import _matches, json_response
+
+def make_request(method="GET", if_none_match=None):
+    """ヘッダーだけを持つリクエストを作成"""
+    headers = [(b"if-none-match", if_none_match.encode("utf-8"))] if if_none_match else []
+    return Request({"type": "http", "method": method, "path": "/v1/diaries", "headers": headers})
+
+def test_api():
+    """ETag の比較と 304 応答をテスト"""
+    print("🌐 JSON API テスト開始...")
+
+    etag = 'W/"abc"'
+
+    print("🏷️ If-None-Match の比較テスト...")
+    assert not _matches(make_request(), etag), "ヘッダーがなければ一致しない"
+    assert _matches(make_request(if_none_match='W/"abc"'), etag)
+    assert _matches(make_request(if_none_match='"abc"'), etag), "弱い比較なので W/ の有無は無視する"
+    assert _matches(make_request(if_none_match='"xyz", W/"abc"'), etag), "複数の ETag のどれかと一致すればよい"
+    assert _matches(make_request(if_none_match="*"), etag)
+    assert not _matches(make_request(if_none_match='W/"xyz"'), etag)
+
+    print("📄 GET に ETag を付けるかテスト...")
+    data = {"status": "success", "title": "今日の日記"}
+    response = json_response(make_request(), data)
+    assert response.status_code == 200
+    assert json.loads(response.body) == data
+    body_etag = response.headers["etag"]
+    assert body_etag.startswith('W/"') and response.headers["cache-control"] == "no-cache"
+    assert json_response(make_request(), data).headers["etag"] == body_etag, "同じ本文なら同じ ETag"
+    assert json_response(make_request(), dict(data, title="別の日記")).headers["etag"] != body_etag
+
+    print("♻️ ETag が一致すれば 304 を返すかテスト...")
+    not_modified = json_response(make_request(if_none_match=body_etag), data)
+    assert not_modified.status_code == 304 and not_modified.body == b""
+    assert not_modified.headers["etag"] == body_etag
+    assert json_response(make_request(if_none_match=etag), data, etag=etag).status_code == 304, "指定した ETag で比較する"
+    assert json_response(make_request(if_none_match=body_etag), dict(data, title="別の日記")).status_code == 200
+
+    print("✍️ GET 以外と失敗した応答には ETag を付けないかテスト...")
+    created = json_response(make_request("POST", if_none_match="*"), data, status_code=201,
+                            headers={"Location": "/v1/jobs/1"})
+    assert created.status_code == 201 and "etag" not in created.headers
+    assert created.headers["location"] == "/v1/jobs/1"
+    failed = json_response(make_request(if_none_match="*"), {"status": "error"}, status_code=500)
+    assert failed.status_code == 500 and "etag" not in failed.headers
+
+    print("🎉 JSON API テスト完了!")
+
+if __name__ == "__main__":
+    test_api()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Notion非同期クライアントテストスクリプト
+"""
+
+import sys
+import os
+import asyncio
+import random
+import tempfile
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from async_notion_client import AsyncNotionDiaryClient
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+class FakeNotionError(Exception):
+    """ステータスコード付きのNotion APIエラーの代わり"""
+
+    def __init__(self, status, code=""):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.code = code
+
+class FakeAsyncNotion:
+    """databases.query と blocks.children.list だけを持つ AsyncClient の代わり"""
+
+    def __init__(self, page_count=0, fail_status=None):
+        self.pages = [{"id": f"page-{i}", "created_time": f"2024-04-{i + 1:02d}",
+                       "properties": {"タイトル": {"title": [{"text": {"content": f"日記{i}"}}]}}}
+                      for i in range(page_count)]
+        self.fail_status = fail_status
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self.databases = self
+        self.blocks = self
+        self.children = self
+
+    async def query(self, **kwargs):
+        return {"results": self.pages[:kwargs["page_size"]]}
+
+    async def list(self, block_id, page_size, start_cursor=None):
+        self.calls += 1
+        if self.fail_status:
+            raise FakeNotionError(self.fail_status)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            # 後のページほど早く返ることがあっても結果の順序は変わらないことを確かめる
+            await asyncio.sleep(random.uniform(0.001, 0.02))
+        finally:
+            self.active -= 1
+        paragraph = {"type": "paragraph", "paragraph": {"rich_text": [{"plain_text": f"{block_id}の本文"}]}}
+        summary = {"type": "callout", "callout": {"rich_text": [{"plain_text": f"📊 要約: {block_id}の要約"}]}}
+        if start_cursor is None:
+            return {"results": [paragraph], "has_more": True, "next_cursor": "next"}
+        return {"results": [{"type": "divider", "divider": {}}, summary], "has_more": False}
+
+def test_hydrate_pages():
+    """並行取得の順序と同時実行数の上限をテスト"""
+    print("📚 並行取得テスト開始...")
+
+    client = AsyncNotionDiaryClient("notion-key", "database-id", max_concurrency=3)
+    fake = FakeAsyncNotion(page_count=12)
+    client.client = fake
+    diaries = asyncio.run(client.get_full_diaries(limit=12))
+
+    print(f"取得したページ: {[diary['id'] for diary in diaries]} / 最大同時実行数: {fake.max_active}")
+    assert [diary["id"] for diary in diaries] == [page["id"] for page in fake.pages], "一覧と同じ順"
+    assert diaries[3]["title"] == "日記3" and diaries[3]["content"] == "page-3の本文"
+    assert diaries[3]["ai_analysis"] == {"summary": "page-3の要約"}, "2ページ目のブロックも読む"
+    assert fake.max_active <= 3, "セマフォの上限を超えない"
+    assert fake.max_active == 3, "上限までは並行して取得する"
+    assert fake.calls == 24
+
+    print("🎉 並行取得テスト完了!")
+
+def test_circuit_breaker():
+    """障害をサーキットブレーカーに記録し、開いたら呼び出さないかテスト"""
+    print("🔌 サーキットブレーカーテスト開始...")
+
+    breaker = CircuitBreaker("Notion", failure_threshold=3, cooldown_seconds=60)
+    client = AsyncNotionDiaryClient("notion-key", "database-id", max_concurrency=1, circuit_breaker=breaker)
+    fake = FakeAsyncNotion(page_count=8, fail_status=503)
+    client.client = fake
+    diaries = asyncio.run(client.hydrate_pages(fake.pages))
+
+    print(f"呼び出し回数: {fake.calls} / ブレーカー: {breaker.get_stats()}")
+    assert [diary["id"] for diary in diaries] == [page["id"] for page in fake.pages]
+    assert all(diary.get("error") for diary in diaries)
+    assert breaker.state == "open" and fake.calls == 3, "開いた後は呼び出さない"
+    try:
+        asyncio.run(client.get_diary_entries())
+        assert False, "ブレーカーが開いていれば CircuitOpenError"
+    except CircuitOpenError:
+        pass
+
+    print("⏸️ 障害ではない失敗は数えないかテスト...")
+    breaker = CircuitBreaker("Notion", failure_threshold=1)
+    client = AsyncNotionDiaryClient("notion-key", "database-id", circuit_breaker=breaker)
+    client.client = FakeAsyncNotion(page_count=2, fail_status=404)
+    asyncio.run(client.hydrate_pages(client.client.pages))
+    assert breaker.state == "closed"
+
+    print("🎉 サーキットブレーカーテスト完了!")
+
+def test_diary_manager_reuses_client():
+    """DiaryManager が非同期クライアントとイベントループを使い回し、ブレーカーを共有するかテスト"""
+    print("♻️ クライアント再利用テスト開始...")
+    from diary_manager import DiaryManager
+
+    diary_manager = DiaryManager("notion-key", "database-id", "openai-key", data_dir=tempfile.mkdtemp())
+    client, loop = diary_manager._get_async_notion()
+    client.client = FakeAsyncNotion(page_count=2)
+
+    for _ in range(2):
+        result = diary_manager.get_full_diaries(limit=2)
+        assert result["status"] == "success" and len(result["diaries"]) == 2
+    assert diary_manager._get_async_notion() == (client, loop)
+    assert client.circuit_breaker is diary_manager.notion_client.circuit_breaker
+
+    print("🎉 クライアント再利用テスト完了!")
+
+if __name__ == "__main__":
+    test_hydrate_pages()
+    test_circuit_breaker()
+    test_diary_manager_reuses_client()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+サーキットブレーカーテストスクリプト
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+def test_circuit_breaker():
+    """閉 → 開 → 半開 → 閉 の状態遷移と、障害と無関係な失敗の扱いをテスト"""
+    print("🔌 サーキットブレーカーテスト開始...")
+
+    recovered = []
+    breaker = CircuitBreaker("テスト", failure_threshold=2, cooldown_seconds=0.2)
+    breaker.on_close(lambda: recovered.append(True))
+
+    print("🟢 閾値未満の失敗では閉じたままかテスト...")
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.is_available()
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.get_stats()["consecutive_failures"] == 0
+    assert recovered == [], "閉じたままの成功では復旧時処理を呼ばない"
+
+    print("🔴 連続失敗で開き、すぐ失敗させるかテスト...")
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.is_available()
+    try:
+        breaker.before_call()
+        assert False, "開いている間は CircuitOpenError になるはず"
+    except CircuitOpenError:
+        pass
+    stats = breaker.get_stats()
+    assert stats["opened"] == 1 and stats["rejected"] == 1
+
+    print("🟡 待機時間後は1回だけ試すかテスト...")
+    time.sleep(0.25)
+    assert breaker.state == HALF_OPEN and breaker.is_available()
+    breaker.before_call()
+    try:
+        breaker.before_call()
+        assert False, "試しの呼び出し中の2回目は CircuitOpenError になるはず"
+    except CircuitOpenError:
+        pass
+
+    print("↩️ 障害と無関係な失敗では開いた状態に戻り、すぐ試し直せるかテスト...")
+    breaker.record_release()
+    assert breaker.state == HALF_OPEN, "待機時間なしで次の試しができる"
+    assert breaker.get_stats()["opened"] == 1, "開いた回数には数えない"
+
+    print("🔴 試しの呼び出しの失敗で再び開くかテスト...")
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.get_stats()["opened"] == 2
+
+    print("🟢 試しの呼び出しの成功で閉じ、復旧時処理を呼ぶかテスト...")
+    time.sleep(0.25)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert recovered == [True]
+
+    print("↩️ 閉じている間の record_release は何もしないかテスト...")
+    breaker.record_release()
+    assert breaker.state == CLOSED
+
+    print("🎉 サーキットブレーカーテスト完了!")
+
+if __name__ == "__main__":
+    test_circuit_breaker()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+一括インポートテストスクリプト
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+from types import SimpleNamespace
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from diary_history import DiaryHistory
+from diary_importer import DiaryImporter
+
+class StubDiaryManager:
+    """AI分析・Notion保存の代わりに呼び出しを記録し、指定した日記を1回だけ失敗させる"""
+
+    def __init__(self, data_dir, fail_once=()):
+        self.history = DiaryHistory(data_dir)
+        self.ai_analyzer = SimpleNamespace(rate_limiter=None)
+        self.notion_client = SimpleNamespace(rate_limiter=None)
+        self.fail_once = set(fail_once)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def create_diary_with_analysis(self, content, title=None, date=None, save_history=True,
+                                   idempotency_key=None, deadline_seconds=None):
+        with self._lock:
+            self.calls.append(content)
+            if content in self.fail_once:
+                self.fail_once.discard(content)
+                return {"status": "error", "message": "Notionに接続できません"}
+        return {
+            "status": "success", "generated_title": title or content[:5],
+            "ai_analysis": {"summary": content}, "idempotency_key": idempotency_key,
+            "diary_entry": {"id": f"page-{idempotency_key[:8]}", "url": ""}
+        }
+
+def test_diary_importer():
+    """チェックポイントによる中断後の再開をテスト"""
+    print("📥 一括インポートテスト開始...")
+
+    data_dir = tempfile.mkdtemp()
+    source = os.path.join(data_dir, "diaries.jsonl")
+    with open(source, 'w', encoding='utf-8') as f:
+        for day in range(1, 6):
+            f.write(json.dumps({"content": f"{day}日目の日記", "date": f"2024-04-0{day}"}, ensure_ascii=False) + "\n")
+        f.write("{壊れた行\n")
+
+    print("⚠️ 失敗した日記を記録して続けるかテスト...")
+    manager = StubDiaryManager(data_dir, fail_once={"3日目の日記"})
+    importer = DiaryImporter(manager, max_workers=2, batch_size=2, notion_rate_per_second=100)
+    stats = importer.run(source)
+    print(f"1回目: {stats}")
+    assert stats == {"imported": 4, "skipped": 0, "failed": 1}
+    assert manager.ai_analyzer.rate_limiter is not None and manager.notion_client.rate_limiter is not None
+    with open(importer.checkpoint_file, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    assert len(checkpoint["completed"]) == 4 and len(checkpoint["failed"]) == 1
+    assert sorted(e["created_at"][:10] for e in manager.history.get_all_entries()) == \
+        ["2024-04-01", "2024-04-02", "2024-04-04", "2024-04-05"]
+
+    print("🔁 再実行では失敗した日記だけを処理するかテスト...")
+    manager.calls.clear()
+    stats = DiaryImporter(manager, max_workers=2, batch_size=2).run(source)
+    print(f"2回目: {stats}")
+    assert stats == {"imported": 1, "skipped": 4, "failed": 0}
+    assert manager.calls == ["3日目の日記"]
+    assert len(manager.history.get_all_entries()) == 5
+    with open(importer.checkpoint_file, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    assert len(checkpoint["completed"]) == 5 and checkpoint["failed"] == {}
+
+    print("🎉 一括インポートテスト完了!")
+
+if __name__ == "__main__":
+    test_diary_importer()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+日記作成パイプラインテストスクリプト
+"""
+
+import sys
+import os
+import time
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from diary_manager import DiaryManager
+from notion_diary_client import NotionWriteError
+
+CONTENT = "今日は久しぶりに友達と会って、駅前の新しいカフェでゆっくり話した。楽しい一日だった。"
+
+class Calls:
+    """AI分析・Notionの代わりの関数の呼び出し回数"""
+
+    def __init__(self):
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def add(self, name):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def get(self, name):
+        return self.counts.get(name, 0)
+
+def make_diary_manager(calls, delay=0.0):
+    """OpenAI・Notionを呼ばず、呼び出し回数を記録する DiaryManager を作成"""
+    diary_manager = DiaryManager("notion-key", "database-id", "openai-key", data_dir=tempfile.mkdtemp())
+    analyzer = diary_manager.ai_analyzer
+    notion = diary_manager.notion_client
+
+    def generate_title(content, deadline=None):
+        calls.add("title")
+        time.sleep(delay)
+        return "友達とカフェ"
+
+    def analyze_emotion(content, strict=False, deadline=None):
+        calls.add("emotions")
+        return {"overall_mood": "positive", "emotions": ["喜び"]}
+
+    def generate_summary(content, strict=False, deadline=None):
+        calls.add("summary")
+        return "友達とカフェで話した"
+
+    def generate_advice(content, context, profile_prefix="", strict=False, deadline=None):
+        calls.add("advice")
+        return "また会う約束をしましょう"
+
+    def create_diary_entry(title, content, date=None, ai_analysis=None, deadline=None, idempotency_key=None):
+        calls.add("create_page")
+        return {"id": f"page-{calls.get('create_page')}", "url": "https://notion.so/page"}
+
+    analyzer.generate_title = generate_title
+    analyzer.analyze_emotion = analyze_emotion
+    analyzer.generate_summary = generate_summary
+    analyzer.generate_advice = generate_advice
+    notion.create_diary_entry = create_diary_entry
+    notion.find_page_by_idempotency_key = lambda keys: None
+    # 裏で実行する振り返り生成・やり直しはこのテストでは使わない
+    diary_manager._schedule_digest_refresh = lambda: None
+    diary_manager._schedule_backfill = lambda: None
+    return diary_manager
+
+def test_idempotency():
+    """同じ冪等キーの同時作成と、作成済みのキーでの再送をテスト"""
+    print("🔑 冪等キーテスト開始...")
+
+    calls = Calls()
+    diary_manager = make_diary_manager(calls, delay=0.3)
+
+    print("👯 同じ内容を同時に送っても1回だけ作成するかテスト...")
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = list(executor.map(lambda _: diary_manager.create_diary_with_analysis(CONTENT), range(2)))
+    assert all(result["status"] == "success" for result in results)
+    assert calls.get("title") == 1 and calls.get("create_page") == 1
+    assert [bool(result.get("deduplicated")) for result in results].count(True) == 1
+    assert results[0]["diary_entry"]["id"] == results[1]["diary_entry"]["id"]
+    assert len(diary_manager.history.get_all_entries()) == 1
+
+    print("📦 作成済みのキーでは保存済みの結果を返すかテスト...")
+    stored = diary_manager.create_diary_with_analysis(CONTENT)
+    assert stored["deduplicated"] and stored["diary_entry"]["id"] == "page-1"
+    assert stored["ai_analysis"]["summary"] == "友達とカフェで話した"
+
+    print("⏰ 時間帯の境目をまたいだ再送も同じ日記として扱うかテスト...")
+    later = datetime.now() + timedelta(minutes=diary_manager.idempotency_window_minutes)
+    keys = diary_manager.make_idempotency_keys(CONTENT, later)
+    assert keys[1] == stored["idempotency_key"] and keys[0] != stored["idempotency_key"]
+    resent = diary_manager.create_diary_with_analysis(CONTENT, idempotency_keys=keys)
+    assert resent["deduplicated"] and resent["diary_entry"]["id"] == "page-1"
+    assert calls.get("title") == 1 and calls.get("create_page") == 1
+    assert len(diary_manager.history.get_all_entries()) == 1
+
+    print("🎉 冪等キーテスト完了!")
+
+def test_resume_after_notion_failure():
+    """Notionへの保存で失敗した日記作成を、同じ冪等キーで続きから再開するかテスト"""
+    print("🔁 チェックポイントからの再開テスト開始...")
+
+    calls = Calls()
+    diary_manager = make_diary_manager(calls)
+    notion = diary_manager.notion_client
+    pages = {}
+
+    def create_diary_entry(title, content, date=None, ai_analysis=None, deadline=None, idempotency_key=None):
+        calls.add("create_page")
+        page = {"id": f"page-{calls.get('create_page')}", "url": "https://notion.so/page"}
+        pages[idempotency_key] = page
+        if calls.get("create_page") == 1:
+            # ページはできたが、2回目のリクエスト（本文の続き）で失敗した
+            raise NotionWriteError("本文の書き込みに失敗しました", page_id=page["id"], page_url=page["url"],
+                                   batches_done=1)
+        if calls.get("create_page") == 2:
+            # ページはできたが、応答を受け取れなかった
+            raise NotionWriteError("応答の読み取りに失敗しました")
+        return page
+
+    def resume_diary_entry(page_id, content, ai_analysis, batches_done, url=""):
+        calls.add("resume_page")
+        return {"id": page_id, "url": url}
+
+    notion.create_diary_entry = create_diary_entry
+    notion.resume_diary_entry = resume_diary_entry
+    notion.find_page_by_idempotency_key = lambda keys: next((pages[key] for key in keys if key in pages), None)
+
+    print("📄 ページの途中で失敗した場合は続きを書き込むかテスト...")
+    failed = diary_manager.create_diary_with_analysis(CONTENT, idempotency_key="key-1")
+    assert failed["status"] == "error"
+    assert diary_manager.checkpoints.load("key-1") is not None, "失敗した段階の記録が残る"
+    assert diary_manager.history.get_all_entries() == []
+    analyzed = {name: calls.get(name) for name in ("title", "emotions", "summary", "advice")}
+    assert analyzed == {"title": 1, "emotions": 1, "summary": 1, "advice": 1}
+
+    resumed = diary_manager.create_diary_with_analysis(CONTENT, idempotency_key="key-1")
+    print(f"再実行の結果: {resumed['status']} / 呼び出し回数: {calls.counts}")
+    assert resumed["status"] == "success" and resumed["diary_entry"]["id"] == "page-1"
+    assert {name: calls.get(name) for name in analyzed} == analyzed, "タイトル・分析をやり直さない"
+    assert calls.get("create_page") == 1 and calls.get("resume_page") == 1, "ページを作り直さない"
+    assert diary_manager.checkpoints.load("key-1") is None
+    assert [entry["notion_page"]["id"] for entry in diary_manager.history.get_all_entries()] == ["page-1"]
+
+    print("📨 応答を受け取れなかった場合は作成済みのページを使うかテスト...")
+    other = "別の日の日記。雨だったので家で本を読んだ。"
+    assert diary_manager.create_diary_with_analysis(other, idempotency_key="key-2")["status"] == "error"
+    resumed = diary_manager.create_diary_with_analysis(other, idempotency_key="key-2")
+    assert resumed["status"] == "success" and resumed["diary_entry"]["id"] == "page-2"
+    assert calls.get("create_page") == 2, "同じ日記のページを2回作らない"
+    assert calls.get("title") == 2 and calls.get("advice") == 2
+
+    print("🎉 チェックポイントからの再開テスト完了!")
+
+if __name__ == "__main__":
+    test_idempotency()
+    test_resume_after_notion_failure()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+週・月の振り返りテストスクリプト
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from diary_history import DiaryHistory
+
+def make_entry(created_at, title, summary="要約"):
+    """日時を指定したエントリ"""
+    return {"title": title, "content": f"{title}の日記", "created_at": created_at,
+            "ai_analysis": {"emotions": {"overall_mood": "neutral"}, "summary": summary}}
+
+def test_digest_bookkeeping():
+    """作り直しが必要な期間の記録と、生成後の解除をテスト"""
+    print("🗓️ 振り返りの記録テスト開始...")
+
+    history = DiaryHistory(tempfile.mkdtemp())
+    history.add_diary_entries([
+        make_entry("2024-04-02T10:00:00", "火曜日"),
+        make_entry("2024-04-03T10:00:00", "水曜日"),
+        make_entry("2024-05-10T21:00:00", "金曜日")
+    ])
+
+    print("📌 追加したエントリの週・月を記録するかテスト...")
+    periods = history.get_stale_digest_periods()
+    print(f"作り直しが必要な期間: {[p['key'] for p in periods]}")
+    assert [p["key"] for p in periods] == ["2024-05", "2024-W19", "2024-04", "2024-W14"], "新しい期間から"
+    assert all(p["mark"] >= 1 for p in periods)
+    april = periods[2]
+    assert (april["start"], april["end"]) == ("2024-04-01", "2024-04-30")
+    source = history.get_digest_source(april)
+    assert source["entry_count"] == 2 and "「火曜日」: 要約" in source["text"]
+
+    print("⏳ 今週・今月の分は対象にしないかテスト...")
+    history.add_diary_entry("今日", "今日の日記", {"summary": "今日の要約"})
+    assert [p["key"] for p in history.get_stale_digest_periods()] == ["2024-05", "2024-W19", "2024-04", "2024-W14"]
+    assert history.get_stale_digest_periods(now=datetime(2099, 1, 1))[0]["key"] == datetime.now().strftime("%Y-%m")
+
+    print("✍️ 生成中に追加されたエントリがあれば記録を残すかテスト...")
+    history.add_diary_entries([make_entry("2024-04-20T10:00:00", "土曜日")])
+    history.save_digest("month", "2024-04", "4月の振り返り", entry_count=2, mark=april["mark"])
+    remaining = {p["key"]: p["mark"] for p in history.get_stale_digest_periods()}
+    assert remaining["2024-04"] == april["mark"] + 1, "古いデータで作った振り返りは作り直しが必要なまま"
+    history.save_digest("month", "2024-04", "4月の振り返り", entry_count=3, mark=remaining["2024-04"])
+    assert "2024-04" not in {p["key"] for p in history.get_stale_digest_periods()}
+
+    print("🔄 要約の更新で作り直しが必要になるかテスト...")
+    for period in history.get_stale_digest_periods():
+        history.save_digest(period["level"], period["key"], "振り返り", mark=period["mark"])
+    assert history.get_stale_digest_periods() == []
+    may_entry = [e for e in history.get_all_entries() if e["title"] == "金曜日"][0]
+    history.update_entry(may_entry["id"], ai_analysis={"summary": "新しい要約"})
+    assert [p["key"] for p in history.get_stale_digest_periods()] == ["2024-05", "2024-W19"]
+
+    print("🆕 振り返りのファイルがなければすべての期間を記録するかテスト...")
+    os.remove(history.digest_file)
+    keys = [p["key"] for p in DiaryHistory(history.data_dir).get_stale_digest_periods()]
+    assert keys == ["2024-05", "2024-W19", "2024-04", "2024-W16", "2024-W14"]
+
+    print("🎉 振り返りの記録テスト完了!")
+
+def test_refresh_digests():
+    """生成の上限と、1期間の失敗で残りを止めないことをテスト"""
+    print("🗓️ 振り返りの生成テスト開始...")
+    from diary_manager import DiaryManager
+
+    diary_manager = DiaryManager("notion-key", "database-id", "openai-key", data_dir=tempfile.mkdtemp())
+    diary_manager.history.add_diary_entries([
+        make_entry("2024-04-02T10:00:00", "火曜日"),
+        make_entry("2024-05-10T21:00:00", "金曜日")
+    ])
+
+    def generate_digest(text):
+        if "2024-05-06" in text:
+            raise RuntimeError("生成に失敗しました")
+        return f"{text.splitlines()[0]}の振り返り"
+    diary_manager.ai_analyzer.generate_digest = generate_digest
+
+    print("✂️ 上限までの新しい期間だけを生成するかテスト...")
+    result = diary_manager.refresh_digests(max_periods=2)
+    print(f"結果: {result}")
+    assert result["refreshed"] == 1 and result["failed"] == 1 and result["remaining"] == 3
+    assert [p["key"] for p in diary_manager.history.get_stale_digest_periods()] == ["2024-W19", "2024-04", "2024-W14"]
+
+    print("➡️ 失敗した期間を残して続きを生成するかテスト...")
+    result = diary_manager.refresh_digests()
+    assert result["refreshed"] == 2 and result["failed"] == 1 and result["remaining"] == 1
+    assert [p["key"] for p in diary_manager.history.get_stale_digest_periods()] == ["2024-W19"]
+
+    print("🎉 振り返りの生成テスト完了!")
+
+if __name__ == "__main__":
+    test_digest_bookkeeping()
+    test_refresh_digests()
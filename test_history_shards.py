@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+月別履歴ファイルテストスクリプト
+"""
+
+import sys
+import os
+import json
+import tempfile
+import multiprocessing
+from datetime import datetime
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from diary_history import DiaryHistory
+
+def count_entries(data_dir):
+    """別プロセスで履歴を開いてエントリ数を返す"""
+    return len(DiaryHistory(data_dir).get_all_entries())
+
+def test_history_shards():
+    """旧形式からの移行と月別ファイルへの保存をテスト"""
+    print("🗂️  月別履歴ファイルテスト開始...")
+
+    data_dir = tempfile.mkdtemp()
+    legacy = {
+        "diaries": [
+            {"id": 1, "title": "春の散歩", "content": "桜を見に行った。", "created_at": "2024-04-02T10:00:00",
+             "ai_analysis": {"emotions": {"overall_mood": "positive"}, "summary": "花見"}, "word_count": 8},
+            {"id": 2, "title": "雨の日", "content": "一日中家にいた。", "created_at": "2024-05-10T21:00:00",
+             "ai_analysis": {"emotions": {"overall_mood": "neutral"}, "summary": "在宅"}, "word_count": 8}
+        ],
+        "user_profile": {"total_entries": 2, "name": "テストユーザー"}
+    }
+    with open(os.path.join(data_dir, "diary_history.json"), 'w', encoding='utf-8') as f:
+        json.dump(legacy, f, ensure_ascii=False)
+
+    print("📦 旧形式からの移行テスト...")
+    history = DiaryHistory(data_dir)
+    files = sorted(os.listdir(history.history_dir))
+    print(f"作成されたファイル: {files}")
+    assert files == ["2024-04.json", "2024-05.json", "daily_rollup.json", "manifest.json"]
+    assert history.get_all_entries() == legacy["diaries"]
+    assert history.get_user_profile()["name"] == "テストユーザー"
+
+    print("📝 追加は今月のファイルのみ書き換えるかテスト...")
+    old_shard_mtime = os.path.getmtime(os.path.join(history.history_dir, "2024-04.json"))
+    history.add_diary_entry("今日", "今日も元気に過ごした。", {"emotions": {"overall_mood": "positive"}})
+    assert os.path.getmtime(os.path.join(history.history_dir, "2024-04.json")) == old_shard_mtime
+
+    recent = history.get_recent_entries(7)
+    print(f"最近の日記: {[entry['title'] for entry in recent]}")
+    assert [entry["id"] for entry in recent] == [3]
+    assert history.get_user_profile()["total_entries"] == 3
+
+    print("📊 日別集計テスト...")
+    daily = history.get_daily_rollup(days=None)
+    print(f"日別集計: {[(day['date'], day['count'], day['moods']) for day in daily]}")
+    assert [day["count"] for day in daily] == [1, 1, 1]
+    assert daily[-1] == {"date": "2024-04-02", "count": 1, "moods": {"positive": 1}, "chars": 8, "titles": ["春の散歩"]}
+    assert len(history.get_daily_rollup(7)) == 1
+    rebuilt_days = history.rebuild_daily_rollup()
+    assert rebuilt_days == 3 and history.get_daily_rollup(days=None) == daily
+
+    print("😊 気分傾向は日別集計から求めるかテスト...")
+    with open(history.manifest_file, 'r', encoding='utf-8') as f:
+        assert "mood_history" not in json.load(f)["user_profile"], "マニフェストはエントリ数に比例して大きくならない"
+    trend = history.get_user_profile()["recent_mood_trend"]
+    assert trend["dominant_mood"] == "positive" and abs(trend["positive_ratio"] - 2 / 3) < 1e-9
+    context = history.get_context_for_analysis(as_of=datetime(2024, 5, 1))
+    assert "ポジティブ100.0%" in context, "再分析ではその日より前の気分だけを使う"
+
+    print("🩹 後から分かった気分はその日の集計だけを直すかテスト...")
+    history.add_diary_entry("保留", "分析は後で。", {}, pending=["analysis"])
+    assert history.get_daily_rollup(1)[0]["moods"] == {"positive": 1, "不明": 1}
+    pending_id = history.get_pending_entries()[0]["id"]
+    history.get_all_entries = None  # 全エントリを読み直さないこと
+    assert history.update_entry(pending_id, ai_analysis={"emotions": {"overall_mood": "negative"}}, pending=[])
+    del history.get_all_entries
+    assert history.get_daily_rollup(1)[0]["moods"] == {"positive": 1, "negative": 1}
+    updated = history.get_daily_rollup(days=None)
+    assert history.rebuild_daily_rollup() == 3 and history.get_daily_rollup(days=None) == updated
+
+    print("🔒 複数プロセスの同時初期化テスト...")
+    concurrent_dir = tempfile.mkdtemp()
+    with open(os.path.join(concurrent_dir, "diary_history.json"), 'w', encoding='utf-8') as f:
+        json.dump(legacy, f, ensure_ascii=False)
+    with multiprocessing.get_context("spawn").Pool(4) as pool:
+        counts = pool.map(count_entries, [concurrent_dir] * 4)
+    assert counts == [2, 2, 2, 2]
+    migrated = DiaryHistory(concurrent_dir)
+    assert migrated.get_all_entries() == legacy["diaries"]
+    assert not [name for name in os.listdir(migrated.history_dir) if name.endswith(".tmp")]
+
+    print("\n✅ テスト完了!")
+
+if __name__ == "__main__":
+    test_history_shards()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+ジョブキューテストスクリプト
+"""
+
+import sys
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from job_queue import JobQueue, LEASE_SECONDS, MAX_ATTEMPTS
+
+def test_job_queue():
+    """ジョブの登録・取り出し・完了をテスト"""
+    print("👷 ジョブキューテスト開始...")
+
+    queue = JobQueue(tempfile.mkdtemp())
+
+    print("📥 登録と二重送信の防止テスト...")
+    first = queue.submit("create_diary", {"content": "一つ目"}, dedupe_key="a")
+    second = queue.submit("create_diary", {"content": "二つ目"}, dedupe_key="b")
+    assert queue.submit("create_diary", {"content": "一つ目"}, dedupe_key="a") == first
+    # 時間帯の境目をまたいだ再送は、直前の時間帯のキーで同じジョブを見つける
+    assert queue.submit("create_diary", {"content": "一つ目"}, dedupe_key="a2", alternate_keys=["a"]) == first
+    assert queue.get(second)["queued_ahead"] == 1
+    assert queue.get_stats() == {"queued": 2}
+
+    print("🔒 複数のワーカーが同じジョブを取らないかテスト...")
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        claimed = list(executor.map(lambda i: queue.claim(f"worker-{i}"), range(4)))
+    claimed_ids = [job["id"] for job in claimed if job is not None]
+    print(f"取り出したジョブ: {len(claimed_ids)}件")
+    assert sorted(claimed_ids) == sorted([first, second])
+
+    print("✅ 完了・失敗の記録テスト...")
+    queue.complete(first, {"status": "success", "generated_title": "一つ目"})
+    queue.fail(second, "タイムアウト")
+    assert queue.get(first)["result"]["generated_title"] == "一つ目"
+    assert queue.get(second)["status"] == "error"
+    # 失敗したジョブと同じ内容は新しいジョブとして登録できる
+    assert queue.submit("create_diary", {"content": "二つ目"}, dedupe_key="b") != second
+
+    print("🔁 実行中のまま残ったジョブの再登録テスト...")
+    third = queue.claim("worker-1")["id"]
+    assert queue.requeue_running() == 1
+    assert queue.claim("worker-2")["id"] == third
+
+    print("💓 ハートビートが続いているジョブは戻さないかテスト...")
+    queue.heartbeat(third)
+    assert queue.requeue_running(LEASE_SECONDS) == 0, "リース内のジョブは動いているワーカーのもの"
+    assert queue.requeue_running(pid=os.getpid() + 1) == 0, "別のプロセスのジョブは戻さない"
+    assert queue.requeue_running(pid=os.getpid()) == 1
+
+    print("🛑 何度もワーカーを止めるジョブは失敗にするかテスト...")
+    for attempt in range(3, MAX_ATTEMPTS + 1):
+        job = queue.claim("worker-1")
+        assert job["id"] == third and job["attempts"] == attempt
+        queue.requeue_running()
+    assert queue.get(third)["status"] == "error"
+    assert queue.claim("worker-1") is None
+
+    print("🎉 ジョブキューテスト完了!")
+
+if __name__ == "__main__":
+    test_job_queue()
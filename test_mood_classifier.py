@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+ローカル気分分類器テストスクリプト
+"""
+
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from mood_classifier import MoodClassifier, SEED_LEXICON, CONFIDENCE_THRESHOLD
+
+def test_mood_classifier():
+    """ローカル気分分類器をテスト"""
+    print("😊 ローカル気分分類器テスト開始...")
+
+    classifier = MoodClassifier()
+    for label, words in SEED_LEXICON.items():
+        classifier.fit(words, [label] * len(words))
+
+    samples = [
+        ("友達と遊んでとても楽しかった。嬉しい一日だった。", "positive"),
+        ("仕事で失敗して落ち込んだ。疲れたし不安だ。", "negative"),
+        ("今日は会議と買い物をした。", "neutral")
+    ]
+
+    print("\n📋 判定結果:")
+    for text, expected in samples:
+        mood, confidence = classifier.predict(text)
+        print(f"{mood} ({confidence:.2f}): {text}")
+        assert mood == expected
+
+    # analyze_emotion と同じ形式で返ること
+    result = classifier.classify(samples[0][0])
+    print(f"\n🤖 分析結果形式: {result}")
+    assert result["source"] == "local"
+    assert "喜び" in result["emotions"]
+
+    # LLMのラベルで追加学習できること
+    classifier.learn("研究室の発表をやり切った", "positive")
+    print(f"追加学習後: {classifier.predict('発表をやり切った')}")
+
+    # 追加学習と判定を別スレッドから同時に行えること
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        futures = [executor.submit(classifier.learn, f"新しい言葉{i}で嬉しい", "positive") for i in range(200)]
+        futures += [executor.submit(classifier.predict, samples[1][0]) for _ in range(200)]
+        results = [future.result() for future in futures]
+    assert all(result[0] == "negative" for result in results[200:])
+    assert classifier.predict(samples[1][0])[0] == "negative"
+
+    benchmark = classifier.benchmark([t for t, _ in samples], [l for _, l in samples])
+    print(f"\n📊 ベンチマーク（確信度{CONFIDENCE_THRESHOLD}以上）: {benchmark}")
+    assert benchmark["accuracy"] == 1.0
+
+    print("\n✅ テスト完了!")
+
+if __name__ == "__main__":
+    test_mood_classifier()
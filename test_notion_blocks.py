@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Notionブロック作成テストスクリプト
+"""
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from notion_diary_client import NotionDiaryClient, MAX_TEXT_LENGTH
+
+def test_analysis_blocks():
+    """長い要約・アドバイスを2000文字以下の要素に分けるかテスト"""
+    print("🧱 AI分析ブロックテスト開始...")
+
+    client = NotionDiaryClient("notion-key", "database-id")
+    summary = "今日は長い一日だった。" * 300
+    advice = "ゆっくり休みましょう。" * 300
+    blocks = client.build_analysis_blocks({"summary": summary, "advice": advice,
+                                           "emotions": {"overall_mood": "neutral"}})
+    callouts = [block["callout"]["rich_text"] for block in blocks if block["type"] == "callout"]
+
+    print(f"要約の要素数: {len(callouts[0])} / アドバイスの要素数: {len(callouts[1])}")
+    assert len(callouts[0]) > 1 and len(callouts[1]) > 1
+    for rich_text in callouts:
+        assert all(len(element["text"]["content"]) <= MAX_TEXT_LENGTH for element in rich_text)
+    assert "".join(element["text"]["content"] for element in callouts[0]) == f"📊 要約: {summary}"
+    assert "".join(element["text"]["content"] for element in callouts[1]) == f"💡 アドバイス: {advice}"
+
+    print("🎉 AI分析ブロックテスト完了!")
+
+if __name__ == "__main__":
+    test_analysis_blocks()
@@ -31,6 +31,13 @@ def test_profile():
     else:
         print("プロフィール文脈が生成されていません（まだ設定されていない可能性があります）")
     
+    # キャッシュされた文脈が同じ内容で返ること
+    print("\n🗂️ キャッシュ確認:")
+    cached_context = profile_manager.get_profile_for_ai()
+    print(f"キャッシュ一致: {'はい' if cached_context == ai_context else 'いいえ'}")
+    print(f"プロフィールバージョン: {profile_manager.get_profile_version()}")
+    assert cached_context == ai_context
+    
     # プロフィール要約
     print("\n📊 プロフィール要約:")
     summary = profile_manager.get_profile_summary()
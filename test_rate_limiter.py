@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+レートリミッターテストスクリプト
+"""
+
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from rate_limiter import RateLimiter
+
+def test_rate_limiter():
+    """連続呼び出しの上限と、呼び出し頻度の制限をテスト"""
+    print("⏱️ レートリミッターテスト開始...")
+
+    print("🚫 正でない呼び出し回数を拒否するかテスト...")
+    for rate in (0, -1, float("nan")):
+        try:
+            RateLimiter(rate)
+            assert False, f"{rate} は ValueError になるはず"
+        except ValueError:
+            pass
+
+    print("💨 burst 回までは待たずに許可するかテスト...")
+    limiter = RateLimiter(20, burst=3)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - start < 0.03
+
+    print("🐢 枠を使い切った後は頻度を制限するかテスト...")
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: limiter.acquire(), range(4)))
+    elapsed = time.monotonic() - start
+    print(f"4回の呼び出し: {elapsed:.3f}秒")
+    assert elapsed >= 4 / 20 - 0.02, "1秒あたり20回を超えない"
+
+    print("🎉 レートリミッターテスト完了!")
+
+if __name__ == "__main__":
+    test_rate_limiter()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+先行分析テストスクリプト
+"""
+
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
+
+from speculative_analysis import SpeculativeAnalyzer
+
+class StubAnalyzer:
+    """タイトル生成・感情分析の代わりに、呼び出された本文を記録する"""
+
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def generate_title(self, content):
+        with self._lock:
+            self.calls.append(content)
+        return f"タイトル: {content[:8]}"
+
+    def analyze_emotion(self, content):
+        return {"overall_mood": "positive", "emotions": ["喜び"]}
+
+DIARY = "今日は朝から図書館に行って、ずっと読みたかった本を最後まで読み切った。とても満足している。"
+OTHER = "夕方に雨が降ってきたので、予定していた買い物をやめて家で映画を見ることにした。"
+
+def test_speculative_analysis():
+    """入力の待ち合わせ・取り消し・セッションの分離・近い本文の再利用をテスト"""
+    print("🔮 先行分析テスト開始...")
+
+    analyzer = StubAnalyzer()
+    speculative = SpeculativeAnalyzer(analyzer, debounce_seconds=0.1, min_chars=10)
+    settle = 0.4
+
+    print("⌨️ 入力が落ち着いてから最後の本文だけを分析するかテスト...")
+    for length in (20, 30, len(DIARY)):
+        speculative.schedule(DIARY[:length], session="a")
+    time.sleep(settle)
+    assert analyzer.calls == [DIARY], "途中の入力は分析しない"
+    speculative.schedule("短い", session="a")
+    time.sleep(settle)
+    assert analyzer.calls == [DIARY], "短い入力は分析しない"
+
+    print("🎯 同じ本文の結果を再利用するかテスト...")
+    result = speculative.take(DIARY, timeout=1.0, session="a")
+    assert result["title"] == f"タイトル: {DIARY[:8]}" and result["emotions"]["overall_mood"] == "positive"
+    assert speculative.take(DIARY, timeout=1.0, session="a") is None, "結果は1回だけ使う"
+
+    print("✂️ 保存時に待ち合わせ中の分析を取り消すかテスト...")
+    speculative.schedule(OTHER, session="a")
+    assert speculative.take(OTHER, timeout=1.0, session="a") is None
+    time.sleep(settle)
+    assert analyzer.calls == [DIARY], "取り消した予約は分析しない"
+
+    print("👥 セッションごとに分けるかテスト...")
+    speculative.schedule(DIARY, session="a")
+    speculative.schedule(OTHER, session="b")
+    time.sleep(settle)
+    assert sorted(analyzer.calls) == sorted([DIARY, DIARY, OTHER]), "別のセッションの入力で予約を取り消さない"
+    assert speculative.take(OTHER, timeout=1.0, session="a") is None, "他のセッションの結果は使わない"
+    assert speculative.take(OTHER, timeout=1.0, session="b") is not None
+
+    print("🔍 十分に近い本文の結果を再利用するかテスト...")
+    edited = DIARY.replace("とても", "とっても")
+    assert speculative.take(edited, timeout=1.0, session="a")["title"] == f"タイトル: {DIARY[:8]}"
+    speculative.schedule(DIARY, session="a")
+    time.sleep(settle)
+    assert speculative.take(OTHER + "。", timeout=1.0, session="a") is None, "違う本文では再利用しない"
+
+    print("📊 同時に取り出しても集計が欠けないかテスト...")
+    before = dict(speculative.stats)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: speculative.take(f"{OTHER}{i}", session=f"s{i % 4}"), range(200)))
+    assert speculative.stats["misses"] - before["misses"] == 200
+    print(f"集計: {speculative.stats}")
+    assert speculative.stats["exact_hits"] == 2 and speculative.stats["similar_hits"] == 1
+
+    print("🎉 先行分析テスト完了!")
+
+if __name__ == "__main__":
+    test_speculative_analysis()